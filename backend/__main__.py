@@ -1,16 +1,209 @@
-"""Backend entrypoint for quick connectivity test."""
+"""Backend entrypoint: quick connectivity test and document ingestion.
+
+用法:
+    python -m backend                 # LLM 连通性测试
+    python -m backend ingest <目录>   # 流式入库目录下的文档
+    python -m backend sync <目录>     # 按文件清单增量同步目录
+    python -m backend snapshot export|import <文件>   # 导出/导入向量存储快照
+    python -m backend answer <问题.jsonl> -o <回答.jsonl>   # 批量回答
+"""
+import sys
+import json
+import argparse
 from dotenv import load_dotenv
-from backend.llm.llm_factory import test_connection
 
 
-def main():
-    load_dotenv()
+def cmd_test(args) -> int:
+    from backend.llm.llm_factory import test_connection
+
     ok, msg = test_connection()
     if ok:
-        print("LLM ӳɹ", msg)
+        print("LLM 连接成功：", msg)
     else:
-        print("LLM ʧܣ", msg)
+        print("LLM 连接失败：", msg)
+    return 0 if ok else 1
+
+
+def _print_progress(progress) -> None:
+    eta = f"{progress['eta']:.0f}s" if progress["eta"] is not None else "--"
+    print(
+        f"\r[{progress['files_done']}/{progress['files_total']}] "
+        f"新增 {progress['chunks_added']} 跳过 {progress['chunks_skipped']} "
+        f"已用 {progress['elapsed']:.0f}s 剩余 {eta}",
+        end="", flush=True
+    )
+
+
+def cmd_ingest(args) -> int:
+    from backend.rag import VectorStoreManager, DocumentProcessor, IngestPipeline
+
+    with VectorStoreManager() as manager:
+        manager.load_vector_store(args.collection)
+        pipeline = IngestPipeline(
+            manager,
+            doc_processor=DocumentProcessor(
+                chunk_size=args.chunk_size, chunk_overlap=args.chunk_overlap, load_workers=args.workers
+            ),
+            batch_size=args.batch_size
+        )
+        if args.rebuild:
+            #写入新版本，完成后再切换，期间查询仍使用旧版本
+            manager.begin_generation(args.collection)
+            try:
+                result = pipeline.run_dir(args.dir, progress_callback=_print_progress)
+            except Exception:
+                manager.abort_generation()
+                raise
+            manager.commit_generation()
+        else:
+            result = pipeline.run_dir(args.dir, progress_callback=_print_progress)
+    print()
+    print(f"完成：{result['files']} 个文件，新增 {result['added']} 个分块，"
+          f"跳过 {result['skipped']} 个，耗时 {result['elapsed']:.1f}s")
+    for failed in result["failed_files"]:
+        print(f"失败: {failed['path']}: {failed['error']}")
+    return 0
+
+
+def cmd_sync(args) -> int:
+    from backend.rag import VectorStoreManager, DocumentProcessor, DirectorySync
+
+    with VectorStoreManager() as manager:
+        manager.load_vector_store(args.collection)
+        syncer = DirectorySync(manager, doc_processor=DocumentProcessor(load_workers=args.workers))
+        result = syncer.sync(args.dir, dry_run=args.dry_run)
+
+    print(f"新增 {len(result['new_files'])} 个文件，变化 {len(result['changed_files'])} 个，"
+          f"移除 {len(result['removed_files'])} 个，未变化 {result['unchanged_files']} 个")
+    if not args.dry_run:
+        print(f"分块：新增 {result['chunks_added']}，跳过 {result['chunks_skipped']}，"
+              f"删除 {result['chunks_deleted']}，耗时 {result['elapsed']:.1f}s")
+    for failed in result["failed_files"]:
+        print(f"失败: {failed['path']}: {failed['error']}")
+    return 0
+
+
+def cmd_snapshot(args) -> int:
+    from backend.config import DEFAULT_COLLECTION_NAME
+    from backend.rag import VectorStoreManager
+
+    with VectorStoreManager() as manager:
+        if args.action == "export":
+            manager.load_vector_store(args.collection or DEFAULT_COLLECTION_NAME)
+            result = manager.export_snapshot(args.path, dtype="float16" if args.float16 else "float32")
+            print(f"已导出 {result['count']} 个分块（{result['dim']} 维，{result['dtype']}，"
+                  f"{result['bytes'] / 1e6:.1f} MB）到 {result['path']}")
+        else:
+            result = manager.import_snapshot(args.path, collection_name=args.collection,
+                                             allow_model_mismatch=args.allow_model_mismatch)
+            print(f"已导入 {result['added']} 个分块（嵌入模型 {result['model_id']}），当前版本 {result['generation']}")
+    return 0
+
+
+def _read_questions(path: str) -> list:
+    #每行一个 JSON 对象（含 "question" 字段，其余字段原样写回）或 JSON 字符串，空行跳过
+    records = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line_no, line in enumerate(f, start=1):
+            line = line.strip()
+            if not line:
+                continue
+            record = json.loads(line)
+            if isinstance(record, str):
+                record = {"question": record}
+            if not isinstance(record, dict) or not str(record.get("question", "")).strip():
+                raise ValueError(f"{path} 第 {line_no} 行缺少 question 字段")
+            records.append(record)
+    return records
+
+
+def cmd_answer(args) -> int:
+    import numpy as np
+    from backend.rag import VectorStoreManager, RAGChain
+
+    records = _read_questions(args.questions)
+    with VectorStoreManager() as manager:
+        manager.load_vector_store(args.collection)
+        rag_chain = RAGChain(manager)
+        rag_chain.setup_qa_chain(
+            llm_provider=args.provider, model_name=args.model, temperature=args.temperature,
+            k=args.k, retriever_mode=args.retriever_mode, use_mmr=args.mmr
+        )
+        results = rag_chain.answer_questions([record["question"] for record in records],
+                                             max_concurrency=args.concurrency)
+
+    errors = 0
+    with open(args.output, "w", encoding="utf-8") as f:
+        for record, result in zip(records, results):
+            record = dict(record)
+            record["answer"] = result["answer"]
+            record["sources"] = [
+                {"id": doc.id, "source": doc.metadata.get("source"), "page": doc.metadata.get("page")}
+                for doc in result["source_documents"]
+            ]
+            record["timings"] = result["timings"]
+            record["cached"] = result["cached"]
+            if "error" in result:
+                record["error"] = result["error"]
+                errors += 1
+            f.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+    totals = [result["timings"]["total"] for result in results]
+    summary = f"p50 {np.percentile(totals, 50):.2f}s，p95 {np.percentile(totals, 95):.2f}s" if totals else ""
+    print(f"完成：{len(results)} 个问题，失败 {errors} 个，{summary}，结果已写入 {args.output}")
+    return 1 if errors else 0
+
+
+def main(argv=None) -> int:
+    from backend.config import (
+        DEFAULT_COLLECTION_NAME, DEFAULT_CHUNK_SIZE, DEFAULT_CHUNK_OVERLAP, DEFAULT_LOAD_WORKERS,
+        DEFAULT_RETRIEVAL_K, RETRIEVER_MODE, BATCH_LLM_CONCURRENCY
+    )
+
+    load_dotenv()
+    parser = argparse.ArgumentParser(prog="python -m backend")
+    subparsers = parser.add_subparsers(dest="command")
+
+    subparsers.add_parser("test", help="LLM 连通性测试（默认）")
+
+    ingest = subparsers.add_parser("ingest", help="流式入库目录下的文档")
+    ingest.add_argument("dir", help="文档目录")
+    ingest.add_argument("--collection", default=DEFAULT_COLLECTION_NAME)
+    ingest.add_argument("--batch-size", type=int, default=None, help="每批写入条数，默认取向量存储上限")
+    ingest.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE)
+    ingest.add_argument("--chunk-overlap", type=int, default=DEFAULT_CHUNK_OVERLAP)
+    ingest.add_argument("--workers", type=int, default=DEFAULT_LOAD_WORKERS, help="文档解析进程数")
+    ingest.add_argument("--rebuild", action="store_true", help="在新版本中重建集合，完成后原子切换")
+
+    sync = subparsers.add_parser("sync", help="按文件清单增量同步目录（只处理新增、变化和移除的文件）")
+    sync.add_argument("dir", help="文档目录")
+    sync.add_argument("--collection", default=DEFAULT_COLLECTION_NAME)
+    sync.add_argument("--workers", type=int, default=DEFAULT_LOAD_WORKERS, help="文档解析进程数")
+    sync.add_argument("--dry-run", action="store_true", help="只显示需要处理的文件，不写入")
+
+    snapshot = subparsers.add_parser("snapshot", help="导出或导入向量存储快照（不调用嵌入模型）")
+    snapshot.add_argument("action", choices=["export", "import"])
+    snapshot.add_argument("path", help="快照文件路径")
+    snapshot.add_argument("--collection", default=None, help="集合名，导出默认 energy_docs，导入默认取快照中的集合名")
+    snapshot.add_argument("--float16", action="store_true", help="导出时以 float16 保存嵌入，体积减半")
+    snapshot.add_argument("--allow-model-mismatch", action="store_true", help="导入时忽略嵌入模型不一致")
+
+    answer = subparsers.add_parser("answer", help="批量回答 JSONL 文件中的问题，结果写入 JSONL")
+    answer.add_argument("questions", help="问题文件，每行一个 {\"question\": ...}")
+    answer.add_argument("-o", "--output", required=True, help="结果文件，每行含回答、来源与各阶段耗时")
+    answer.add_argument("--collection", default=DEFAULT_COLLECTION_NAME)
+    answer.add_argument("--provider", default=None, help="LLM 提供者，默认取 DEFAULT_PROVIDER")
+    answer.add_argument("--model", default=None)
+    answer.add_argument("--temperature", type=float, default=None)
+    answer.add_argument("--k", type=int, default=DEFAULT_RETRIEVAL_K, help="每个问题检索的分块数")
+    answer.add_argument("--retriever-mode", choices=["vector", "hybrid"], default=RETRIEVER_MODE)
+    answer.add_argument("--mmr", action="store_true", help="用 MMR 去除重复分块")
+    answer.add_argument("--concurrency", type=int, default=BATCH_LLM_CONCURRENCY, help="同时进行的 LLM 请求数")
+
+    args = parser.parse_args(argv)
+    commands = {"ingest": cmd_ingest, "sync": cmd_sync, "snapshot": cmd_snapshot, "answer": cmd_answer}
+    return commands.get(args.command, cmd_test)(args)
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    sys.exit(main())
@@ -7,12 +7,36 @@ from typing import Dict, Any
 PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 VECTORSTORE_PATH = os.path.join(PROJECT_ROOT, "vectorstore", "energy_docs")
 
+# 向量存储后端：chroma（HNSW 近似检索）或 numpy（内存映射矩阵精确检索，适合百万级以下语料）
+VECTORSTORE_BACKEND = os.getenv("VECTORSTORE_BACKEND", "chroma").lower()
+
 # LLM配置
 DEFAULT_LLM_PROVIDER = os.getenv("DEFAULT_PROVIDER", "aliyun")
 DEFAULT_MODEL_NAME = os.getenv("MODEL_NAME", "qwen-turbo")
 DEFAULT_TEMPERATURE = float(os.getenv("TEMPERATURE", 0.1))
 DEFAULT_MAX_TOKENS = int(os.getenv("MAX_TOKENS", 1000))
 
+# 复用已创建的 LLM 客户端（保留 HTTP 连接）与已构建的 QA 链的最大数量
+LLM_CLIENT_CACHE_SIZE = int(os.getenv("LLM_CLIENT_CACHE_SIZE", 8))
+QA_CHAIN_CACHE_SIZE = int(os.getenv("QA_CHAIN_CACHE_SIZE", 8))
+
+# 批量回答时同时进行的 LLM 请求数
+BATCH_LLM_CONCURRENCY = int(os.getenv("BATCH_LLM_CONCURRENCY", 4))
+
+# 异步接口的并发上限：同一事件循环内按提供者计，超出的请求排队等待
+LLM_ASYNC_CONCURRENCY = {
+    "openai": int(os.getenv("OPENAI_ASYNC_CONCURRENCY", 32)),
+    "aliyun": int(os.getenv("ALIYUN_ASYNC_CONCURRENCY", 32)),
+    "default": int(os.getenv("LLM_ASYNC_CONCURRENCY", 16)),
+}
+
+# LLM 回复缓存（默认关闭）：相同提供者、模型、参数、系统提示词与提示词的请求直接返回已保存的回复，
+# 适合低 temperature 下重放评测集与演示脚本
+LLM_CACHE_ENABLED = os.getenv("LLM_CACHE_ENABLED", "false").lower() in ("1", "true", "yes")
+LLM_CACHE_PATH = os.getenv("LLM_CACHE_PATH", os.path.join(PROJECT_ROOT, "cache", "llm_responses.sqlite3"))
+LLM_CACHE_MAX_ENTRIES = int(os.getenv("LLM_CACHE_MAX_ENTRIES", 10000))
+LLM_CACHE_MAX_BYTES = int(os.getenv("LLM_CACHE_MAX_BYTES", 64 * 1024 * 1024))
+
 # API配置
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
 OPENAI_BASE_URL = os.getenv("OPENAI_BASE_URL", "https://api.openai.com/v1")
@@ -22,15 +46,78 @@ ALIYUN_BASE_URL = os.getenv("ALIYUN_BASE_URL", "https://dashscope.aliyuncs.com/c
 
 DASHSCOPE_API_KEY = os.getenv("DASHSCOPE_API_KEY")
 
+# 嵌入模型选择：auto / dashscope / openai / sentence_transformers / local
+EMBEDDING_PROVIDER = os.getenv("EMBEDDING_PROVIDER", "auto").lower()
+
+# 本地 SentenceTransformer 嵌入配置（LOCAL_EMBEDDING_THREADS 为 0 时使用 torch 默认线程数）
+LOCAL_EMBEDDING_MODEL = os.getenv("LOCAL_EMBEDDING_MODEL", "sentence-transformers/all-MiniLM-L6-v2")
+LOCAL_EMBEDDING_BATCH_SIZE = int(os.getenv("LOCAL_EMBEDDING_BATCH_SIZE", 64))
+LOCAL_EMBEDDING_THREADS = int(os.getenv("LOCAL_EMBEDDING_THREADS", 0))
+LOCAL_EMBEDDING_POOL_THRESHOLD = int(os.getenv("LOCAL_EMBEDDING_POOL_THRESHOLD", 1000))
+
+# 嵌入请求配置（DashScope 单次请求最多 25 条）
+DASHSCOPE_BATCH_SIZE = 25
+EMBEDDING_MAX_WORKERS = int(os.getenv("EMBEDDING_MAX_WORKERS", 4))
+EMBEDDING_MAX_RETRIES = int(os.getenv("EMBEDDING_MAX_RETRIES", 3))
+EMBEDDING_RETRY_BASE_DELAY = float(os.getenv("EMBEDDING_RETRY_BASE_DELAY", 0.5))
+# 异步嵌入接口的并发上限（同一事件循环内按提供者计）
+EMBEDDING_ASYNC_CONCURRENCY = {
+    "dashscope": int(os.getenv("DASHSCOPE_ASYNC_CONCURRENCY", 8)),
+    "local": int(os.getenv("LOCAL_EMBEDDING_ASYNC_CONCURRENCY", 4)),
+}
+
+# 嵌入缓存配置
+EMBEDDING_CACHE_ENABLED = os.getenv("EMBEDDING_CACHE_ENABLED", "true").lower() in ("1", "true", "yes")
+EMBEDDING_CACHE_PATH = os.getenv("EMBEDDING_CACHE_PATH", os.path.join(PROJECT_ROOT, "cache", "embeddings.sqlite3"))
+EMBEDDING_CACHE_MAX_ENTRIES = int(os.getenv("EMBEDDING_CACHE_MAX_ENTRIES", 200000))
+EMBEDDING_CACHE_MAX_BYTES = int(os.getenv("EMBEDDING_CACHE_MAX_BYTES", 512 * 1024 * 1024))
+
 # 文档处理配置
 DEFAULT_CHUNK_SIZE = 1000
 DEFAULT_CHUNK_OVERLAP = 200
 SUPPORTED_DOCUMENT_EXTENSIONS = [".pdf", ".txt", ".doc", ".docx"]
+# 目录加载的进程数，1 为串行
+DEFAULT_LOAD_WORKERS = int(os.getenv("DOC_LOAD_WORKERS", 1))
+
+# Chroma HNSW 索引参数（集合创建时生效，search_ef 可随时调整）：
+# space 距离（l2 / cosine / ip），M 每个节点的邻居数，construction_ef 建索引时的候选数，search_ef 查询时的候选数
+HNSW_SETTINGS = {
+    "space": os.getenv("HNSW_SPACE", "l2"),
+    "M": int(os.getenv("HNSW_M", 16)),
+    "construction_ef": int(os.getenv("HNSW_CONSTRUCTION_EF", 100)),
+    "search_ef": int(os.getenv("HNSW_SEARCH_EF", 100)),
+}
+
+# 入库流水线配置：每批写入条数（不超过 Chroma 的最大批量）与各阶段间队列长度
+INGEST_BATCH_SIZE = int(os.getenv("INGEST_BATCH_SIZE", 1000))
+INGEST_QUEUE_SIZE = int(os.getenv("INGEST_QUEUE_SIZE", 2))
 
 # RAG配置
 DEFAULT_RETRIEVAL_K = 3
 DEFAULT_COLLECTION_NAME = "energy_docs"
 
+# 检索方式：vector（仅向量）/ hybrid（BM25 关键词 + 向量，RRF 融合）
+RETRIEVER_MODE = os.getenv("RETRIEVER_MODE", "vector").lower()
+# 写入时是否同步维护关键词倒排索引
+KEYWORD_INDEX_ENABLED = os.getenv("KEYWORD_INDEX_ENABLED", "true").lower() in ("1", "true", "yes")
+BM25_K1 = 1.5
+BM25_B = 0.75
+# 混合检索：每路召回条数与 RRF 常数
+HYBRID_FETCH_K = int(os.getenv("HYBRID_FETCH_K", 20))
+RRF_K = 60
+
+# MMR 去重：候选条数与相关性权重（1 只看相关性，0 只看多样性）
+MMR_ENABLED = os.getenv("MMR_ENABLED", "false").lower() in ("1", "true", "yes")
+MMR_FETCH_K = int(os.getenv("MMR_FETCH_K", 20))
+MMR_LAMBDA = float(os.getenv("MMR_LAMBDA", 0.5))
+
+# 语义回答缓存：问题向量与已回答问题的余弦相似度不低于阈值时直接返回缓存的回答；
+# 条目超过 ANSWER_CACHE_TTL 秒过期，超过条数上限按最近使用淘汰，集合内容变化后全部失效
+ANSWER_CACHE_ENABLED = os.getenv("ANSWER_CACHE_ENABLED", "true").lower() in ("1", "true", "yes")
+ANSWER_CACHE_THRESHOLD = float(os.getenv("ANSWER_CACHE_THRESHOLD", 0.95))
+ANSWER_CACHE_TTL = float(os.getenv("ANSWER_CACHE_TTL", 3600))
+ANSWER_CACHE_MAX_ENTRIES = int(os.getenv("ANSWER_CACHE_MAX_ENTRIES", 256))
+
 # 系统提示词
 ENERGY_SYSTEM_PROMPT = """你是一个专业的能源AI助手，专注于回答与能源相关的问题，包括但不限于：
 - 能源生产（煤炭、石油、天然气、风电、光伏、水电等）
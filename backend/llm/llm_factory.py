@@ -1,14 +1,22 @@
 ﻿"""LLM 工厂：统一管理不同 LLM 提供者的接入"""
 #优化类型注解
 from __future__ import annotations 
-from typing import Optional, Tuple
+from typing import Optional, Tuple, Iterator
+from collections import OrderedDict
+import asyncio
+import threading
+import weakref
 
 from dotenv import load_dotenv
-from openai import OpenAI
+from openai import OpenAI, AsyncOpenAI, DefaultAsyncHttpxClient
 import os
 
-from ..config import ENERGY_SYSTEM_PROMPT, get_llm_config
+from ..config import (
+    ENERGY_SYSTEM_PROMPT, LLM_CLIENT_CACHE_SIZE, LLM_CACHE_ENABLED, LLM_ASYNC_CONCURRENCY, get_llm_config
+)
 from ..exceptions import LLMConfigError, APIConnectionError
+from ..utils import provider_semaphore
+from .response_cache import LLMResponseCache, make_response_key
 
 load_dotenv()
 
@@ -25,10 +33,101 @@ except ImportError:
     from langchain_core.runnables.base import Runnable
 
 
+def _prompt_text(input: str | dict) -> str:
+    #与 invoke 相同的输入约定：字符串或 {"input": 字符串}
+    if isinstance(input, dict) and "input" in input:
+        return input["input"]
+    return str(input)
+
+
+_loop_clients_lock = threading.Lock()
+
+
 class BaseLLM:
-    #抽象基类，通用LLM接口
-    def chat(self, prompt: str) -> str:
+    #抽象基类，通用LLM接口；子类实现 _chat（及可选的 _stream），回复缓存在此统一处理
+    provider: Optional[str] = None
+    model_name: str = ""
+    temperature: float = 0.0
+    max_tokens: int = 0
+    response_cache: Optional[LLMResponseCache] = None
+
+    def _chat(self, prompt: str) -> str:
+        raise NotImplementedError()
+
+    def _stream(self, prompt: str) -> Iterator[str]:
+        #不支持流式输出的实现一次性返回完整回复
+        yield self._chat(prompt)
+
+    async def _achat(self, prompt: str) -> str:
+        #没有原生异步客户端的实现在线程中调用同步接口
+        return await asyncio.to_thread(self._chat, prompt)
+
+    def _create_async_client(self):
         raise NotImplementedError()
+
+    def _async_client(self):
+        #当前事件循环专用的异步客户端。异步客户端的连接池绑定创建它的事件循环，
+        #而 LLMFactory 缓存的实例会被多次 asyncio.run 复用，因此每个循环各建一个，已关闭循环的客户端随之丢弃
+        loop = asyncio.get_running_loop()
+        with _loop_clients_lock:
+            clients = self._loop_clients
+            for closed in [other for other in clients if other.is_closed()]:
+                del clients[closed]
+            if loop not in clients:
+                clients[loop] = self._create_async_client()
+            return clients[loop]
+
+    def _cache_key(self, prompt: str) -> str:
+        return make_response_key(
+            self.provider, self.model_name, self.temperature, self.max_tokens, ENERGY_SYSTEM_PROMPT, prompt
+        )
+
+    def chat(self, prompt: str) -> str:
+        if self.response_cache is None:
+            return self._chat(prompt)
+        key = self._cache_key(prompt)
+        cached = self.response_cache.get(key)
+        if cached is not None:
+            return cached
+        resp = self._chat(prompt)
+        self.response_cache.put(key, self.model_name, resp)
+        return resp
+
+    async def achat(self, prompt: str) -> str:
+        """异步对话；同一事件循环内同一提供者的并发请求数受 LLM_ASYNC_CONCURRENCY 限制。"""
+        key = None
+        if self.response_cache is not None:
+            key = self._cache_key(prompt)
+            cached = self.response_cache.get(key)
+            if cached is not None:
+                return cached
+        limit = LLM_ASYNC_CONCURRENCY.get(self.provider or "default", LLM_ASYNC_CONCURRENCY["default"])
+        async with provider_semaphore(f"llm:{self.provider or 'default'}", limit):
+            resp = await self._achat(prompt)
+        if key is not None:
+            self.response_cache.put(key, self.model_name, resp)
+        return resp
+
+    async def ainvoke(self, input: str | dict, config: Optional[dict] = None, **kwargs) -> str:
+        """LangChain Runnable 异步接口方法"""
+        return await self.achat(_prompt_text(input))
+
+    def stream(self, input: str | dict, config: Optional[dict] = None, **kwargs) -> Iterator[str]:
+        """逐段返回回复文本；命中回复缓存时一次性返回完整回复。"""
+        prompt = _prompt_text(input)
+        if self.response_cache is None:
+            yield from self._stream(prompt)
+            return
+        key = self._cache_key(prompt)
+        cached = self.response_cache.get(key)
+        if cached is not None:
+            yield cached
+            return
+        parts = []
+        for token in self._stream(prompt):
+            parts.append(token)
+            yield token
+        self.response_cache.put(key, self.model_name, "".join(parts).strip())
     
     def invoke(self, input: str | dict, config: Optional[dict] = None) -> str:
         """LangChain Runnable 接口方法"""
@@ -44,13 +143,17 @@ class OpenAIPythonLLM(BaseLLM, Runnable):
         api_key: str, 
         api_base: Optional[str],  
         temperature: float = 0.7, 
-        max_tokens: int = 1000
+        max_tokens: int = 1000,
+        provider: Optional[str] = None,
+        response_cache: Optional[LLMResponseCache] = None
     ):
         self.model_name = model_name
         self.temperature = temperature
         self.max_tokens = max_tokens
         self.api_key = api_key
         self.api_base = api_base
+        self.provider = provider
+        self.response_cache = response_cache
 
         try:
             self.client = OpenAI(
@@ -59,22 +162,61 @@ class OpenAIPythonLLM(BaseLLM, Runnable):
             )
         except Exception as e:
             raise APIConnectionError(f"OpenAI API 连接失败: {e}")
+        #异步客户端在首次异步调用时按事件循环创建
+        self._loop_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, AsyncOpenAI]" = weakref.WeakKeyDictionary()
 
-    def chat(self, prompt: str) -> str:
+    def _create_async_client(self) -> AsyncOpenAI:
+        try:
+            return AsyncOpenAI(api_key=self.api_key, base_url=self.api_base)
+        except Exception as e:
+            raise APIConnectionError(f"OpenAI API 连接失败: {e}")
+
+    @staticmethod
+    def _messages(prompt: str) -> list:
+        return [
+            {"role": "system", "content": ENERGY_SYSTEM_PROMPT},
+            {"role": "user", "content": prompt}
+        ]
+
+    def _chat(self, prompt: str) -> str:
         try:
-            messages = [
-                {"role": "system", "content": ENERGY_SYSTEM_PROMPT},
-                {"role": "user", "content": prompt}
-                ]
             resp = self.client.chat.completions.create(
                 model=self.model_name,
-                messages=messages,
+                messages=self._messages(prompt),
                 temperature=self.temperature,
                 max_tokens=self.max_tokens,
             )
             return resp.choices[0].message.content.strip()
         except Exception as e:
             raise APIConnectionError(f"OpenAI API 调用失败: {e}")
+
+    async def _achat(self, prompt: str) -> str:
+        try:
+            resp = await self._async_client().chat.completions.create(
+                model=self.model_name,
+                messages=self._messages(prompt),
+                temperature=self.temperature,
+                max_tokens=self.max_tokens,
+            )
+            return resp.choices[0].message.content.strip()
+        except Exception as e:
+            raise APIConnectionError(f"OpenAI API 调用失败: {e}")
+
+    def _stream(self, prompt: str) -> Iterator[str]:
+        #流式调用，逐段返回生成的文本
+        try:
+            resp = self.client.chat.completions.create(
+                model=self.model_name,
+                messages=self._messages(prompt),
+                temperature=self.temperature,
+                max_tokens=self.max_tokens,
+                stream=True,
+            )
+            for chunk in resp:
+                if chunk.choices and chunk.choices[0].delta.content:
+                    yield chunk.choices[0].delta.content
+        except Exception as e:
+            raise APIConnectionError(f"OpenAI API 调用失败: {e}")
     
     def invoke(self, input: str | dict) -> str:
         """LangChain Runnable 接口实现"""
@@ -90,32 +232,64 @@ class LangChainLLM(BaseLLM, Runnable):
         temperature: float = 0.7, 
         max_tokens: int = 1000,
         api_key: Optional[str] = None,  
-        api_base: Optional[str] = None  
+        api_base: Optional[str] = None,
+        provider: Optional[str] = None,
+        response_cache: Optional[LLMResponseCache] = None
     ):
         self.model_name = model_name
         self.temperature = temperature
         self.max_tokens = max_tokens
+        self.provider = provider
+        self.response_cache = response_cache
+        self._client_kwargs = dict(
+            model=self.model_name,  # 新版参数用 model 替代 model_name（兼容但推荐）
+            temperature=self.temperature,
+            max_tokens=self.max_tokens,
+            api_key=api_key,       # 显式传递 api_key
+            base_url=api_base      # 显式传递 base_url（替代旧版的 openai_api_base）
+        )
         try:
-            self._client = ChatOpenAI(
-                model=self.model_name,  # 新版参数用 model 替代 model_name（兼容但推荐）
-                temperature=self.temperature,
-                max_tokens=self.max_tokens,
-                api_key=api_key,       # 显式传递 api_key
-                base_url=api_base      # 显式传递 base_url（替代旧版的 openai_api_base）
-            )
+            self._client = ChatOpenAI(**self._client_kwargs)
         except Exception as e:
             raise APIConnectionError(f"LangChain OpenAI API 连接失败: {e}")
+        self._loop_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, ChatOpenAI]" = weakref.WeakKeyDictionary()
 
-    def chat(self, prompt: str) -> str:
+    def _create_async_client(self) -> "ChatOpenAI":
+        #ChatOpenAI 默认的异步 HTTP 客户端在进程内共享，这里为每个事件循环单独提供一个
+        try:
+            return ChatOpenAI(**self._client_kwargs, http_async_client=DefaultAsyncHttpxClient())
+        except Exception as e:
+            raise APIConnectionError(f"LangChain OpenAI API 连接失败: {e}")
+
+    @staticmethod
+    def _messages(prompt: str) -> list:
+        return [
+            SystemMessage(content=ENERGY_SYSTEM_PROMPT),
+            HumanMessage(content=prompt)
+        ]
+
+    def _chat(self, prompt: str) -> str:
+        try:
+            resp = self._client.invoke(self._messages(prompt))
+            return resp.content.strip()
+        except Exception as e:
+            raise APIConnectionError(f"LangChain OpenAI API 调用失败: {e}")
+
+    async def _achat(self, prompt: str) -> str:
         try:
-            messages = [
-                SystemMessage(content=ENERGY_SYSTEM_PROMPT),
-                HumanMessage(content=prompt)
-            ]
-            resp = self._client.invoke(messages)
+            resp = await self._async_client().ainvoke(self._messages(prompt))
             return resp.content.strip()
         except Exception as e:
             raise APIConnectionError(f"LangChain OpenAI API 调用失败: {e}")
+
+    def _stream(self, prompt: str) -> Iterator[str]:
+        #流式调用，逐段返回生成的文本
+        try:
+            for chunk in self._client.stream(self._messages(prompt)):
+                if chunk.content:
+                    yield chunk.content
+        except Exception as e:
+            raise APIConnectionError(f"LangChain OpenAI API 调用失败: {e}")
     
     def invoke(self, input: str | dict) -> str:
         """LangChain Runnable 接口实现"""
@@ -126,6 +300,10 @@ class LangChainLLM(BaseLLM, Runnable):
 
 class LLMFactory:
     #create and manager LLM instances
+    #按最终配置缓存已创建的实例，重复请求复用同一客户端及其 keep-alive 连接
+    _cache: "OrderedDict[tuple, BaseLLM]" = OrderedDict()
+    _cache_lock = threading.Lock()
+
     @staticmethod
     def create_llm(
         provider: Optional["str"] = None,
@@ -133,9 +311,10 @@ class LLMFactory:
         temperature: Optional[float] = None,
         max_tokens: Optional[int] = None,
         api_key: Optional[str] = None,
-        api_base: Optional[str] = None
+        api_base: Optional[str] = None,
+        use_cache: bool = True
     ) -> BaseLLM:
-        #返回具体LLM实例
+        #返回具体LLM实例；use_cache 为 False 时总是新建
 
         config = get_llm_config(provider)
 
@@ -156,44 +335,76 @@ class LLMFactory:
                 f"[{config['provider'].upper()} 配置错误] API Key 未配置或为默认值。"
                 f"请在 .env 文件中检查相关配置。"
             )
-    
+
+        if not use_cache or LLM_CLIENT_CACHE_SIZE <= 0:
+            return LLMFactory._build_llm(config)
+
+        key = (config["provider"], config["model_name"], config["temperature"], config["max_tokens"],
+               config["api_key"], config["api_base"])
+        with LLMFactory._cache_lock:
+            llm = LLMFactory._cache.get(key)
+            if llm is not None:
+                LLMFactory._cache.move_to_end(key)
+                return llm
+
+        llm = LLMFactory._build_llm(config)
+        with LLMFactory._cache_lock:
+            #并发创建时保留先放入的实例
+            llm = LLMFactory._cache.setdefault(key, llm)
+            LLMFactory._cache.move_to_end(key)
+            while len(LLMFactory._cache) > LLM_CLIENT_CACHE_SIZE:
+                LLMFactory._cache.popitem(last=False)
+        return llm
+
+    @staticmethod
+    def clear_cache() -> None:
+        with LLMFactory._cache_lock:
+            LLMFactory._cache.clear()
+
+    @staticmethod
+    def _build_llm(config: dict) -> BaseLLM:
+        common = {
+            "model_name": config["model_name"],
+            "temperature": config["temperature"],
+            "max_tokens": config["max_tokens"],
+            "api_key": config["api_key"],
+            "api_base": config["api_base"],
+            "provider": config["provider"],
+            "response_cache": get_response_cache() if LLM_CACHE_ENABLED else None,
+        }
         if LANGCHAIN_AVAILABLE:
             try:
                 #优先使用langchain
-                return LangChainLLM(
-                    model_name=config["model_name"],
-                    temperature=config["temperature"],
-                    max_tokens=config["max_tokens"],
-                    api_key=config["api_key"],
-                    api_base=config["api_base"]
-                )
+                return LangChainLLM(**common)
             except Exception as e:
                 print(f"LangChain 调用失败，回退到原生 OpenAI：{e}")
-                return OpenAIPythonLLM(
-                    model_name=config["model_name"],
-                    api_key=config["api_key"],
-                    api_base=config["api_base"],
-                    temperature=config["temperature"],
-                    max_tokens=config["max_tokens"]
-                )
+                return OpenAIPythonLLM(**common)
         else:
-            return OpenAIPythonLLM(
-                model_name=config["model_name"],
-                api_key=config["api_key"],
-                api_base=config["api_base"],
-                temperature=config["temperature"],
-                max_tokens=config["max_tokens"]
-            )
+            return OpenAIPythonLLM(**common)
     
     @staticmethod
     def test_connection() -> Tuple[bool, str]:
         try:
             llm = get_llm()
-            out = llm.chat("请回复 短句: 连接成功")
+            #直接请求模型，不经过回复缓存，否则缓存命中时无法反映当前连接状态
+            out = llm._chat("请回复 短句: 连接成功")
             return True, out
         except Exception as e:
             return False, str(e)
         
+_response_cache: Optional[LLMResponseCache] = None
+_response_cache_lock = threading.Lock()
+
+
+def get_response_cache() -> LLMResponseCache:
+    #进程内共享的 LLM 回复缓存，首次使用时打开
+    global _response_cache
+    with _response_cache_lock:
+        if _response_cache is None:
+            _response_cache = LLMResponseCache()
+        return _response_cache
+
+
 def get_llm(
     provider: Optional[str] = None,
     model_name: Optional[str] = None,
@@ -0,0 +1,65 @@
+"""LLM 回复缓存模块，按 (提供者, 模型, 参数, 系统提示词, 提示词) 的哈希将完整回复持久化到本地磁盘。
+
+只做精确匹配：任何一项不同都视为不同请求。回复存入 SQLite，淘汰与容量统计由 SQLiteLRUCache 统一处理。
+"""
+
+import json
+import time
+import sqlite3
+import hashlib
+from typing import Optional
+
+from ..config import LLM_CACHE_PATH, LLM_CACHE_MAX_ENTRIES, LLM_CACHE_MAX_BYTES
+from ..sqlite_cache import SQLiteLRUCache
+
+
+def make_response_key(provider: Optional[str], model: str, temperature: float, max_tokens: int,
+                      system_prompt: str, prompt: str) -> str:
+    #请求的所有决定回复的要素序列化后取哈希
+    payload = json.dumps(
+        [provider, model, temperature, max_tokens, system_prompt, prompt], ensure_ascii=False
+    )
+    return hashlib.sha256(payload.encode("utf-8", errors="surrogatepass")).hexdigest()
+
+
+class LLMResponseCache(SQLiteLRUCache):
+    """基于 SQLite 的 LLM 回复缓存，线程安全，可由多个进程共享同一文件。"""
+
+    table = "responses"
+    columns = ("key", "model", "response", "created_at", "last_access")
+    key_columns = ("key",)
+    size_column = "response"
+
+    def __init__(self, path: str = LLM_CACHE_PATH,
+                 max_entries: int = LLM_CACHE_MAX_ENTRIES,
+                 max_bytes: int = LLM_CACHE_MAX_BYTES):
+        super().__init__(path, max_entries, max_bytes)
+
+    def _create_tables(self, conn: sqlite3.Connection) -> None:
+        conn.execute(
+            """CREATE TABLE IF NOT EXISTS responses (
+                key TEXT PRIMARY KEY,
+                model TEXT NOT NULL,
+                response TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                last_access REAL NOT NULL
+            )"""
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_responses_access ON responses(last_access)")
+
+    def get(self, key: str) -> Optional[str]:
+        #读取回复并刷新访问时间，未命中返回 None
+        with self._lock:
+            row = self._conn.execute("SELECT response FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self._conn.execute("UPDATE responses SET last_access = ? WHERE key = ?", (time.time(), key))
+            self._conn.commit()
+            self.hits += 1
+            return row[0]
+
+    def put(self, key: str, model: str, response: str) -> None:
+        #写入回复并按需淘汰
+        now = time.time()
+        self._put_rows([(key, model, response, now, now)])
@@ -3,5 +3,9 @@
 from .document_processor import DocumentProcessor
 from .vector_store import VectorStoreManager, EmbeddingFactory
 from .rag_chain import RAGChain
+from .ingest_pipeline import IngestPipeline
+from .dir_sync import DirectorySync
+from .answer_cache import SemanticAnswerCache
 
-__all__ = ["DocumentProcessor", "VectorStoreManager", "RAGChain", "EmbeddingFactory"]
\ No newline at end of file
+__all__ = ["DocumentProcessor", "VectorStoreManager", "RAGChain", "EmbeddingFactory", "IngestPipeline", "DirectorySync",
+           "SemanticAnswerCache"]
\ No newline at end of file
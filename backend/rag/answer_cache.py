@@ -0,0 +1,133 @@
+"""语义回答缓存：相似问题直接返回已生成的回答与来源，跳过检索和 LLM 调用。
+
+问题向量保存在一个 NumPy 矩阵中，查找时一次矩阵乘法算出与全部已缓存问题的余弦相似度。
+每个条目记录生成它的链参数（模型、检索方式等），只在参数相同时命中；
+缓存绑定集合内容的版本标识，集合写入、删除或切换版本后整体失效。
+"""
+
+import time
+import threading
+from typing import List, Dict, Any, Optional, Hashable
+
+import numpy as np
+
+from ..config import ANSWER_CACHE_THRESHOLD, ANSWER_CACHE_TTL, ANSWER_CACHE_MAX_ENTRIES
+
+
+class SemanticAnswerCache:
+    """进程内的语义回答缓存，按 TTL 过期、按最近使用淘汰，线程安全。"""
+
+    def __init__(self, threshold: float = ANSWER_CACHE_THRESHOLD, ttl: float = ANSWER_CACHE_TTL,
+                 max_entries: int = ANSWER_CACHE_MAX_ENTRIES):
+        """
+        Args:
+            threshold: 命中所需的最低余弦相似度
+            ttl: 条目有效期（秒），不大于 0 表示不过期
+            max_entries: 条目数上限
+        """
+        self.threshold = threshold
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._version: Optional[str] = None
+        self._vectors: Optional[np.ndarray] = None
+        self._entries: List[Dict[str, Any]] = []
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._entries)
+
+    @staticmethod
+    def _normalize(embedding) -> np.ndarray:
+        vector = np.asarray(embedding, dtype=np.float32)
+        return vector / max(float(np.linalg.norm(vector)), 1e-12)
+
+    def _check_version_locked(self, version: str) -> None:
+        #集合内容变化后清空，调用方持有锁
+        if version != self._version:
+            self._version = version
+            self._vectors = None
+            self._entries = []
+
+    def _remove_locked(self, rows: List[int]) -> None:
+        if not rows:
+            return
+        remove = set(rows)
+        self._entries = [entry for i, entry in enumerate(self._entries) if i not in remove]
+        self._vectors = np.delete(self._vectors, rows, axis=0) if self._entries else None
+
+    def _expire_locked(self, now: float) -> None:
+        if self.ttl > 0:
+            self._remove_locked([i for i, entry in enumerate(self._entries) if now - entry["created_at"] > self.ttl])
+
+    def lookup(self, embedding, version: str, scope: Hashable) -> Optional[Dict[str, Any]]:
+        """查找相似问题的回答。
+
+        Args:
+            embedding: 问题向量
+            version: 集合内容的版本标识
+            scope: 生成回答的链参数，只匹配参数相同的条目
+
+        Returns:
+            dict | None: 命中时为 {"answer", "source_documents", "question", "similarity"}
+        """
+        now = time.time()
+        with self._lock:
+            self._check_version_locked(version)
+            self._expire_locked(now)
+            if self._entries:
+                similarities = self._vectors @ self._normalize(embedding)
+                in_scope = np.fromiter((entry["scope"] == scope for entry in self._entries), dtype=bool)
+                similarities[~in_scope] = -np.inf
+                best = int(np.argmax(similarities))
+                if similarities[best] >= self.threshold:
+                    entry = self._entries[best]
+                    entry["last_access"] = now
+                    self.hits += 1
+                    return {
+                        "answer": entry["answer"],
+                        "source_documents": list(entry["source_documents"]),
+                        "question": entry["question"],
+                        "similarity": float(similarities[best]),
+                    }
+            self.misses += 1
+            return None
+
+    def store(self, embedding, version: str, scope: Hashable, question: str, answer: str,
+              source_documents: list) -> None:
+        """缓存一个回答；version 已过期（集合在生成回答期间发生变化）时不缓存。"""
+        if self.max_entries <= 0:
+            return
+        now = time.time()
+        vector = self._normalize(embedding)
+        with self._lock:
+            if self._version is not None and version != self._version:
+                return
+            self._check_version_locked(version)
+            self._expire_locked(now)
+            overflow = len(self._entries) - self.max_entries + 1
+            if overflow > 0:
+                by_access = sorted(range(len(self._entries)), key=lambda i: self._entries[i]["last_access"])
+                self._remove_locked(by_access[:overflow])
+
+            self._entries.append({
+                "scope": scope,
+                "question": question,
+                "answer": answer,
+                "source_documents": list(source_documents),
+                "created_at": now,
+                "last_access": now,
+            })
+            self._vectors = vector[None, :] if self._vectors is None else np.vstack([self._vectors, vector])
+
+    def clear(self) -> None:
+        with self._lock:
+            self._version = None
+            self._vectors = None
+            self._entries = []
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses}
@@ -0,0 +1,164 @@
+"""目录增量同步：用文件清单（路径、大小、修改时间、内容哈希、分块 id）跟踪已入库的文件，
+只重新入库新增或变化的文件，并删除已移除文件的分块。
+
+分块 id 由来源与内容哈希确定，文件变化时未改动的分块 id 不变，会被跳过而不重新嵌入；
+旧版本中不再存在的分块在新分块写入后删除，同步过程中查询不会出现空窗。
+"""
+
+import os
+import json
+import time
+import hashlib
+from typing import Optional, Dict, Any
+
+from .document_processor import DocumentProcessor
+from .vector_store import VectorStoreManager
+
+MANIFEST_FILE = "sync_manifest.json"
+MANIFEST_VERSION = 1
+
+
+def file_sha256(file_path: str, block_size: int = 1 << 20) -> str:
+    #流式计算文件内容哈希
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class DirectorySync:
+    """将一个文档目录与向量存储集合保持同步。"""
+
+    def __init__(self, vector_store_manager: VectorStoreManager, doc_processor: Optional[DocumentProcessor] = None):
+        self.vector_store_manager = vector_store_manager
+        self.doc_processor = doc_processor or DocumentProcessor()
+
+    @property
+    def manifest_path(self) -> str:
+        #清单随向量存储的代一起保存，重建或重置后自动失效
+        return os.path.join(self.vector_store_manager.store_directory, MANIFEST_FILE)
+
+    def load_manifest(self) -> Dict[str, Dict[str, Any]]:
+        #读取清单，格式错误或版本不符时视为空清单（之后按内容哈希重新比对）
+        try:
+            with open(self.manifest_path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            if data.get("version") == MANIFEST_VERSION:
+                return data.get("files", {})
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            print(f"[警告] 同步清单读取失败，将重新比对所有文件: {e}")
+        return {}
+
+    def save_manifest(self, files: Dict[str, Dict[str, Any]]) -> None:
+        #先写临时文件再原子替换，避免中断时留下半个清单
+        tmp_path = self.manifest_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"version": MANIFEST_VERSION, "files": files}, f, ensure_ascii=False)
+        os.replace(tmp_path, self.manifest_path)
+
+    def plan(self, dir_path: str) -> Dict[str, Any]:
+        """比对目录与清单，返回 {"new", "changed", "removed", "unchanged", "stats"}。
+
+        大小与修改时间都未变的文件直接视为未变化；否则计算内容哈希再判断。
+        """
+        manifest = self.load_manifest()
+        dir_abs = os.path.abspath(dir_path)
+        current = [os.path.abspath(p) for p in self.doc_processor.list_doc_files(dir_abs)]
+
+        plan = {"new": [], "changed": [], "removed": [], "unchanged": [], "stats": {}}
+        for file_path in current:
+            stat = os.stat(file_path)
+            entry = manifest.get(file_path)
+            file_stat = {"size": stat.st_size, "mtime": stat.st_mtime_ns}
+
+            if entry and entry["size"] == stat.st_size and entry["mtime"] == stat.st_mtime_ns:
+                plan["unchanged"].append(file_path)
+                continue
+
+            file_stat["sha256"] = file_sha256(file_path)
+            plan["stats"][file_path] = file_stat
+            if entry is None:
+                plan["new"].append(file_path)
+            elif entry["sha256"] == file_stat["sha256"]:
+                #内容未变（如仅 touch），只更新清单中的时间
+                plan["unchanged"].append(file_path)
+            else:
+                plan["changed"].append(file_path)
+
+        current_set = set(current)
+        plan["removed"] = [
+            file_path for file_path in manifest
+            if os.path.dirname(file_path) == dir_abs and file_path not in current_set
+        ]
+        return plan
+
+    def sync(self, dir_path: str, dry_run: bool = False) -> Dict[str, Any]:
+        """同步目录：入库新增/变化的文件，删除已移除文件的分块，并更新清单。
+
+        Returns:
+            dict: 各类文件列表、分块增删数、失败文件与耗时
+        """
+        manager = self.vector_store_manager
+        if manager.vector_store is None:
+            manager.load_vector_store()
+        manager.refresh()
+
+        start_time = time.perf_counter()
+        plan = self.plan(dir_path)
+        result = {
+            "success": True,
+            "new_files": plan["new"],
+            "changed_files": plan["changed"],
+            "removed_files": plan["removed"],
+            "unchanged_files": len(plan["unchanged"]),
+            "chunks_added": 0,
+            "chunks_skipped": 0,
+            "chunks_deleted": 0,
+            "failed_files": [],
+            "elapsed": 0.0,
+        }
+        if dry_run:
+            result["elapsed"] = time.perf_counter() - start_time
+            return result
+
+        manifest = self.load_manifest()
+
+        #仅时间变化的文件
+        for file_path in plan["unchanged"]:
+            if file_path in plan["stats"]:
+                manifest[file_path].update(plan["stats"][file_path])
+
+        to_ingest = plan["new"] + plan["changed"]
+        for file_path, chunks, error in self.doc_processor.iter_process_files(to_ingest, split=True):
+            if error:
+                #解析失败时保留旧分块与清单项，下次同步重试
+                print(f"警告:{error}")
+                result["failed_files"].append({"path": file_path, "error": error})
+                continue
+
+            for chunk in chunks:
+                chunk.metadata["source"] = file_path
+            #分块 id 只计算一次：既写入清单，也交给 add_documents 跳过已入库的分块
+            chunk_ids, unique_chunks = manager.prepare_chunks(chunks, skip_existing=False)
+            ingest = manager.add_documents(unique_chunks, chunk_ids=chunk_ids)
+            result["chunks_added"] += ingest["added"]
+            result["chunks_skipped"] += len(chunks) - ingest["added"]
+
+            old_ids = set(manifest.get(file_path, {}).get("chunk_ids", []))
+            stale_ids = sorted(old_ids - set(chunk_ids))
+            if stale_ids:
+                result["chunks_deleted"] += manager.delete_documents(ids=stale_ids)["deleted"]
+
+            manifest[file_path] = dict(plan["stats"][file_path], chunk_ids=chunk_ids)
+
+        for file_path in plan["removed"]:
+            stale_ids = manifest.pop(file_path, {}).get("chunk_ids", [])
+            if stale_ids:
+                result["chunks_deleted"] += manager.delete_documents(ids=stale_ids)["deleted"]
+
+        self.save_manifest(manifest)
+        result["elapsed"] = time.perf_counter() - start_time
+        return result
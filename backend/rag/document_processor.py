@@ -2,29 +2,70 @@
 
 import os
 import dashscope
-from typing import List, Optional, Dict, Any
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Optional, Dict, Any, Iterator, Tuple
 from langchain_community.document_loaders import PyPDFLoader, TextLoader, Docx2txtLoader
 from langchain_text_splitters import RecursiveCharacterTextSplitter
 from langchain_core.documents import Document
 from http import HTTPStatus
 
-from ..config import DEFAULT_CHUNK_SIZE, DEFAULT_CHUNK_OVERLAP, SUPPORTED_DOCUMENT_EXTENSIONS, DASHSCOPE_API_KEY
+from ..config import (
+    DEFAULT_CHUNK_SIZE, DEFAULT_CHUNK_OVERLAP, SUPPORTED_DOCUMENT_EXTENSIONS, DASHSCOPE_API_KEY,
+    DEFAULT_LOAD_WORKERS
+)
 from ..exceptions import DocumentProcessingError, APIConnectionError
 from ..utils import validate_file_ext
 
+_DEFAULT_SEPARATORS = ["\n\n", "\n", " ", ""]
+
+#工作进程内按切分参数复用的处理器，避免每个文件重建切分器
+_worker_processors: Dict[Tuple, "DocumentProcessor"] = {}
+
+
+def _process_file(processor: "DocumentProcessor", file_path: str, split: bool) -> Tuple[str, List[Document], Optional[str]]:
+    #加载（并可选切分）单个文件，异常转为错误信息返回，互不影响
+    try:
+        docs = processor.load_document(file_path) or []
+        if split and docs:
+            docs = processor.split_documents(docs)
+        return file_path, docs, None
+    except Exception as e:
+        return file_path, [], str(e)
+
+
+def _process_file_worker(file_path: str, splitter_settings: Dict[str, Any], split: bool) -> Tuple[str, List[Document], Optional[str]]:
+    #进程池工作函数：按父进程处理器的切分参数处理单个文件
+    key = tuple(
+        (name, tuple(value) if isinstance(value, list) else value) for name, value in sorted(splitter_settings.items())
+    )
+    processor = _worker_processors.get(key)
+    if processor is None:
+        processor = DocumentProcessor(load_workers=1, **splitter_settings)
+        _worker_processors[key] = processor
+    return _process_file(processor, file_path, split)
+
+
 #load and split documents
 class DocumentProcessor:
-    def __init__(self, chunk_size: int=DEFAULT_CHUNK_SIZE, chunk_overlap: int=DEFAULT_CHUNK_OVERLAP):
+    def __init__(self, chunk_size: int=DEFAULT_CHUNK_SIZE, chunk_overlap: int=DEFAULT_CHUNK_OVERLAP,
+                 load_workers: int=DEFAULT_LOAD_WORKERS, separators: Optional[List[str]]=None):
 
         self.chunk_size = chunk_size
         self.chunk_overlap = chunk_overlap
+        self.load_workers = load_workers
+        self.separators = list(separators) if separators is not None else list(_DEFAULT_SEPARATORS)
         self.text_splitter = RecursiveCharacterTextSplitter(
             chunk_size=chunk_size,
             chunk_overlap=chunk_overlap,
             length_function=len,
-            separators=["\n\n", "\n", " ", ""]
+            separators=self.separators
         )
 
+    def _splitter_settings(self) -> Dict[str, Any]:
+        #传给工作进程的切分参数，与本实例的切分器一致
+        return {"chunk_size": self.chunk_size, "chunk_overlap": self.chunk_overlap, "separators": self.separators}
+
     def load_document(self, file_path: str) -> Optional[List[Document]]:
         #加载文档
         if not os.path.exists(file_path):
@@ -49,24 +90,67 @@ class DocumentProcessor:
         except Exception as e:
             raise DocumentProcessingError(f"加载文档 {file_path} 时出错: {e}")
         
-    def load_doc_from_dir(self, dir_path: str) -> List[Document]:
-        #load all supported documents from a directory
-        documents = []
-
+    def list_doc_files(self, dir_path: str) -> List[str]:
+        #列出目录下支持的文档文件（按文件名排序）
         if not os.path.isdir(dir_path):
             raise DocumentProcessingError(f"目录不存在: {dir_path}")
-        
-        for file_name in os.listdir(dir_path):
-            file_ext = os.path.splitext(file_name)[1].lower()
-            if file_ext in SUPPORTED_DOCUMENT_EXTENSIONS:
-                file_path = os.path.join(dir_path, file_name)
+
+        return [
+            os.path.join(dir_path, file_name)
+            for file_name in sorted(os.listdir(dir_path))
+            if os.path.splitext(file_name)[1].lower() in SUPPORTED_DOCUMENT_EXTENSIONS
+        ]
+
+    def iter_process_files(self, file_paths: List[str], split: bool = True,
+                           workers: Optional[int] = None) -> Iterator[Tuple[str, List[Document], Optional[str]]]:
+        """按输入顺序逐个产出 (文件路径, 文档或分块, 错误信息)。
+
+        workers 大于 1 时使用进程池并行解析（PDF/docx 解析是 CPU 密集型），
+        同时在途的文件不超过 2 * workers 个，内存占用有界。单个文件出错只影响该文件。
+        """
+        workers = self.load_workers if workers is None else workers
+        if workers <= 1 or len(file_paths) <= 1:
+            for file_path in file_paths:
+                yield _process_file(self, file_path, split)
+            return
+
+        splitter_settings = self._splitter_settings()
+
+        executor = ProcessPoolExecutor(max_workers=workers)
+        try:
+            paths = iter(file_paths)
+            pending = deque()
+
+            def submit_next() -> None:
+                file_path = next(paths, None)
+                if file_path is not None:
+                    pending.append((file_path, executor.submit(
+                        _process_file_worker, file_path, splitter_settings, split
+                    )))
+
+            for _ in range(workers * 2):
+                submit_next()
+
+            while pending:
+                file_path, future = pending.popleft()
                 try:
-                    docs = self.load_document(file_path)
-                    if docs:
-                        documents.extend(docs)
-                except DocumentProcessingError as e:
-                    print(f"警告:{e}")
-                    continue
+                    result = future.result()
+                except Exception as e:
+                    result = (file_path, [], str(e))
+                submit_next()
+                yield result
+        finally:
+            executor.shutdown(wait=True, cancel_futures=True)
+
+    def load_doc_from_dir(self, dir_path: str, workers: Optional[int] = None) -> List[Document]:
+        #load all supported documents from a directory
+        documents = []
+
+        for file_path, docs, error in self.iter_process_files(self.list_doc_files(dir_path), split=False, workers=workers):
+            if error:
+                print(f"警告:{error}")
+                continue
+            documents.extend(docs)
 
         return documents
     
@@ -81,10 +165,17 @@ class DocumentProcessor:
             return []
         return self.split_documents(documents)
     
-    def process_docu_dir(self, dir_path: str) -> List[Document]:
+    def iter_docu_dir(self, dir_path: str, workers: Optional[int] = None) -> Iterator[Tuple[str, List[Document]]]:
+        #逐个文件加载并切分，内存中只保留少量文件的分块
+        for file_path, chunks, error in self.iter_process_files(self.list_doc_files(dir_path), split=True, workers=workers):
+            if error:
+                print(f"警告:{error}")
+                continue
+            yield file_path, chunks
+
+    def process_docu_dir(self, dir_path: str, workers: Optional[int] = None) -> List[Document]:
         #load and split documents in a directory
-        documents = self.load_doc_from_dir(dir_path)
-        return self.split_documents(documents)
+        return [chunk for _, chunks in self.iter_docu_dir(dir_path, workers=workers) for chunk in chunks]
     
     def process_img_embed(self, image_path: str) -> Optional[List[float]]:
         #process image embedding
@@ -0,0 +1,197 @@
+"""嵌入缓存模块，按 (模型标识, 文本哈希) 将嵌入向量持久化到本地磁盘。
+
+向量以 float32 二进制形式存入 SQLite，淘汰与容量统计由 SQLiteLRUCache 统一处理。
+"""
+
+import time
+import sqlite3
+import hashlib
+from typing import List, Dict, Any, Optional
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+from ..config import EMBEDDING_CACHE_PATH, EMBEDDING_CACHE_MAX_ENTRIES, EMBEDDING_CACHE_MAX_BYTES
+from ..sqlite_cache import SQLiteLRUCache, SQL_BATCH
+
+
+class UncachedVectors(list):
+    """不应写入缓存的嵌入结果，例如嵌入服务失败时由回退模型生成的向量。
+
+    回退模型与缓存键所标识的模型不同（维度也可能不同），写入缓存会在服务恢复后继续返回错误的向量。
+    """
+
+
+def _single(vector: List[float]) -> List[List[float]]:
+    #单个查询向量包装为列表，保留不缓存标记
+    return UncachedVectors([vector]) if isinstance(vector, UncachedVectors) else [vector]
+
+
+def get_embedding_model_id(embeddings: Embeddings) -> str:
+    #生成嵌入模型标识：类名 + 模型名
+    if isinstance(embeddings, CachedEmbeddings):
+        return embeddings.model_id
+    model = getattr(embeddings, "model", None) or getattr(embeddings, "model_name", None) or ""
+    return f"{type(embeddings).__name__}:{model}"
+
+
+def _text_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8", errors="surrogatepass")).hexdigest()
+
+
+class EmbeddingCache(SQLiteLRUCache):
+    """基于 SQLite 的嵌入向量存储，线程安全。"""
+
+    table = "embeddings"
+    columns = ("model", "text_hash", "dim", "vector", "last_access")
+    key_columns = ("model", "text_hash")
+    size_column = "vector"
+
+    def __init__(self, path: str = EMBEDDING_CACHE_PATH,
+                 max_entries: int = EMBEDDING_CACHE_MAX_ENTRIES,
+                 max_bytes: int = EMBEDDING_CACHE_MAX_BYTES):
+        super().__init__(path, max_entries, max_bytes)
+
+    def _create_tables(self, conn: sqlite3.Connection) -> None:
+        conn.execute(
+            """CREATE TABLE IF NOT EXISTS embeddings (
+                model TEXT NOT NULL,
+                text_hash TEXT NOT NULL,
+                dim INTEGER NOT NULL,
+                vector BLOB NOT NULL,
+                last_access REAL NOT NULL,
+                PRIMARY KEY (model, text_hash)
+            )"""
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_embeddings_access ON embeddings(last_access)")
+
+    def get_many(self, model: str, hashes: List[str]) -> Dict[str, np.ndarray]:
+        #批量读取，返回 {text_hash: float32 向量}，并刷新访问时间
+        found: Dict[str, np.ndarray] = {}
+        if not hashes:
+            return found
+
+        with self._lock:
+            for i in range(0, len(hashes), SQL_BATCH):
+                batch = hashes[i:i + SQL_BATCH]
+                placeholders = ",".join("?" * len(batch))
+                rows = self._conn.execute(
+                    f"SELECT text_hash, vector FROM embeddings WHERE model = ? AND text_hash IN ({placeholders})",
+                    [model, *batch]
+                ).fetchall()
+                for text_hash, blob in rows:
+                    found[text_hash] = np.frombuffer(blob, dtype=np.float32)
+
+            if found:
+                now = time.time()
+                self._conn.executemany(
+                    "UPDATE embeddings SET last_access = ? WHERE model = ? AND text_hash = ?",
+                    [(now, model, h) for h in found]
+                )
+                self._conn.commit()
+
+            self.hits += len(found)
+            self.misses += len(hashes) - len(found)
+        return found
+
+    def put_many(self, model: str, items: Dict[str, List[float]]) -> None:
+        #批量写入并按需淘汰
+        now = time.time()
+        rows = []
+        for text_hash, vector in items.items():
+            arr = np.asarray(vector, dtype=np.float32)
+            rows.append((model, text_hash, int(arr.shape[0]), arr.tobytes(), now))
+        self._put_rows(rows)
+
+
+class CachedEmbeddings(Embeddings):
+    """包装任意嵌入模型，对文档和查询嵌入做持久化缓存。"""
+
+    def __init__(self, embeddings: Embeddings, cache: Optional[EmbeddingCache] = None):
+        self.embeddings = embeddings
+        self.model_id = get_embedding_model_id(embeddings)
+        self.cache = cache or EmbeddingCache()
+
+    def _lookup(self, texts: List[str], model: str):
+        #返回 (各文本哈希, 已命中的向量, 未命中的文本)
+        hashes = [_text_hash(text) for text in texts]
+        found = self.cache.get_many(model, list(dict.fromkeys(hashes)))
+
+        #同一批内的重复文本只嵌入一次
+        missing: Dict[str, str] = {}
+        for text_hash, text in zip(hashes, texts):
+            if text_hash not in found and text_hash not in missing:
+                missing[text_hash] = text
+        return hashes, found, missing
+
+    def _fill(self, hashes: List[str], found: Dict[str, np.ndarray], missing: Dict[str, str],
+              vectors: List[List[float]], model: str) -> List[List[float]]:
+        #写入新嵌入的向量并按输入顺序返回；回退模型的结果只返回，不写入缓存
+        if missing:
+            new_items = dict(zip(missing.keys(), vectors))
+            if not isinstance(vectors, UncachedVectors):
+                self.cache.put_many(model, new_items)
+            for text_hash, vector in new_items.items():
+                found[text_hash] = np.asarray(vector, dtype=np.float32)
+        result = [found[text_hash].tolist() for text_hash in hashes]
+        return UncachedVectors(result) if isinstance(vectors, UncachedVectors) else result
+
+    def _embed_with_cache(self, texts: List[str], model: str, embed_func) -> List[List[float]]:
+        hashes, found, missing = self._lookup(texts, model)
+        vectors = embed_func(list(missing.values())) if missing else []
+        return self._fill(hashes, found, missing, vectors, model)
+
+    async def _aembed_with_cache(self, texts: List[str], model: str, aembed_func) -> List[List[float]]:
+        #缓存读写为本地 SQLite 操作，直接同步执行；仅未命中部分异步嵌入
+        hashes, found, missing = self._lookup(texts, model)
+        vectors = await aembed_func(list(missing.values())) if missing else []
+        return self._fill(hashes, found, missing, vectors, model)
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        """嵌入文档列表，仅对未命中缓存的文本调用底层模型。"""
+        if not texts:
+            return []
+        return self._embed_with_cache(texts, self.model_id, self.embeddings.embed_documents)
+
+    def embed_query(self, text: str) -> List[float]:
+        """嵌入单个查询；部分提供者对查询与文档使用不同的嵌入方式，故单独缓存。"""
+        return self._embed_with_cache(
+            [text], f"{self.model_id}#query",
+            lambda texts: _single(self.embeddings.embed_query(texts[0]))
+        )[0]
+
+    def embed_queries(self, texts: List[str]) -> List[List[float]]:
+        """批量嵌入查询，未命中的查询合并为一次底层 embed_documents 调用。
+
+        结果即文档嵌入，因此与文档共用缓存命名空间，不写入 embed_query 的查询命名空间，
+        同一文本的向量不会因先由哪种调用写入缓存而不同。
+        """
+        return self.embed_documents(texts)
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        """异步嵌入文档列表，仅对未命中缓存的文本调用底层模型。"""
+        if not texts:
+            return []
+        return await self._aembed_with_cache(texts, self.model_id, self.embeddings.aembed_documents)
+
+    async def aembed_query(self, text: str) -> List[float]:
+        """异步嵌入单个查询。"""
+
+        async def embed_one(texts: List[str]) -> List[List[float]]:
+            return _single(await self.embeddings.aembed_query(texts[0]))
+
+        return (await self._aembed_with_cache([text], f"{self.model_id}#query", embed_one))[0]
+
+    async def aembed_queries(self, texts: List[str]) -> List[List[float]]:
+        """异步批量嵌入查询，缓存命名空间同 embed_queries。"""
+        return await self.aembed_documents(texts)
+
+    def stats(self) -> Dict[str, Any]:
+        """返回命中率等缓存统计。"""
+        return self.cache.stats()
+
+    def close(self) -> None:
+        """关闭缓存连接及底层模型持有的资源。"""
+        self.cache.close()
+        if hasattr(self.embeddings, "close"):
+            self.embeddings.close()
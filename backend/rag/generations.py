@@ -0,0 +1,219 @@
+"""向量存储的版本化目录（代）管理。
+
+目录结构::
+
+    <persist_directory>/
+        CURRENT                  当前代的名称，原子替换写入
+        generations/
+            gen-000001/          一个完整的向量存储（Chroma 或 NumPy 后端）
+                .leases/         正在使用该代的读者登记
+            gen-000002/
+
+重建或重置时写入新的代，完成后原子切换 CURRENT；旧代在没有读者登记后被删除。
+读者登记文件名为 "<pid>-<随机串>"，进程退出后遗留的登记会在回收时清理。
+
+没有 CURRENT 文件时，persist_directory 本身视为旧版布局的当前代（名称为 None）。
+"""
+
+import os
+import re
+import uuid
+import shutil
+from typing import List, Optional, Tuple
+
+from ..exceptions import VectorStoreError
+from ..utils import ensure_dir_exists
+
+POINTER_FILE = "CURRENT"
+GENERATIONS_DIR = "generations"
+LEASES_DIR = ".leases"
+
+_GENERATION_RE = re.compile(r"^gen-(\d{6,})$")
+# 旧版布局中由向量存储写入的文件
+_LEGACY_ENTRY_RE = re.compile(
+    r"^(chroma\.sqlite3.*|[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}|.+\.npstore"
+    r"|.+\.keywords\.sqlite3.*|.+\.version|sync_manifest\.json)$"
+)
+
+
+def _generation_number(name: str) -> int:
+    #代名称中的序号；按整数比较，超过 6 位后仍然有序
+    return int(_GENERATION_RE.match(name).group(1))
+
+
+def _pid_alive(pid: int) -> bool:
+    #判断进程是否仍在运行
+    if pid == os.getpid():
+        return True
+    if os.name == "nt":
+        import ctypes
+
+        kernel32 = ctypes.windll.kernel32
+        handle = kernel32.OpenProcess(0x1000, False, pid)  # PROCESS_QUERY_LIMITED_INFORMATION
+        if not handle:
+            return False
+        exit_code = ctypes.c_ulong()
+        kernel32.GetExitCodeProcess(handle, ctypes.byref(exit_code))
+        kernel32.CloseHandle(handle)
+        return exit_code.value == 259  # STILL_ACTIVE
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class GenerationStore:
+    """管理一个持久化目录下的各代向量存储、当前代指针与读者登记。"""
+
+    def __init__(self, persist_directory: str):
+        self.persist_directory = persist_directory
+        self.generations_directory = os.path.join(persist_directory, GENERATIONS_DIR)
+        self.pointer_path = os.path.join(persist_directory, POINTER_FILE)
+
+    def current(self) -> Optional[str]:
+        #当前代名称；None 表示旧版布局
+        try:
+            with open(self.pointer_path, "r", encoding="utf-8") as f:
+                name = f.read().strip()
+            return name or None
+        except FileNotFoundError:
+            return None
+
+    def path(self, generation: Optional[str]) -> str:
+        if generation is None:
+            return self.persist_directory
+        return os.path.join(self.generations_directory, generation)
+
+    def list_generations(self) -> List[str]:
+        if not os.path.isdir(self.generations_directory):
+            return []
+        return sorted(
+            (name for name in os.listdir(self.generations_directory) if _GENERATION_RE.match(name)),
+            key=_generation_number
+        )
+
+    def create(self) -> str:
+        """创建新的空代目录并返回名称；多个进程同时创建时名称不会冲突。"""
+        ensure_dir_exists(self.generations_directory)
+        existing = self.list_generations()
+        number = _generation_number(existing[-1]) + 1 if existing else 1
+        while True:
+            name = f"gen-{number:06d}"
+            try:
+                os.makedirs(self.path(name))
+                return name
+            except FileExistsError:
+                number += 1
+
+    def set_current(self, generation: str) -> None:
+        """原子切换当前代。"""
+        tmp_path = f"{self.pointer_path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(generation)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.pointer_path)
+
+    def acquire(self, generation: Optional[str]) -> str:
+        """登记一个读者，返回登记文件路径（释放时传给 release）。
+
+        不会重新创建已被回收的代目录：代目录不存在时抛出 FileNotFoundError。
+        """
+        generation_path = self.path(generation)
+        if generation is None:
+            ensure_dir_exists(generation_path)
+        elif not os.path.isdir(generation_path):
+            raise FileNotFoundError(f"向量存储版本不存在: {generation_path}")
+
+        leases_dir = os.path.join(generation_path, LEASES_DIR)
+        try:
+            os.mkdir(leases_dir)
+        except FileExistsError:
+            pass
+        lease_path = os.path.join(leases_dir, f"{os.getpid()}-{uuid.uuid4().hex}")
+        os.close(os.open(lease_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+        return lease_path
+
+    def acquire_current(self, attempts: int = 5) -> Tuple[Optional[str], str]:
+        """登记当前代的读者，返回 (代名称, 登记文件路径)。
+
+        读取指针与登记之间可能发生切换，旧代随即被回收；登记后再确认该代仍是当前代
+        （当前代不会被回收），否则释放登记并重试。
+        """
+        for _ in range(attempts):
+            generation = self.current()
+            try:
+                lease_path = self.acquire(generation)
+            except FileNotFoundError:
+                continue
+            if self.current() == generation and os.path.exists(lease_path):
+                return generation, lease_path
+            self.release(lease_path)
+        raise VectorStoreError("向量存储版本切换过于频繁，登记读者失败")
+
+    @staticmethod
+    def release(lease_path: Optional[str]) -> None:
+        if not lease_path:
+            return
+        try:
+            os.remove(lease_path)
+        except FileNotFoundError:
+            pass
+
+    def _has_readers(self, generation: Optional[str]) -> bool:
+        #检查是否仍有存活的读者，顺带清理已退出进程遗留的登记
+        leases_dir = os.path.join(self.path(generation), LEASES_DIR)
+        if not os.path.isdir(leases_dir):
+            return False
+        in_use = False
+        for name in os.listdir(leases_dir):
+            try:
+                pid = int(name.split("-", 1)[0])
+            except ValueError:
+                continue
+            if _pid_alive(pid):
+                in_use = True
+            else:
+                self.release(os.path.join(leases_dir, name))
+        return in_use
+
+    def collect(self) -> List[str]:
+        """删除早于当前代且无读者的代，返回已删除的代名称（旧版布局记为 "legacy"）。
+
+        删除失败（如文件仍被占用）时保留该代，留待下次回收。
+        """
+        current = self.current()
+        if current is None:
+            return []
+
+        removed = []
+        for name in self.list_generations():
+            #比当前代新的可能正在被其他进程构建，留到切换后再回收
+            if _generation_number(name) >= _generation_number(current) or self._has_readers(name):
+                continue
+            try:
+                shutil.rmtree(self.path(name))
+                removed.append(name)
+            except OSError as e:
+                print(f"[警告] 旧版本向量存储 {name} 暂时无法删除，将在下次回收时重试: {e}")
+
+        #切换到分代布局后，清理根目录下旧版布局的文件
+        legacy_entries = [
+            name for name in os.listdir(self.persist_directory) if _LEGACY_ENTRY_RE.match(name)
+        ]
+        if legacy_entries and not self._has_readers(None):
+            try:
+                for name in legacy_entries:
+                    entry_path = os.path.join(self.persist_directory, name)
+                    if os.path.isdir(entry_path):
+                        shutil.rmtree(entry_path)
+                    else:
+                        os.remove(entry_path)
+                shutil.rmtree(os.path.join(self.persist_directory, LEASES_DIR), ignore_errors=True)
+                removed.append("legacy")
+            except OSError as e:
+                print(f"[警告] 旧版布局的向量存储文件暂时无法删除，将在下次回收时重试: {e}")
+        return removed
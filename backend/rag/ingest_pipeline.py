@@ -0,0 +1,241 @@
+"""流式入库流水线：加载 → 切分 → 嵌入 → 写入。
+
+各阶段运行在独立线程中，阶段之间用有界队列连接，任意时刻内存中只保留少量文件和批次，
+峰值内存与语料总量无关。写入按批进行，批大小不超过向量存储的单次写入上限。
+"""
+
+import time
+import queue
+import threading
+from typing import List, Optional, Dict, Any, Callable, Iterable
+
+from langchain_core.documents import Document
+
+from ..config import INGEST_QUEUE_SIZE
+from ..exceptions import VectorStoreError
+from .document_processor import DocumentProcessor
+from .vector_store import VectorStoreManager
+
+_DONE = object()
+
+
+def _put(q: queue.Queue, item: Any, stop: threading.Event) -> bool:
+    #带停止检查的阻塞写入，下游出错时不会永久阻塞
+    while not stop.is_set():
+        try:
+            q.put(item, timeout=0.1)
+            return True
+        except queue.Full:
+            continue
+    return False
+
+
+def _get(q: queue.Queue, stop: threading.Event) -> Any:
+    while not stop.is_set():
+        try:
+            return q.get(timeout=0.1)
+        except queue.Empty:
+            continue
+    return _DONE
+
+
+class IngestPipeline:
+    """有界内存的文档入库流水线。
+
+    progress_callback 接收一个字典：stage, current_file, files_done, files_total,
+    chunks_added, chunks_skipped, elapsed, eta（秒，未知时为 None）。
+    回调总在调用 run 的线程中执行。
+    """
+
+    def __init__(
+        self,
+        vector_store_manager: VectorStoreManager,
+        doc_processor: Optional[DocumentProcessor] = None,
+        batch_size: Optional[int] = None,
+        queue_size: int = INGEST_QUEUE_SIZE,
+        skip_existing: bool = True
+    ):
+        self.vector_store_manager = vector_store_manager
+        self.doc_processor = doc_processor or DocumentProcessor()
+        self.batch_size = batch_size
+        self.queue_size = max(1, queue_size)
+        self.skip_existing = skip_existing
+
+    def run_dir(self, dir_path: str, progress_callback: Optional[Callable[[Dict[str, Any]], None]] = None) -> Dict[str, Any]:
+        """入库目录下所有支持的文档。"""
+        return self.run(self.doc_processor.list_doc_files(dir_path), progress_callback=progress_callback)
+
+    def run(
+        self,
+        file_paths: Iterable[str],
+        source_names: Optional[Dict[str, str]] = None,
+        progress_callback: Optional[Callable[[Dict[str, Any]], None]] = None
+    ) -> Dict[str, Any]:
+        """入库文件列表。
+
+        Args:
+            file_paths: 文件路径
+            source_names: 可选，文件路径 -> 写入 metadata["source"] 的名称（如上传时的原文件名）
+            progress_callback: 可选，进度回调
+
+        Returns:
+            dict: {"success", "files", "failed_files", "added", "skipped", "elapsed"}
+        """
+        manager = self.vector_store_manager
+        if manager.vector_store is None:
+            raise VectorStoreError("请先创建或加载向量存储")
+        manager.refresh()
+
+        file_paths = list(file_paths)
+        batch_size = min(self.batch_size or manager.max_batch_size(), manager.max_batch_size())
+        source_names = source_names or {}
+
+        start_time = time.perf_counter()
+        stop = threading.Event()
+        errors: List[Exception] = []
+        stats = {"files_done": 0, "added": 0, "skipped": 0, "current_file": None}
+        failed_files: List[Dict[str, str]] = []
+
+        loaded_q: queue.Queue = queue.Queue(maxsize=self.queue_size)
+        batch_q: queue.Queue = queue.Queue(maxsize=self.queue_size)
+        embedded_q: queue.Queue = queue.Queue(maxsize=self.queue_size)
+
+        def report(stage: str) -> None:
+            if progress_callback is None:
+                return
+            elapsed = time.perf_counter() - start_time
+            files_done = stats["files_done"]
+            eta = elapsed / files_done * (len(file_paths) - files_done) if files_done else None
+            try:
+                progress_callback({
+                    "stage": stage,
+                    "current_file": stats["current_file"],
+                    "files_done": files_done,
+                    "files_total": len(file_paths),
+                    "chunks_added": stats["added"],
+                    "chunks_skipped": stats["skipped"],
+                    "elapsed": elapsed,
+                    "eta": eta,
+                })
+            except Exception as e:
+                print(f"[警告] 进度回调出错: {e}")
+
+        def guarded(stage_func, out_q):
+            #阶段线程出错时通知其他阶段停止，并总是向下游发送结束标记
+            def runner():
+                try:
+                    stage_func()
+                except Exception as e:
+                    errors.append(e)
+                    stop.set()
+                finally:
+                    _put(out_q, _DONE, stop)
+            return threading.Thread(target=runner, daemon=True)
+
+        def load_stage():
+            #doc_processor.load_workers 大于 1 时并行解析
+            for file_path, docs, error in self.doc_processor.iter_process_files(file_paths, split=False):
+                if stop.is_set():
+                    return
+                if error:
+                    print(f"警告:{error}")
+                    failed_files.append({"path": file_path, "error": error})
+                if not _put(loaded_q, (file_path, docs), stop):
+                    return
+
+        def split_stage():
+            buffer: List[Document] = []
+            while True:
+                item = _get(loaded_q, stop)
+                if item is _DONE:
+                    break
+                file_path, docs = item
+                chunks = self.doc_processor.split_documents(docs) if docs else []
+                if file_path in source_names:
+                    for chunk in chunks:
+                        chunk.metadata["source"] = source_names[file_path]
+                buffer.extend(chunks)
+
+                while len(buffer) >= batch_size:
+                    if not _put(batch_q, buffer[:batch_size], stop):
+                        return
+                    buffer = buffer[batch_size:]
+
+                stats["current_file"] = source_names.get(file_path, file_path)
+                stats["files_done"] += 1
+
+            if buffer:
+                _put(batch_q, buffer, stop)
+
+        #已嵌入但尚未写入的分块 id：上一批可能尚未写入，查库查不到，用它去重；写入后移除，内存不随语料增长
+        in_flight = set()
+        in_flight_lock = threading.Lock()
+
+        def embed_stage():
+            while True:
+                batch = _get(batch_q, stop)
+                if batch is _DONE:
+                    break
+                ids, docs = manager.prepare_chunks(batch, skip_existing=False)
+                #先查在途集合再查库：写入阶段先写库再移除 id，两次检查之间写完的分块会被查库发现
+                with in_flight_lock:
+                    pairs = [(chunk_id, doc) for chunk_id, doc in zip(ids, docs) if chunk_id not in in_flight]
+                if self.skip_existing and pairs:
+                    existing = manager._existing_ids([chunk_id for chunk_id, _ in pairs])
+                    pairs = [(chunk_id, doc) for chunk_id, doc in pairs if chunk_id not in existing]
+                ids = [chunk_id for chunk_id, _ in pairs]
+                docs = [doc for _, doc in pairs]
+                with in_flight_lock:
+                    in_flight.update(ids)
+                embeddings = manager.embeddings.embed_documents([doc.page_content for doc in docs]) if docs else []
+                if not _put(embedded_q, (ids, docs, embeddings, len(batch) - len(docs)), stop):
+                    return
+
+        threads = [
+            guarded(load_stage, loaded_q),
+            guarded(split_stage, batch_q),
+            guarded(embed_stage, embedded_q),
+        ]
+        for thread in threads:
+            thread.start()
+
+        #写入阶段与进度回调都在调用线程中执行（Streamlit 只能在脚本线程中更新界面）
+        try:
+            reported_files = 0
+            while not stop.is_set():
+                try:
+                    item = embedded_q.get(timeout=0.1)
+                except queue.Empty:
+                    if stats["files_done"] != reported_files:
+                        reported_files = stats["files_done"]
+                        report("split")
+                    continue
+                if item is _DONE:
+                    break
+                ids, docs, embeddings, skipped = item
+                manager.write_embedded(ids, docs, embeddings)
+                with in_flight_lock:
+                    in_flight.difference_update(ids)
+                stats["added"] += len(ids)
+                stats["skipped"] += skipped
+                reported_files = stats["files_done"]
+                report("write")
+        except Exception as e:
+            errors.append(e)
+            stop.set()
+        finally:
+            for thread in threads:
+                thread.join()
+
+        if errors:
+            raise VectorStoreError(f"文档入库失败：{errors[0]}")
+
+        report("done")
+        return {
+            "success": True,
+            "files": len(file_paths),
+            "failed_files": failed_files,
+            "added": stats["added"],
+            "skipped": stats["skipped"],
+            "elapsed": time.perf_counter() - start_time,
+        }
@@ -0,0 +1,198 @@
+"""关键词倒排索引，为混合检索提供 BM25 打分。
+
+中文按字二元组（bigram）切分，英文、数字与标准号（如 "GB/T 19001-2016"、"kWh"）
+保留整体词并额外拆出各组成部分，使精确的政策名、标准号和单位能够被命中。
+索引存放在向量存储旁的 SQLite 中，随分块的写入与删除增量更新；
+同时按来源维护分块数，集合统计与按来源分页无需扫描全部元数据。
+"""
+
+import re
+import math
+import sqlite3
+import threading
+from collections import Counter
+from typing import List, Dict, Tuple, Iterable, Optional
+
+from ..config import BM25_K1, BM25_B
+
+# SQLite 单条语句的参数上限较低，按批执行
+_SQL_BATCH = 500
+
+_CJK_RE = re.compile(r"[㐀-䶿一-鿿豈-﫿]+")
+_WORD_RE = re.compile(r"[a-z0-9]+(?:[./\-_][a-z0-9]+)*")
+_PART_RE = re.compile(r"[a-z0-9]+")
+
+
+def tokenize(text: str) -> List[str]:
+    """切分文本：中文连续段输出字二元组（单字段输出单字），其余输出小写词及其组成部分。"""
+    tokens: List[str] = []
+    text = text.lower()
+    pos = 0
+    for match in _CJK_RE.finditer(text):
+        tokens.extend(_word_tokens(text[pos:match.start()]))
+        run = match.group()
+        if len(run) == 1:
+            tokens.append(run)
+        else:
+            tokens.extend(run[i:i + 2] for i in range(len(run) - 1))
+        pos = match.end()
+    tokens.extend(_word_tokens(text[pos:]))
+    return tokens
+
+
+def _word_tokens(text: str) -> List[str]:
+    tokens = []
+    for word in _WORD_RE.findall(text):
+        tokens.append(word)
+        parts = _PART_RE.findall(word)
+        if len(parts) > 1:
+            tokens.extend(parts)
+    return tokens
+
+
+class KeywordIndex:
+    """基于 SQLite 的 BM25 倒排索引，线程安全。"""
+
+    def __init__(self, path: str, k1: float = BM25_K1, b: float = BM25_B):
+        self.path = path
+        self.k1 = k1
+        self.b = b
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS docs (id TEXT PRIMARY KEY, length INTEGER NOT NULL, source TEXT)"
+        )
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS postings (
+                term TEXT NOT NULL,
+                id TEXT NOT NULL,
+                tf INTEGER NOT NULL,
+                PRIMARY KEY (term, id)
+            ) WITHOUT ROWID"""
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_postings_id ON postings(id)")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS sources (source TEXT PRIMARY KEY, count INTEGER NOT NULL)")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS stats (key TEXT PRIMARY KEY, value INTEGER NOT NULL)")
+        self._conn.execute("INSERT OR IGNORE INTO stats (key, value) VALUES ('docs', 0), ('tokens', 0)")
+        #旧版索引没有记录来源，来源计数在重建索引之前不可用
+        columns = [row[1] for row in self._conn.execute("PRAGMA table_info(docs)")]
+        if "source" not in columns:
+            self._conn.execute("ALTER TABLE docs ADD COLUMN source TEXT")
+        has_docs = self._conn.execute("SELECT 1 FROM docs LIMIT 1").fetchone() is not None
+        self._conn.execute(
+            "INSERT OR IGNORE INTO stats (key, value) VALUES ('sources_ready', ?)",
+            (int("source" in columns or not has_docs),)
+        )
+        self._conn.commit()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT value FROM stats WHERE key = 'docs'").fetchone()[0]
+
+    def _delete_locked(self, ids: List[str]) -> None:
+        #删除已索引的分块并更新统计，调用方持有锁
+        for i in range(0, len(ids), _SQL_BATCH):
+            batch = ids[i:i + _SQL_BATCH]
+            placeholders = ",".join("?" * len(batch))
+            count, tokens = self._conn.execute(
+                f"SELECT COUNT(*), COALESCE(SUM(length), 0) FROM docs WHERE id IN ({placeholders})", batch
+            ).fetchone()
+            if not count:
+                continue
+            for source, removed in self._conn.execute(
+                f"SELECT source, COUNT(*) FROM docs WHERE id IN ({placeholders}) GROUP BY source", batch
+            ).fetchall():
+                self._conn.execute("UPDATE sources SET count = count - ? WHERE source IS ?", (removed, source))
+            self._conn.execute("DELETE FROM sources WHERE count <= 0")
+            self._conn.execute(f"DELETE FROM postings WHERE id IN ({placeholders})", batch)
+            self._conn.execute(f"DELETE FROM docs WHERE id IN ({placeholders})", batch)
+            self._conn.execute("UPDATE stats SET value = value - ? WHERE key = 'docs'", (count,))
+            self._conn.execute("UPDATE stats SET value = value - ? WHERE key = 'tokens'", (tokens,))
+
+    def add(self, ids: List[str], texts: Iterable[str], sources: Iterable[str]) -> None:
+        """索引分块并计入其来源；已存在的 id 先删除再重新索引。"""
+        docs = []
+        postings = []
+        source_counts: Counter = Counter()
+        for doc_id, text, source in zip(ids, texts, sources):
+            counts = Counter(tokenize(text or ""))
+            docs.append((doc_id, sum(counts.values()), source))
+            postings.extend((term, doc_id, tf) for term, tf in counts.items())
+            source_counts[source] += 1
+        if not docs:
+            return
+
+        with self._lock:
+            self._delete_locked([doc[0] for doc in docs])
+            self._conn.executemany("INSERT INTO docs (id, length, source) VALUES (?, ?, ?)", docs)
+            self._conn.executemany("INSERT INTO postings (term, id, tf) VALUES (?, ?, ?)", postings)
+            self._conn.executemany(
+                "INSERT INTO sources (source, count) VALUES (?, ?) "
+                "ON CONFLICT(source) DO UPDATE SET count = count + excluded.count",
+                list(source_counts.items())
+            )
+            self._conn.execute("UPDATE stats SET value = value + ? WHERE key = 'docs'", (len(docs),))
+            self._conn.execute(
+                "UPDATE stats SET value = value + ? WHERE key = 'tokens'", (sum(doc[1] for doc in docs),)
+            )
+            self._conn.commit()
+
+    def delete(self, ids: List[str]) -> None:
+        if not ids:
+            return
+        with self._lock:
+            self._delete_locked(list(ids))
+            self._conn.commit()
+
+    def source_counts(self) -> Optional[Dict[str, int]]:
+        """各来源的分块数 {来源: 分块数}；旧版索引未记录来源时返回 None（重建索引后可用）。"""
+        with self._lock:
+            if not self._conn.execute("SELECT value FROM stats WHERE key = 'sources_ready'").fetchone()[0]:
+                return None
+            return dict(self._conn.execute("SELECT source, count FROM sources").fetchall())
+
+    def search(self, query: str, k: int = 10) -> List[Tuple[str, float]]:
+        """BM25 检索，返回 [(分块 id, 分数)]，按分数降序。"""
+        terms = list(dict.fromkeys(tokenize(query)))
+        if not terms:
+            return []
+
+        scores: Dict[str, float] = {}
+        with self._lock:
+            n_docs, n_tokens = [
+                row[0] for row in self._conn.execute("SELECT value FROM stats WHERE key IN ('docs', 'tokens') ORDER BY key")
+            ]
+            if not n_docs:
+                return []
+            avg_len = n_tokens / n_docs
+
+            for term in terms:
+                rows = self._conn.execute(
+                    "SELECT p.id, p.tf, d.length FROM postings p JOIN docs d ON d.id = p.id WHERE p.term = ?",
+                    (term,)
+                ).fetchall()
+                if not rows:
+                    continue
+                df = len(rows)
+                idf = math.log(1 + (n_docs - df + 0.5) / (df + 0.5))
+                for doc_id, tf, length in rows:
+                    norm = tf + self.k1 * (1 - self.b + self.b * length / avg_len)
+                    scores[doc_id] = scores.get(doc_id, 0.0) + idf * tf * (self.k1 + 1) / norm
+
+        return sorted(scores.items(), key=lambda item: -item[1])[:k]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM postings")
+            self._conn.execute("DELETE FROM docs")
+            self._conn.execute("DELETE FROM sources")
+            self._conn.execute("UPDATE stats SET value = 0")
+            #清空后的索引随写入记录来源，计数重新可用
+            self._conn.execute("UPDATE stats SET value = 1 WHERE key = 'sources_ready'")
+            self._conn.commit()
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,49 @@
+"""最大边际相关性（MMR）重排，用于去除检索结果中相互重复的相邻分块。
+
+相似度全部以 NumPy 矩阵运算完成：候选与查询、候选两两之间的余弦相似度各计算一次，
+之后每选一条只需对已选集合的最大相似度做一次逐元素 maximum 更新。
+"""
+
+from typing import List
+
+import numpy as np
+
+
+def _normalize(matrix: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(matrix, axis=-1, keepdims=True)
+    return matrix / np.maximum(norms, 1e-12)
+
+
+def mmr_select(query_embedding, candidate_embeddings, k: int, lambda_mult: float = 0.5) -> List[int]:
+    """从候选中按 MMR 选出 k 条，返回候选下标（按选中顺序）。
+
+    Args:
+        query_embedding: 查询向量，形状 (dim,)
+        candidate_embeddings: 候选向量，形状 (n, dim)，通常已按相关性排序
+        k: 选出条数
+        lambda_mult: 相关性权重，1 为只看相关性，0 为只看多样性
+    """
+    candidates = np.asarray(candidate_embeddings, dtype=np.float32)
+    n = candidates.shape[0] if candidates.ndim == 2 else 0
+    k = min(k, n)
+    if k <= 0:
+        return []
+
+    candidates = _normalize(candidates)
+    query = _normalize(np.asarray(query_embedding, dtype=np.float32))
+    relevance = candidates @ query
+    pairwise = candidates @ candidates.T
+
+    selected = [int(np.argmax(relevance))]
+    max_similarity = pairwise[selected[0]].copy()
+    available = np.ones(n, dtype=bool)
+    available[selected[0]] = False
+
+    while len(selected) < k:
+        scores = lambda_mult * relevance - (1 - lambda_mult) * max_similarity
+        scores[~available] = -np.inf
+        best = int(np.argmax(scores))
+        selected.append(best)
+        available[best] = False
+        np.maximum(max_similarity, pairwise[best], out=max_similarity)
+    return selected
@@ -0,0 +1,357 @@
+"""NumPy 精确检索向量存储，适用于百万级以下的中小规模语料。
+
+嵌入矩阵以连续 float32 文件存储并通过内存映射读取，文本与元数据存放在旁路 SQLite 中。
+检索时做一次矩阵-向量乘法并用 argpartition 取 top-k，距离与 Chroma 默认的平方 L2 一致。
+"""
+
+import os
+import json
+import uuid
+import shutil
+import sqlite3
+import threading
+from typing import List, Optional, Iterable, Any, Dict, Tuple, Callable
+
+import numpy as np
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from langchain_core.vectorstores import VectorStore
+
+from ..config import DEFAULT_COLLECTION_NAME
+from ..exceptions import VectorStoreError
+from ..utils import ensure_dir_exists
+
+_VECTORS_FILE = "vectors.f32"
+_META_FILE = "meta.sqlite3"
+
+
+class NumpyVectorStore(VectorStore):
+    """内存映射嵌入矩阵 + SQLite 元数据的暴力检索向量存储。"""
+
+    def __init__(
+        self,
+        embedding_function: Embeddings,
+        persist_directory: str,
+        collection_name: str = DEFAULT_COLLECTION_NAME
+    ):
+        self._embedding = embedding_function
+        self.collection_name = collection_name
+        self.store_directory = os.path.join(persist_directory, f"{collection_name}.npstore")
+        ensure_dir_exists(self.store_directory)
+
+        self._vectors_path = os.path.join(self.store_directory, _VECTORS_FILE)
+        self._lock = threading.RLock()
+        self._conn = sqlite3.connect(os.path.join(self.store_directory, _META_FILE), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS rows (
+                row INTEGER PRIMARY KEY,
+                id TEXT NOT NULL,
+                document TEXT NOT NULL,
+                metadata TEXT NOT NULL,
+                deleted INTEGER NOT NULL DEFAULT 0
+            )"""
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_rows_id ON rows(id)")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS info (key TEXT PRIMARY KEY, value TEXT NOT NULL)")
+        self._conn.commit()
+
+        self.dim: Optional[int] = None
+        self._data_version = None
+        self._reload()
+
+    @property
+    def embeddings(self) -> Embeddings:
+        return self._embedding
+
+    def _reload(self) -> None:
+        #重新映射嵌入矩阵并刷新范数与删除标记
+        self._data_version = self._conn.execute("PRAGMA data_version").fetchone()[0]
+        if self.dim is None:
+            row = self._conn.execute("SELECT value FROM info WHERE key = 'dim'").fetchone()
+            self.dim = int(row[0]) if row else None
+        count = self._conn.execute("SELECT COUNT(*) FROM rows").fetchone()[0]
+        if not count or self.dim is None or not os.path.exists(self._vectors_path):
+            self._matrix = np.zeros((0, self.dim or 0), dtype=np.float32)
+            self._sq_norms = np.zeros(0, dtype=np.float32)
+            self._alive = np.zeros(0, dtype=bool)
+            return
+
+        self._matrix = np.memmap(self._vectors_path, dtype=np.float32, mode="r", shape=(count, self.dim))
+        self._sq_norms = np.einsum("ij,ij->i", self._matrix, self._matrix)
+        self._alive = np.ones(count, dtype=bool)
+        deleted = [r[0] for r in self._conn.execute("SELECT row FROM rows WHERE deleted = 1")]
+        if deleted:
+            self._alive[deleted] = False
+
+    def _changed_elsewhere(self) -> bool:
+        #其他连接（同目录的其他实例或进程）提交过写入时 data_version 会变化，本连接自己的提交不会
+        return self._conn.execute("PRAGMA data_version").fetchone()[0] != self._data_version
+
+    def _sync_locked(self) -> None:
+        #读取前发现其他实例的写入则重新映射，调用方持有锁
+        if self._changed_elsewhere():
+            self._reload()
+
+    def __len__(self) -> int:
+        with self._lock:
+            self._sync_locked()
+            return int(self._alive.sum())
+
+    def add_texts(
+        self,
+        texts: Iterable[str],
+        metadatas: Optional[List[dict]] = None,
+        ids: Optional[List[str]] = None,
+        **kwargs: Any
+    ) -> List[str]:
+        texts = list(texts)
+        if not texts:
+            return []
+        embeddings = self._embedding.embed_documents(texts)
+        return self.add_embeddings(texts, embeddings, metadatas=metadatas, ids=ids)
+
+    def add_embeddings(
+        self,
+        texts: List[str],
+        embeddings: List[List[float]],
+        metadatas: Optional[List[dict]] = None,
+        ids: Optional[List[str]] = None
+    ) -> List[str]:
+        """写入已计算好的嵌入；已存在的 id 会被覆盖。"""
+        if not texts:
+            return []
+
+        vectors = np.ascontiguousarray(embeddings, dtype=np.float32)
+        if vectors.ndim != 2 or vectors.shape[0] != len(texts):
+            raise VectorStoreError("嵌入数量与文本数量不一致")
+        metadatas = metadatas or [{} for _ in texts]
+        ids = ids or [str(uuid.uuid4()) for _ in texts]
+
+        with self._lock:
+            #BEGIN IMMEDIATE 取得数据库写锁，同一目录的其他实例（其他会话或进程）的写入在此串行
+            self._conn.execute("BEGIN IMMEDIATE")
+            dim = self.dim
+            try:
+                if self.dim is None:
+                    row = self._conn.execute("SELECT value FROM info WHERE key = 'dim'").fetchone()
+                    self.dim = int(row[0]) if row else int(vectors.shape[1])
+                    self._conn.execute("INSERT OR REPLACE INTO info (key, value) VALUES ('dim', ?)", (str(self.dim),))
+                if vectors.shape[1] != self.dim:
+                    raise VectorStoreError(f"嵌入维度不一致：集合为 {self.dim}，输入为 {vectors.shape[1]}")
+
+                #写入位置以数据库为准，本实例的矩阵可能落后于其他实例的追加
+                start = self._conn.execute("SELECT COALESCE(MAX(row) + 1, 0) FROM rows").fetchone()[0]
+                row_bytes = self.dim * 4
+                dead_rows = self._tombstone(ids)
+                self._conn.executemany(
+                    "INSERT INTO rows (row, id, document, metadata) VALUES (?, ?, ?, ?)",
+                    [
+                        (start + i, doc_id, text, json.dumps(meta or {}, ensure_ascii=False))
+                        for i, (doc_id, text, meta) in enumerate(zip(ids, texts, metadatas))
+                    ]
+                )
+                #先写向量再提交元数据；上次写入中断残留的尾部向量先截掉，保证行号与偏移对齐
+                with open(self._vectors_path, "ab") as f:
+                    if f.tell() != start * row_bytes:
+                        f.truncate(start * row_bytes)
+                    f.write(vectors.tobytes())
+                self._conn.commit()
+            except Exception:
+                self._conn.rollback()
+                self.dim = dim
+                raise
+
+            if self._changed_elsewhere() or start != self._matrix.shape[0]:
+                #其他实例追加或删除过，整体重新映射
+                self._reload()
+                return ids
+
+            #增量更新范数与存活标记，避免每次写入都重算整个矩阵
+            total = start + vectors.shape[0]
+            self._matrix = np.memmap(self._vectors_path, dtype=np.float32, mode="r", shape=(total, self.dim))
+            self._sq_norms = np.concatenate([self._sq_norms, np.einsum("ij,ij->i", vectors, vectors)])
+            self._alive = np.concatenate([self._alive, np.ones(vectors.shape[0], dtype=bool)])
+            if dead_rows:
+                self._alive[dead_rows] = False
+        return ids
+
+    def _tombstone(self, ids: List[str]) -> List[int]:
+        #标记删除并返回受影响的行号
+        rows = []
+        for i in range(0, len(ids), 500):
+            batch = ids[i:i + 500]
+            placeholders = ",".join("?" * len(batch))
+            rows.extend(r[0] for r in self._conn.execute(
+                f"SELECT row FROM rows WHERE deleted = 0 AND id IN ({placeholders})", batch
+            ))
+            self._conn.execute(f"UPDATE rows SET deleted = 1 WHERE deleted = 0 AND id IN ({placeholders})", batch)
+        return rows
+
+    def delete(self, ids: Optional[List[str]] = None, **kwargs: Any) -> Optional[bool]:
+        """按 id 删除（标记删除，向量文件不回收）。"""
+        if not ids:
+            return False
+        with self._lock:
+            try:
+                dead_rows = self._tombstone(list(ids))
+                self._conn.commit()
+            except Exception:
+                self._conn.rollback()
+                raise
+            if self._changed_elsewhere():
+                self._reload()
+            elif dead_rows:
+                self._alive[dead_rows] = False
+        return True
+
+    @staticmethod
+    def _where_clause(where: Optional[Dict[str, Any]]) -> Tuple[List[str], List[Any]]:
+        #将 Chroma 风格的元数据过滤条件转换为 SQL，支持等值、$eq、$in
+        clauses, params = [], []
+        for key, cond in (where or {}).items():
+            path = f"$.{key}"
+            if isinstance(cond, dict) and "$in" in cond:
+                values = list(cond["$in"])
+                if not values:
+                    clauses.append("0")
+                    continue
+                clauses.append(f"json_extract(metadata, ?) IN ({','.join('?' * len(values))})")
+                params.extend([path, *values])
+            else:
+                value = cond["$eq"] if isinstance(cond, dict) and "$eq" in cond else cond
+                clauses.append("json_extract(metadata, ?) = ?")
+                params.extend([path, value])
+        return clauses, params
+
+    def get(
+        self,
+        ids: Optional[List[str]] = None,
+        where: Optional[Dict[str, Any]] = None,
+        limit: Optional[int] = None,
+        offset: Optional[int] = None,
+        include: Optional[List[str]] = None
+    ) -> Dict[str, Any]:
+        """按 id 或元数据条件读取记录，返回格式与 Chroma 的 get 一致。"""
+        include = ["documents", "metadatas"] if include is None else list(include)
+        clauses, params = self._where_clause(where)
+        clauses.insert(0, "deleted = 0")
+        if ids is not None:
+            if not ids:
+                clauses.append("0")
+            else:
+                clauses.append(f"id IN ({','.join('?' * len(ids))})")
+                params.extend(ids)
+
+        sql = f"SELECT row, id, document, metadata FROM rows WHERE {' AND '.join(clauses)} ORDER BY row"
+        if limit is not None or offset:
+            sql += " LIMIT ? OFFSET ?"
+            params.extend([-1 if limit is None else limit, offset or 0])
+
+        with self._lock:
+            self._sync_locked()
+            rows = self._conn.execute(sql, params).fetchall()
+            embeddings = None
+            if "embeddings" in include:
+                row_idx = [r[0] for r in rows]
+                embeddings = np.array(self._matrix[row_idx]) if row_idx else np.zeros((0, self.dim or 0), dtype=np.float32)
+
+        return {
+            "ids": [r[1] for r in rows],
+            "documents": [r[2] for r in rows] if "documents" in include else None,
+            "metadatas": [json.loads(r[3]) for r in rows] if "metadatas" in include else None,
+            "embeddings": embeddings,
+        }
+
+    def _top_k(self, queries: np.ndarray, k: int) -> List[List[Tuple[int, float]]]:
+        #对每个查询返回 [(行号, 平方 L2 距离)]，按距离升序；多个查询合并为一次矩阵乘法
+        matrix, sq_norms, alive = self._matrix, self._sq_norms, self._alive
+        n_alive = int(alive.sum())
+        if n_alive == 0 or k <= 0:
+            return [[] for _ in range(queries.shape[0])]
+
+        scores = sq_norms[None, :] - 2.0 * (queries @ matrix.T) + np.einsum("ij,ij->i", queries, queries)[:, None]
+        if n_alive < scores.shape[1]:
+            scores = np.where(alive[None, :], scores, np.inf)
+
+        k = min(k, n_alive)
+        if k < scores.shape[1]:
+            idx = np.argpartition(scores, k - 1, axis=1)[:, :k]
+        else:
+            idx = np.tile(np.arange(scores.shape[1]), (scores.shape[0], 1))
+        top_scores = np.take_along_axis(scores, idx, axis=1)
+        order = np.argsort(top_scores, axis=1, kind="stable")
+        idx = np.take_along_axis(idx, order, axis=1)
+        top_scores = np.maximum(np.take_along_axis(top_scores, order, axis=1), 0.0)
+        return [
+            [(int(i), float(score)) for i, score in zip(row_idx, row_scores)]
+            for row_idx, row_scores in zip(idx, top_scores)
+        ]
+
+    def _rows_to_documents(self, rows: List[int]) -> Dict[int, Document]:
+        docs = {}
+        for i in range(0, len(rows), 500):
+            batch = rows[i:i + 500]
+            placeholders = ",".join("?" * len(batch))
+            for row, doc_id, text, meta in self._conn.execute(
+                f"SELECT row, id, document, metadata FROM rows WHERE deleted = 0 AND row IN ({placeholders})", batch
+            ):
+                docs[row] = Document(page_content=text, metadata=json.loads(meta), id=doc_id)
+        return docs
+
+    def similarity_search_by_vectors_with_score(self, embeddings: List[List[float]], k: int = 4) -> List[List[Tuple[Document, float]]]:
+        """批量按向量检索，返回每个查询的 [(文档, 距离)]。"""
+        queries = np.asarray(embeddings, dtype=np.float32).reshape(len(embeddings), -1)
+        with self._lock:
+            self._sync_locked()
+            hits = self._top_k(queries, k)
+            docs = self._rows_to_documents(sorted({row for query_hits in hits for row, _ in query_hits}))
+        return [[(docs[row], score) for row, score in query_hits if row in docs] for query_hits in hits]
+
+    def similarity_search_by_vector_with_score(self, embedding: List[float], k: int = 4, **kwargs: Any) -> List[Tuple[Document, float]]:
+        return self.similarity_search_by_vectors_with_score([embedding], k)[0]
+
+    def similarity_search_by_vector(self, embedding: List[float], k: int = 4, **kwargs: Any) -> List[Document]:
+        return [doc for doc, _ in self.similarity_search_by_vector_with_score(embedding, k)]
+
+    def similarity_search_with_score(self, query: str, k: int = 4, **kwargs: Any) -> List[Tuple[Document, float]]:
+        return self.similarity_search_by_vector_with_score(self._embedding.embed_query(query), k)
+
+    def similarity_search(self, query: str, k: int = 4, **kwargs: Any) -> List[Document]:
+        return [doc for doc, _ in self.similarity_search_with_score(query, k)]
+
+    def _select_relevance_score_fn(self) -> Callable[[float], float]:
+        return self._euclidean_relevance_score_fn
+
+    def delete_collection(self) -> None:
+        """删除集合的所有文件。"""
+        self.close()
+        shutil.rmtree(self.store_directory, ignore_errors=True)
+
+    def close(self) -> None:
+        """释放内存映射与 SQLite 连接。"""
+        with self._lock:
+            self._matrix = np.zeros((0, self.dim or 0), dtype=np.float32)
+            self._sq_norms = np.zeros(0, dtype=np.float32)
+            self._alive = np.zeros(0, dtype=bool)
+            try:
+                self._conn.close()
+            except Exception:
+                pass
+
+    @classmethod
+    def from_texts(
+        cls,
+        texts: List[str],
+        embedding: Embeddings,
+        metadatas: Optional[List[dict]] = None,
+        ids: Optional[List[str]] = None,
+        collection_name: str = DEFAULT_COLLECTION_NAME,
+        persist_directory: str = None,
+        **kwargs: Any
+    ) -> "NumpyVectorStore":
+        if persist_directory is None:
+            raise VectorStoreError("NumpyVectorStore 需要 persist_directory")
+        store = cls(embedding_function=embedding, persist_directory=persist_directory, collection_name=collection_name)
+        store.add_texts(texts, metadatas=metadatas, ids=ids)
+        return store
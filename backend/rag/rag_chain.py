@@ -6,26 +6,46 @@
 - 更易返回源文档和中间结果
 - 支持流式处理和异步操作
 """
-from typing import List, Dict, Any
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import List, Dict, Any, Iterator, Optional
 from langchain_core.documents import Document
 from langchain_core.prompts import PromptTemplate
 from langchain_core.output_parsers import StrOutputParser
-from langchain_core.runnables import RunnablePassthrough, RunnableParallel
+from langchain_core.runnables import RunnableLambda
 from backend.llm.llm_factory import get_llm
 from .vector_store import VectorStoreManager
+from .answer_cache import SemanticAnswerCache
 
-from ..config import RAG_PROMPT_TEMPLATE, DEFAULT_RETRIEVAL_K, get_llm_config
+from ..config import (
+    RAG_PROMPT_TEMPLATE, DEFAULT_RETRIEVAL_K, RETRIEVER_MODE, MMR_ENABLED, MMR_FETCH_K, MMR_LAMBDA,
+    QA_CHAIN_CACHE_SIZE, ANSWER_CACHE_ENABLED, BATCH_LLM_CONCURRENCY, get_llm_config
+)
 from ..exceptions import RAGChainError
 from ..utils import format_docs
 from ..llm.llm_factory import LLMFactory
 from .vector_store import VectorStoreManager
 
 class RAGChain:
-    def __init__(self, vector_store_manager: VectorStoreManager):
+    def __init__(self, vector_store_manager: VectorStoreManager, answer_cache: Optional[SemanticAnswerCache] = None):
+        """
+        Args:
+            vector_store_manager: 向量存储管理器
+            answer_cache: 语义回答缓存，缺省时按 ANSWER_CACHE_ENABLED 创建
+        """
         self.vector_store_manager = vector_store_manager
+        if answer_cache is None and ANSWER_CACHE_ENABLED:
+            answer_cache = SemanticAnswerCache()
+        self.answer_cache = answer_cache
         self.retriever = None
         self.qa_chain = None
         self.llm = None
+        self._prepare_chain = None
+        self._chain_key = None
+        self._retrieval_settings: Dict[str, Any] = {}
+        #已构建的链按参数缓存：key -> (llm, retriever, prepare_chain, qa_chain, retrieval_settings)
+        self._chains: "OrderedDict[tuple, tuple]" = OrderedDict()
 
     def setup_qa_chain(
             self,
@@ -33,17 +53,35 @@ class RAGChain:
             model_name: str = None,
             temperature: float = None,
             max_tokens: int = None,
-            k: int = DEFAULT_RETRIEVAL_K
+            k: int = DEFAULT_RETRIEVAL_K,
+            retriever_mode: str = RETRIEVER_MODE,
+            use_mmr: bool = MMR_ENABLED,
+            fetch_k: int = MMR_FETCH_K,
+            lambda_mult: float = MMR_LAMBDA
         ) -> bool:
-        """设置 QA 链（使用 LCEL 实现）。
+        """设置 QA 链（使用 LCEL 实现）。相同参数的链只构建一次，再次调用时直接切换到缓存的链。
         
         Args:
             llm_provider: LLM 提供者 ("openai", "langchain" 等)
             k: 检索时返回的文档数
+            retriever_mode: "vector" 仅向量检索；"hybrid" BM25 关键词 + 向量，RRF 融合
+            use_mmr: 是否先取 fetch_k 条候选再用 MMR 选出 k 条，去掉重叠的相邻分块
+            fetch_k: MMR 的候选条数
+            lambda_mult: MMR 的相关性权重（1 只看相关性，0 只看多样性）
             
         Returns:
             bool: 是否成功设置
         """
+        key = (llm_provider, model_name, temperature, max_tokens, k, retriever_mode, use_mmr, fetch_k, lambda_mult)
+        cached = self._chains.get(key)
+        if cached is not None:
+            if self.vector_store_manager.vector_store is None:
+                raise RAGChainError("设置QA链时出错: 请先创建或加载向量存储")
+            self._chains.move_to_end(key)
+            self.llm, self.retriever, self._prepare_chain, self.qa_chain, self._retrieval_settings = cached
+            self._chain_key = key
+            return True
+
         # 获取 LLM 实例
         try:
             self.llm = get_llm(
@@ -56,57 +94,311 @@ class RAGChain:
             # 检查向量存储是否已初始化
             if self.vector_store_manager.vector_store is None:
                 raise RAGChainError("请先创建或加载向量存储")
-            
-            # 创建检索器
-            self.retriever = self.vector_store_manager.vector_store.as_retriever(
-                search_kwargs={"k": k}
-            )
+            if retriever_mode not in ("vector", "hybrid"):
+                raise RAGChainError(f"不支持的检索方式: {retriever_mode}")
+
+            # 创建检索器：通过管理器检索，向量存储切换版本后仍检索当前版本
+            retrieval_settings = {
+                "k": k, "retriever_mode": retriever_mode, "use_mmr": use_mmr,
+                "fetch_k": fetch_k, "lambda_mult": lambda_mult
+            }
+
+            def retrieve_with_timings(query: str, query_embedding: Optional[List[float]] = None) -> Dict[str, Any]:
+                return self.vector_store_manager.retrieve(
+                    query, query_embedding=query_embedding, **retrieval_settings
+                )
+
+            async def aretrieve_with_timings(query: str, query_embedding: Optional[List[float]] = None) -> Dict[str, Any]:
+                return await self.vector_store_manager.aretrieve(
+                    query, query_embedding=query_embedding, **retrieval_settings
+                )
+
+            def retrieve(inputs):
+                query = inputs["question"] if isinstance(inputs, dict) else inputs
+                return retrieve_with_timings(query)["documents"]
+
+            self.retriever = RunnableLambda(retrieve)
 
             rag_prompt = PromptTemplate(
                 template=RAG_PROMPT_TEMPLATE,
                 input_variables=["context", "question"]
             )
 
-            #构建 LCEL 链
-            setup_and_retrieval = RunnableParallel(
-            {"context": self.retriever | (lambda docs: format_docs(docs)), "question": RunnablePassthrough()}
-            )
-            
-            def invoke_llm(inputs):
-                prompt = rag_prompt.format(**inputs)
-                return self.llm.chat(prompt)
+            #构建 LCEL 链：检索到的文档随链传到输出，一次调用即得到回答、所用来源与各阶段耗时
+            def retrieval_step(inputs):
+                #批量回答时检索已在链外完成，直接使用传入的文档
+                if isinstance(inputs, dict) and "documents" in inputs:
+                    return {"question": inputs["question"], "documents": inputs["documents"],
+                            "timings": dict(inputs.get("timings") or {})}
+                if isinstance(inputs, dict):
+                    question = inputs["question"]
+                    retrieved = retrieve_with_timings(question, inputs.get("query_embedding"))
+                else:
+                    question = inputs
+                    retrieved = retrieve_with_timings(question)
+                return {"question": question, "documents": retrieved["documents"], "timings": retrieved["timings"]}
+
+            async def aretrieval_step(inputs):
+                if isinstance(inputs, dict) and "documents" in inputs:
+                    return retrieval_step(inputs)
+                if isinstance(inputs, dict):
+                    question = inputs["question"]
+                    retrieved = await aretrieve_with_timings(question, inputs.get("query_embedding"))
+                else:
+                    question = inputs
+                    retrieved = await aretrieve_with_timings(question)
+                return {"question": question, "documents": retrieved["documents"], "timings": retrieved["timings"]}
 
-            self.qa_chain = setup_and_retrieval | invoke_llm
+            def prompt_step(state):
+                start = time.perf_counter()
+                prompt = rag_prompt.format(context=format_docs(state["documents"]), question=state["question"])
+                state["timings"]["prompt"] = time.perf_counter() - start
+                return dict(state, prompt=prompt)
 
+            def llm_step(state):
+                start = time.perf_counter()
+                answer = self.llm.chat(state["prompt"])
+                state["timings"]["llm"] = time.perf_counter() - start
+                return {"answer": answer, "source_documents": state["documents"], "timings": state["timings"]}
+
+            async def allm_step(state):
+                start = time.perf_counter()
+                answer = await self.llm.achat(state["prompt"])
+                state["timings"]["llm"] = time.perf_counter() - start
+                return {"answer": answer, "source_documents": state["documents"], "timings": state["timings"]}
+
+            #各步骤同时提供异步实现，ainvoke 时检索与 LLM 调用不占用线程
+            self._prepare_chain = (
+                RunnableLambda(retrieval_step, afunc=aretrieval_step) | RunnableLambda(prompt_step)
+            )
+            self.qa_chain = self._prepare_chain | RunnableLambda(llm_step, afunc=allm_step)
+            self._chain_key = key
+            self._retrieval_settings = retrieval_settings
+
+            if QA_CHAIN_CACHE_SIZE > 0:
+                self._chains[key] = (
+                    self.llm, self.retriever, self._prepare_chain, self.qa_chain, self._retrieval_settings
+                )
+                while len(self._chains) > QA_CHAIN_CACHE_SIZE:
+                    self._chains.popitem(last=False)
             return True
         except Exception as e:
             raise RAGChainError(f"设置QA链时出错: {e}")       
     
+    def _check_answer_cache(self, question: str) -> Dict[str, Any]:
+        #嵌入问题并查询语义缓存；问题向量随后传给检索，不再重复嵌入
+        if self.answer_cache is None:
+            return {"embedding": None, "version": None, "hit": None, "embed": 0.0}
+        manager = self.vector_store_manager
+        start = time.perf_counter()
+        embedding = manager.embed_query(question)
+        embed_time = time.perf_counter() - start
+        version = manager.data_version()
+        hit = self.answer_cache.lookup(embedding, version, self._chain_key)
+        return {"embedding": embedding, "version": version, "hit": hit, "embed": embed_time}
+
+    async def _acheck_answer_cache(self, question: str) -> Dict[str, Any]:
+        #_check_answer_cache 的异步版本
+        if self.answer_cache is None:
+            return {"embedding": None, "version": None, "hit": None, "embed": 0.0}
+        manager = self.vector_store_manager
+        start = time.perf_counter()
+        embedding = await manager.aembed_query(question)
+        embed_time = time.perf_counter() - start
+        version = manager.data_version()
+        hit = self.answer_cache.lookup(embedding, version, self._chain_key)
+        return {"embedding": embedding, "version": version, "hit": hit, "embed": embed_time}
+
+    def _store_answer(self, cache_state: Dict[str, Any], question: str, answer: str, source_documents: list) -> None:
+        if self.answer_cache is not None:
+            self.answer_cache.store(
+                cache_state["embedding"], cache_state["version"], self._chain_key, question, answer, source_documents
+            )
+
     def answer_question(self, question: str) -> Dict[str, Any]:
         """
         Args:
             question: 用户问题
             
         Returns:
-            dict: 包含 'answer' 和 'source_documents' 的字典
+            dict: 'answer'、生成回答所用的 'source_documents'、'timings'
+                （embed、search、prompt、llm、total 各阶段耗时，单位秒），
+                以及 'cached'（是否来自语义回答缓存）
         """
         if not self.qa_chain:
             raise RAGChainError("请先设置QA链")
         
         try:
-            # 使用 invoke 调用链，传入问题
-            answer = self.qa_chain.invoke({"question": question})
-            
-            # 获取源文档
-            source_documents = self.get_relevant_documents(question)
-            
-            return {
-                "answer": answer,
-                "source_documents": source_documents
-            }
+            start = time.perf_counter()
+            cache_state = self._check_answer_cache(question)
+            if cache_state["hit"] is not None:
+                return {
+                    "answer": cache_state["hit"]["answer"],
+                    "source_documents": cache_state["hit"]["source_documents"],
+                    "timings": {"embed": cache_state["embed"], "total": time.perf_counter() - start},
+                    "cached": True,
+                }
+
+            result = self.qa_chain.invoke({"question": question, "query_embedding": cache_state["embedding"]})
+            if cache_state["embedding"] is not None:
+                result["timings"]["embed"] = cache_state["embed"]
+            result["timings"]["total"] = time.perf_counter() - start
+            result["cached"] = False
+            self._store_answer(cache_state, question, result["answer"], result["source_documents"])
+            return result
+        except Exception as e:
+            raise RAGChainError(f"回答问题时出错: {e}")
+
+    async def aanswer_question(self, question: str) -> Dict[str, Any]:
+        """answer_question 的异步版本，返回值相同。
+
+        嵌入与 LLM 调用原生异步执行，并发数受 EMBEDDING_ASYNC_CONCURRENCY、LLM_ASYNC_CONCURRENCY 按提供者限制，
+        可在同一事件循环中用 asyncio.gather 并发回答大量问题。
+        """
+        if not self.qa_chain:
+            raise RAGChainError("请先设置QA链")
+
+        try:
+            start = time.perf_counter()
+            cache_state = await self._acheck_answer_cache(question)
+            if cache_state["hit"] is not None:
+                return {
+                    "answer": cache_state["hit"]["answer"],
+                    "source_documents": cache_state["hit"]["source_documents"],
+                    "timings": {"embed": cache_state["embed"], "total": time.perf_counter() - start},
+                    "cached": True,
+                }
+
+            result = await self.qa_chain.ainvoke({"question": question, "query_embedding": cache_state["embedding"]})
+            if cache_state["embedding"] is not None:
+                result["timings"]["embed"] = cache_state["embed"]
+            result["timings"]["total"] = time.perf_counter() - start
+            result["cached"] = False
+            self._store_answer(cache_state, question, result["answer"], result["source_documents"])
+            return result
         except Exception as e:
             raise RAGChainError(f"回答问题时出错: {e}")
         
+    def answer_questions(self, questions: List[str],
+                         max_concurrency: int = BATCH_LLM_CONCURRENCY) -> List[Dict[str, Any]]:
+        """批量回答：所有问题一次嵌入、一起检索，LLM 调用以有限并发执行。
+
+        Args:
+            questions: 问题列表
+            max_concurrency: 同时进行的 LLM 请求数
+
+        Returns:
+            list: 与 questions 一一对应，每项同 answer_question 的结果。timings 中 embed、search
+                为整批耗时按问题数均摊，total 为从批次开始到该问题得到回答的耗时；
+                单个问题的 LLM 调用失败时该项 answer 为空并带 'error'，不影响其他问题
+        """
+        if not self.qa_chain:
+            raise RAGChainError("请先设置QA链")
+        if not questions:
+            return []
+
+        manager = self.vector_store_manager
+        start = time.perf_counter()
+        results: List[Optional[Dict[str, Any]]] = [None] * len(questions)
+        try:
+            embeddings = manager.embed_queries(questions)
+            embed_time = time.perf_counter() - start
+
+            #先查语义缓存，只为未命中的问题检索和调用 LLM
+            version = None
+            if self.answer_cache is not None:
+                version = manager.data_version()
+                for i, embedding in enumerate(embeddings):
+                    hit = self.answer_cache.lookup(embedding, version, self._chain_key)
+                    if hit is not None:
+                        results[i] = {
+                            "answer": hit["answer"],
+                            "source_documents": hit["source_documents"],
+                            "timings": {"embed": embed_time / len(questions), "total": time.perf_counter() - start},
+                            "cached": True,
+                        }
+            pending = [i for i, result in enumerate(results) if result is None]
+
+            retrieved = manager.retrieve_batch(
+                [questions[i] for i in pending], query_embeddings=[embeddings[i] for i in pending],
+                **self._retrieval_settings
+            )
+        except Exception as e:
+            raise RAGChainError(f"批量回答时出错: {e}")
+
+        shared_timings = {
+            "embed": embed_time / len(questions),
+            "search": retrieved["timings"]["search"] / max(len(pending), 1),
+        }
+
+        def answer_one(i: int, documents: List[Document]) -> Dict[str, Any]:
+            try:
+                result = self.qa_chain.invoke(
+                    {"question": questions[i], "documents": documents, "timings": shared_timings}
+                )
+            except Exception as e:
+                return {"answer": "", "source_documents": documents, "timings": dict(shared_timings),
+                        "cached": False, "error": str(e)}
+            result["cached"] = False
+            if self.answer_cache is not None:
+                self.answer_cache.store(
+                    embeddings[i], version, self._chain_key, questions[i], result["answer"], documents
+                )
+            return result
+
+        with ThreadPoolExecutor(max_workers=max(1, max_concurrency)) as pool:
+            futures = {pool.submit(answer_one, i, documents): i for i, documents in zip(pending, retrieved["documents"])}
+            for future in as_completed(futures):
+                result = future.result()
+                result["timings"]["total"] = time.perf_counter() - start
+                results[futures[future]] = result
+        return results
+
+    def stream_answer(self, question: str) -> Iterator[Dict[str, Any]]:
+        """流式回答：先返回检索到的来源，再逐段返回生成的文本。
+
+        依次产生的事件：
+            {"type": "sources", "source_documents": [...]}
+            {"type": "token", "content": 文本片段}（多次；命中语义缓存时为一次完整回答）
+            {"type": "done", "answer": 完整回答, "timings": {...}, "cached": bool}，
+            timings 另含首个片段的耗时 first_token
+        """
+        if not self.qa_chain:
+            raise RAGChainError("请先设置QA链")
+
+        try:
+            start = time.perf_counter()
+            cache_state = self._check_answer_cache(question)
+            hit = cache_state["hit"]
+            if hit is not None:
+                yield {"type": "sources", "source_documents": hit["source_documents"]}
+                yield {"type": "token", "content": hit["answer"]}
+                timings = {"embed": cache_state["embed"], "first_token": time.perf_counter() - start}
+                timings["total"] = timings["first_token"]
+                yield {"type": "done", "answer": hit["answer"], "timings": timings, "cached": True}
+                return
+
+            state = self._prepare_chain.invoke({"question": question, "query_embedding": cache_state["embedding"]})
+            yield {"type": "sources", "source_documents": state["documents"]}
+
+            timings = state["timings"]
+            if cache_state["embedding"] is not None:
+                timings["embed"] = cache_state["embed"]
+            llm_start = time.perf_counter()
+            parts = []
+            for token in self.llm.stream(state["prompt"]):
+                if not parts:
+                    timings["first_token"] = time.perf_counter() - start
+                parts.append(token)
+                yield {"type": "token", "content": token}
+            timings["llm"] = time.perf_counter() - llm_start
+            timings["total"] = time.perf_counter() - start
+            answer = "".join(parts).strip()
+            self._store_answer(cache_state, question, answer, state["documents"])
+            yield {"type": "done", "answer": answer, "timings": timings, "cached": False}
+        except Exception as e:
+            raise RAGChainError(f"回答问题时出错: {e}")
+
     def get_relevant_documents(self, query: str, k: int = DEFAULT_RETRIEVAL_K) -> List[Document]:
         """获取与查询相关的文档。
         Args:
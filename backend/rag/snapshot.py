@@ -0,0 +1,172 @@
+"""向量存储快照：紧凑的版本化二进制文件，用于新节点快速冷启动。
+
+文件布局（小端序）::
+
+    magic      8 字节 b"EAISNAP\\0"
+    version    uint32
+    header_len uint32
+    header     UTF-8 JSON：model_id, collection, count, dim, dtype, created_at
+    padding    补齐到 64 字节对齐
+    embeddings count * dim 个 float32/float16，行优先连续存放，可直接内存映射
+    ids        字符串段
+    documents  字符串段
+    metadatas  字符串段（每行一个 JSON）
+
+字符串段 = raw_len(uint64) + data_len(uint64) + crc32(uint32) + zlib 压缩数据；
+解压后为 (count + 1) 个 uint64 偏移量 + 拼接的 UTF-8 字节。
+"""
+
+import os
+import json
+import time
+import zlib
+import struct
+from typing import List, Optional, Dict, Any, Iterable, Tuple
+
+import numpy as np
+
+from ..exceptions import VectorStoreError
+
+MAGIC = b"EAISNAP\0"
+SNAPSHOT_VERSION = 1
+_ALIGN = 64
+_DTYPES = {"float32": np.float32, "float16": np.float16}
+_PREAMBLE = struct.Struct("<8sII")
+_SECTION = struct.Struct("<QQI")
+
+
+def _encode_strings(values: List[str]) -> bytes:
+    encoded = [value.encode("utf-8", errors="surrogatepass") for value in values]
+    offsets = np.zeros(len(encoded) + 1, dtype="<u8")
+    np.cumsum([len(b) for b in encoded], out=offsets[1:])
+    raw = offsets.tobytes() + b"".join(encoded)
+    data = zlib.compress(raw, 6)
+    return _SECTION.pack(len(raw), len(data), zlib.crc32(data)) + data
+
+
+def _read_strings(f, count: int) -> List[str]:
+    raw_len, data_len, crc = _SECTION.unpack(f.read(_SECTION.size))
+    data = f.read(data_len)
+    if len(data) != data_len or zlib.crc32(data) != crc:
+        raise VectorStoreError("快照文件已损坏（字符串段校验失败）")
+    raw = zlib.decompress(data)
+    if len(raw) != raw_len:
+        raise VectorStoreError("快照文件已损坏（字符串段长度不符）")
+
+    offsets = np.frombuffer(raw, dtype="<u8", count=count + 1)
+    base = (count + 1) * 8
+    return [
+        raw[base + start:base + end].decode("utf-8", errors="surrogatepass")
+        for start, end in zip(offsets[:-1].tolist(), offsets[1:].tolist())
+    ]
+
+
+def write_snapshot(
+    path: str,
+    pages: Iterable[Tuple[List[str], List[str], List[Optional[dict]], np.ndarray]],
+    count: int,
+    dim: int,
+    model_id: str,
+    collection: str,
+    dtype: str = "float32"
+) -> Dict[str, Any]:
+    """写入快照。pages 逐页给出 (ids, documents, metadatas, embeddings)，嵌入按页流式写入。
+
+    先写临时文件再原子替换，中断时不会留下不完整的快照。
+    """
+    if dtype not in _DTYPES:
+        raise VectorStoreError(f"不支持的快照数据类型: {dtype}")
+
+    header = json.dumps({
+        "model_id": model_id,
+        "collection": collection,
+        "count": count,
+        "dim": dim,
+        "dtype": dtype,
+        "created_at": time.time(),
+    }, ensure_ascii=False).encode("utf-8")
+
+    ids: List[str] = []
+    documents: List[str] = []
+    metadatas: List[str] = []
+    tmp_path = path + ".tmp"
+    try:
+        with open(tmp_path, "wb") as f:
+            f.write(_PREAMBLE.pack(MAGIC, SNAPSHOT_VERSION, len(header)))
+            f.write(header)
+            f.write(b"\0" * (-f.tell() % _ALIGN))
+
+            written = 0
+            for page_ids, page_docs, page_metas, page_embeddings in pages:
+                block = np.ascontiguousarray(page_embeddings, dtype=_DTYPES[dtype])
+                if block.shape != (len(page_ids), dim):
+                    raise VectorStoreError(f"嵌入形状不符：期望 ({len(page_ids)}, {dim})，实际 {block.shape}")
+                f.write(block.astype(block.dtype.newbyteorder("<"), copy=False).tobytes())
+                written += len(page_ids)
+                ids.extend(page_ids)
+                documents.extend(doc or "" for doc in page_docs)
+                metadatas.extend(json.dumps(meta or {}, ensure_ascii=False) for meta in page_metas)
+
+            if written != count:
+                raise VectorStoreError(f"导出期间集合发生变化：期望 {count} 条，实际 {written} 条")
+
+            for values in (ids, documents, metadatas):
+                f.write(_encode_strings(values))
+        os.replace(tmp_path, path)
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+    return {"path": path, "count": count, "dim": dim, "dtype": dtype,
+            "model_id": model_id, "bytes": os.path.getsize(path)}
+
+
+class Snapshot:
+    """已读取的快照：header 信息、嵌入矩阵（内存映射）与文本、元数据。"""
+
+    def __init__(self, path: str):
+        self.path = path
+        try:
+            self._read(path)
+        except VectorStoreError:
+            raise
+        except (OSError, ValueError, KeyError, struct.error, zlib.error) as e:
+            raise VectorStoreError(f"读取快照失败: {e}")
+
+    def _read(self, path: str) -> None:
+        with open(path, "rb") as f:
+            magic, version, header_len = _PREAMBLE.unpack(f.read(_PREAMBLE.size))
+            if magic != MAGIC:
+                raise VectorStoreError(f"不是有效的快照文件: {path}")
+            if version != SNAPSHOT_VERSION:
+                raise VectorStoreError(f"不支持的快照版本 {version}，当前支持 {SNAPSHOT_VERSION}")
+
+            self.header: Dict[str, Any] = json.loads(f.read(header_len).decode("utf-8"))
+            self.count: int = self.header["count"]
+            self.dim: int = self.header["dim"]
+            self.model_id: str = self.header["model_id"]
+            self.collection: str = self.header["collection"]
+
+            dtype = np.dtype(_DTYPES[self.header["dtype"]]).newbyteorder("<")
+            data_offset = f.tell() + (-f.tell() % _ALIGN)
+            block_bytes = self.count * self.dim * dtype.itemsize
+            self.embeddings = (
+                np.memmap(path, dtype=dtype, mode="r", offset=data_offset, shape=(self.count, self.dim))
+                if self.count else np.zeros((0, self.dim), dtype=dtype)
+            )
+
+            f.seek(data_offset + block_bytes)
+            self.ids = _read_strings(f, self.count)
+            self.documents = _read_strings(f, self.count)
+            self.metadatas = [json.loads(meta) for meta in _read_strings(f, self.count)]
+
+    def close(self) -> None:
+        #释放嵌入矩阵的内存映射
+        self.embeddings = None
+
+    def __enter__(self) -> "Snapshot":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self.close()
@@ -1,106 +1,352 @@
 import os
+import uuid
+import asyncio
 import dashscope
 import time
 import shutil
-from typing import List, Optional
+import threading
+import weakref
+import itertools
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import List, Optional, Dict, Any, Tuple
 from langchain_core.documents import Document
 from langchain_openai import OpenAIEmbeddings
 from langchain_chroma import Chroma
 from langchain_core.embeddings import Embeddings
+from langchain_core.vectorstores import VectorStore
 from http import HTTPStatus
 
 from ..config import (
     DASHSCOPE_API_KEY, OPENAI_API_KEY,
-    DEFAULT_COLLECTION_NAME, VECTORSTORE_PATH
+    DEFAULT_COLLECTION_NAME, VECTORSTORE_PATH, VECTORSTORE_BACKEND,
+    EMBEDDING_CACHE_ENABLED, DASHSCOPE_BATCH_SIZE, EMBEDDING_MAX_WORKERS,
+    EMBEDDING_MAX_RETRIES, EMBEDDING_RETRY_BASE_DELAY, EMBEDDING_PROVIDER,
+    LOCAL_EMBEDDING_MODEL, LOCAL_EMBEDDING_BATCH_SIZE, LOCAL_EMBEDDING_THREADS,
+    LOCAL_EMBEDDING_POOL_THRESHOLD, INGEST_BATCH_SIZE, DEFAULT_RETRIEVAL_K,
+    KEYWORD_INDEX_ENABLED, HYBRID_FETCH_K, RRF_K, MMR_FETCH_K, MMR_LAMBDA, HNSW_SETTINGS,
+    EMBEDDING_ASYNC_CONCURRENCY
 )
 from ..exceptions import VectorStoreError, APIConnectionError
-from ..utils import ensure_dir_exists, safe_file_opn, cleanup_resources, hash_text
+from ..utils import ensure_dir_exists, hash_embed_texts, backoff_delay, make_chunk_id, provider_semaphore
+from .embedding_cache import CachedEmbeddings, UncachedVectors, get_embedding_model_id
+from .numpy_store import NumpyVectorStore
+from .generations import GenerationStore, LEASES_DIR, GENERATIONS_DIR
+from .snapshot import Snapshot, write_snapshot
+from .keyword_index import KeywordIndex
+from .mmr import mmr_select
 
 class LocalEmbeddings(Embeddings):
-    """本地简单嵌入模型（哈希+随机）- 用于演示和测试，不依赖外部服务。
-    
-    警告：这不是真正的语义嵌入，仅用于演示。生产环境应使用 OpenAI 或 DashScope。
+    """本地特征哈希嵌入模型 - 不依赖外部服务，用于离线演示和测试。
+
+    基于字符 n-gram 的特征哈希，能匹配字面相近的文本，但不是语义嵌入。
+    生产环境应使用 OpenAI、DashScope 或 SentenceTransformer。
     """
-    
-    def __init__(self, seed: int = 42):
-        import numpy as np
-        np.random.seed(seed)
-        self.seed = seed
-    
+
+    def __init__(self, dim: int = 384, ngram_range: Tuple[int, int] = (1, 2)):
+        self.dim = dim
+        self.ngram_range = ngram_range
+        self.model_name = f"hash-{dim}-ngram{ngram_range[0]}{ngram_range[1]}"
+
     def embed_documents(self, texts: List[str]) -> List[List[float]]:
         """嵌入文档列表。"""
-        return [hash_text(text) for text in texts]
-    
+        return hash_embed_texts(texts, self.dim, self.ngram_range).tolist()
+
+    def embed_query(self, text: str) -> List[float]:
+        """嵌入单个查询。"""
+        return hash_embed_texts([text], self.dim, self.ngram_range)[0].tolist()
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        """异步嵌入文档列表：在线程中计算，不阻塞事件循环。"""
+        async with provider_semaphore("embedding:local", EMBEDDING_ASYNC_CONCURRENCY["local"]):
+            return await asyncio.to_thread(self.embed_documents, texts)
+
+    async def aembed_query(self, text: str) -> List[float]:
+        """异步嵌入单个查询。"""
+        return (await self.aembed_documents([text]))[0]
+
+
+class SentenceTransformerEmbeddings(Embeddings):
+    """本地 SentenceTransformer 嵌入模型，适用于离线部署。
+
+    模型在首次使用时加载，同一进程内按 (模型名, 设备) 共享一个实例。
+    批量入库时可开启多进程编码池。
+    """
+
+    _models: Dict[Tuple[str, Optional[str]], Any] = {}
+    _lock = threading.Lock()
+
+    def __init__(
+        self,
+        model_name: str = LOCAL_EMBEDDING_MODEL,
+        batch_size: int = LOCAL_EMBEDDING_BATCH_SIZE,
+        num_threads: int = LOCAL_EMBEDDING_THREADS,
+        device: Optional[str] = None,
+        multi_process: bool = False,
+        pool_devices: Optional[List[str]] = None,
+        pool_threshold: int = LOCAL_EMBEDDING_POOL_THRESHOLD
+    ):
+        self.model_name = model_name
+        self.batch_size = batch_size
+        self.num_threads = num_threads
+        self.device = device
+        self.multi_process = multi_process
+        self.pool_devices = pool_devices
+        self.pool_threshold = pool_threshold
+        self._pool = None
+
+    def _load_model(self):
+        #懒加载并缓存模型，双重检查避免并发重复加载
+        key = (self.model_name, self.device)
+        model = self._models.get(key)
+        if model is not None:
+            return model
+
+        with self._lock:
+            model = self._models.get(key)
+            if model is None:
+                try:
+                    from sentence_transformers import SentenceTransformer
+                except ImportError as e:
+                    raise VectorStoreError(f"未安装 sentence-transformers：{e}")
+
+                if self.num_threads > 0:
+                    import torch
+                    torch.set_num_threads(self.num_threads)
+
+                print(f"[信息] 正在加载本地模型 {self.model_name}...")
+                model = SentenceTransformer(self.model_name, device=self.device)
+                self._models[key] = model
+        return model
+
+    def warm_up(self) -> None:
+        """提前加载模型，避免首个请求承担加载耗时。"""
+        self._load_model()
+
+    def start_pool(self):
+        """启动多进程编码池，用于大批量入库，用完调用 stop_pool。"""
+        if self._pool is None:
+            self._pool = self._load_model().start_multi_process_pool(target_devices=self.pool_devices)
+        return self._pool
+
+    def stop_pool(self) -> None:
+        """关闭多进程编码池。"""
+        if self._pool is not None:
+            self._load_model().stop_multi_process_pool(self._pool)
+            self._pool = None
+
+    def close(self) -> None:
+        """停止多进程编码池；已加载的模型保留在进程内以便复用。"""
+        self.stop_pool()
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        """嵌入文档列表，文本数超过阈值且开启多进程时使用编码池。"""
+        if not texts:
+            return []
+
+        model = self._load_model()
+        if self.multi_process and len(texts) >= self.pool_threshold:
+            pool = self.start_pool()
+            embeddings = model.encode_multi_process(texts, pool, batch_size=self.batch_size)
+        else:
+            embeddings = model.encode(texts, batch_size=self.batch_size, show_progress_bar=False)
+        return embeddings.tolist()
+
     def embed_query(self, text: str) -> List[float]:
         """嵌入单个查询。"""
-        return hash_text(text)
+        return self.embed_documents([text])[0]
 
 
 class DashScopeEmbeddings(Embeddings):
     #Packaging Aliyun DashScope Embeddings
-    def __init__(self, model: str="text-embedding-v1", api_key: str=None):
+    def __init__(
+        self,
+        model: str="text-embedding-v1",
+        api_key: str=None,
+        batch_size: int = DASHSCOPE_BATCH_SIZE,
+        max_workers: int = EMBEDDING_MAX_WORKERS,
+        max_retries: int = EMBEDDING_MAX_RETRIES,
+        retry_base_delay: float = EMBEDDING_RETRY_BASE_DELAY
+    ):
         self.model = model
         self.api_key = api_key or DASHSCOPE_API_KEY
         if not self.api_key:
             raise VectorStoreError("DashScope API Key 未配置")
         dashscope.api_key = self.api_key
+        self.batch_size = max(1, min(batch_size, DASHSCOPE_BATCH_SIZE))
+        self.max_workers = max(1, max_workers)
+        self.max_retries = max(0, max_retries)
+        self.retry_base_delay = retry_base_delay
 
-    def embed_documents(self, texts: List[str]) -> List[List[float]]:
-        """嵌入文档列表。使用 DashScope 优先，回退到本地模型。"""
+    def _embed_batch(self, batch: List[str]) -> List[List[float]]:
+        #单批请求 DashScope
+        resp = dashscope.TextEmbedding.call(
+            model=self.model,
+            input=batch
+        )
+        if resp.status_code != HTTPStatus.OK:
+            error_msg = getattr(resp, "message", str(resp.status_code))
+            raise APIConnectionError(f"DashScope 嵌入失败：{error_msg}")
+
+        embeddings = sorted(resp.output.get("embeddings", []), key=lambda item: item.get("text_index", 0))
+        if len(embeddings) != len(batch):
+            raise APIConnectionError(f"DashScope 返回数量不符：期望 {len(batch)}，实际 {len(embeddings)}")
+        return [item["embedding"] for item in embeddings]
+
+    def _embed_batch_with_retry(self, batch: List[str]) -> List[List[float]]:
+        #单批重试，退避时间带随机抖动，避免并发请求同时重试
+        last_error = None
+        for attempt in range(self.max_retries + 1):
+            try:
+                return self._embed_batch(batch)
+            except Exception as e:
+                last_error = e
+                if attempt < self.max_retries:
+                    time.sleep(backoff_delay(attempt, self.retry_base_delay))
+        raise last_error
+
+    async def _aembed_batch_with_retry(self, batch: List[str]) -> List[List[float]]:
+        #异步单批重试：请求在线程中执行，退避等待不占用线程
+        last_error = None
+        for attempt in range(self.max_retries + 1):
+            try:
+                async with provider_semaphore("embedding:dashscope", EMBEDDING_ASYNC_CONCURRENCY["dashscope"]):
+                    return await asyncio.to_thread(self._embed_batch, batch)
+            except Exception as e:
+                last_error = e
+                if attempt < self.max_retries:
+                    await asyncio.sleep(backoff_delay(attempt, self.retry_base_delay))
+        raise last_error
+
+    def _fallback_embed(self, batch: List[str]) -> List[List[float]]:
+        #本地模型回退，复用进程内已加载的模型
+        return SentenceTransformerEmbeddings().embed_documents(batch)
+
+    def _split_batches(self, texts: List[str]) -> List[List[str]]:
         # 预处理文本：截断到 8192 字符
         inputs = [text[:8192] if isinstance(text, str) else str(text)[:8192] for text in texts]
-        
-        # 首先尝试 DashScope
-        try:
-            #DashScope limit 25 per request
-            batch_size = 25
-            all_embedding = []
-
-            for i in range(0, len(inputs), batch_size):
-                batch = inputs[i:i+batch_size]
-                resp = dashscope.TextEmbedding.call(
-                    model=self.model,
-                    input=batch
-            )
-                if resp.status_code == HTTPStatus.OK:
-                    embeddings = resp.output.get("embeddings", [])
-                    all_embedding.extend([item["embedding"] for item in embeddings])
-                else:
-                    error_msg = getattr(resp, "message", str(resp.status_code))
-                    raise Exception(f"DashScope 嵌入失败：{error_msg}")
-            return all_embedding
+        return [inputs[i:i+self.batch_size] for i in range(0, len(inputs), self.batch_size)]
+
+    def _merge_results(self, batches: List[List[str]], results: List[Optional[List[List[float]]]],
+                       failed: Dict[int, Exception]) -> List[List[float]]:
+        #处理失败批次（全部失败时回退到本地模型）并按输入顺序拼接结果；
+        #回退结果标记为 UncachedVectors，CachedEmbeddings 不会把它存到 DashScope 模型名下
+        if failed:
+            first_error = next(iter(failed.values()))
+            print(f"[警告] DashScope 嵌入有 {len(failed)}/{len(batches)} 批失败：{first_error}，尝试本地模型...")
+
+            #本地模型维度与 DashScope 不同，部分成功时不能混用
+            if len(failed) < len(batches):
+                raise VectorStoreError(
+                    f"DashScope 嵌入部分批次失败，本地模型维度不一致无法混用：{first_error}"
+                )
+
+            for idx in sorted(failed):
+                try:
+                    results[idx] = self._fallback_embed(batches[idx])
+                except Exception as fallback_e:
+                    print(f"[错误] 本地模型嵌入失败：{fallback_e}")
+                    raise RuntimeError(f"所有嵌入方法都失败了。DashScope: {failed[idx]}, 本地模型: {fallback_e}")
+            return UncachedVectors(vector for batch_result in results for vector in batch_result)
+
+        return [vector for batch_result in results for vector in batch_result]
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        """嵌入文档列表。各批并发请求 DashScope，仅失败的批次重试或回退到本地模型，输出顺序与输入一致。"""
+        batches = self._split_batches(texts)
+        if not batches:
+            return []
+        results: List[Optional[List[List[float]]]] = [None] * len(batches)
+        failed = {}
+
+        workers = min(self.max_workers, len(batches))
+        if workers == 1:
+            for idx, batch in enumerate(batches):
+                try:
+                    results[idx] = self._embed_batch_with_retry(batch)
+                except Exception as e:
+                    failed[idx] = e
+        else:
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                futures = {executor.submit(self._embed_batch_with_retry, batch): idx for idx, batch in enumerate(batches)}
+                for future in as_completed(futures):
+                    idx = futures[future]
+                    try:
+                        results[idx] = future.result()
+                    except Exception as e:
+                        failed[idx] = e
+
+        return self._merge_results(batches, results, failed)
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        """异步嵌入文档列表。各批并发请求，并发数受 EMBEDDING_ASYNC_CONCURRENCY 限制，失败处理同 embed_documents。"""
+        batches = self._split_batches(texts)
+        if not batches:
+            return []
+
+        outcomes = await asyncio.gather(
+            *(self._aembed_batch_with_retry(batch) for batch in batches), return_exceptions=True
+        )
+        results = [None if isinstance(outcome, Exception) else outcome for outcome in outcomes]
+        failed = {idx: outcome for idx, outcome in enumerate(outcomes) if isinstance(outcome, Exception)}
+        if failed:
+            #本地模型回退会加载模型，放到线程中执行
+            return await asyncio.to_thread(self._merge_results, batches, results, failed)
+        return self._merge_results(batches, results, failed)
 
-        except Exception as e:
-            print(f"[警告] DashScope 嵌入失败：{e}，尝试本地模型...")
-            
-            # 回退到本地模型
-            try:
-                from sentence_transformers import SentenceTransformer
-                print("[信息] 正在加载本地模型...")
-                model = SentenceTransformer('sentence-transformers/all-MiniLM-L6-v2')
-                embeddings = model.encode(inputs, show_progress_bar=False)
-                return embeddings.tolist()
-            except Exception as fallback_e:
-                print(f"[错误] 本地模型嵌入失败：{fallback_e}")
-                raise RuntimeError(f"所有嵌入方法都失败了。DashScope: {e}, 本地模型: {fallback_e}")
-            
     def embed_query(self, text: str) -> List[float]:
         """嵌入单个查询文本。"""
         try:
             result = self.embed_documents([text])
             if result and len(result) > 0:
-                return result[0]
+                return UncachedVectors(result[0]) if isinstance(result, UncachedVectors) else result[0]
             else:
                 raise ValueError("嵌入返回为空")
         except Exception as e:
             raise VectorStoreError(f"查询嵌入失败：{e}")
 
+    async def aembed_query(self, text: str) -> List[float]:
+        """异步嵌入单个查询文本。"""
+        try:
+            result = await self.aembed_documents([text])
+            if result:
+                return UncachedVectors(result[0]) if isinstance(result, UncachedVectors) else result[0]
+            raise ValueError("嵌入返回为空")
+        except Exception as e:
+            raise VectorStoreError(f"查询嵌入失败：{e}")
+
 
 class EmbeddingFactory:
     #创建嵌入模型，根据可用APIkey选择最佳选项
 
     @staticmethod
-    def create_embeddings() -> Embeddings:
+    def create_embeddings(provider: str = EMBEDDING_PROVIDER, use_cache: bool = EMBEDDING_CACHE_ENABLED) -> Embeddings:
+        #创建嵌入模型，默认包装一层持久化缓存；provider 为 auto 时按可用 API key 选择
+        embeddings = EmbeddingFactory._create_base_embeddings(provider)
+        if not use_cache:
+            return embeddings
+
+        try:
+            return CachedEmbeddings(embeddings)
+        except Exception as e:
+            print(f"[警告] 嵌入缓存初始化失败，直接使用嵌入模型: {e}")
+            return embeddings
+
+    @staticmethod
+    def _create_base_embeddings(provider: str = "auto") -> Embeddings:
+        provider = (provider or "auto").lower()
+        if provider == "dashscope":
+            return DashScopeEmbeddings(model="text-embedding-v1", api_key=DASHSCOPE_API_KEY)
+        if provider == "openai":
+            return OpenAIEmbeddings(api_key=OPENAI_API_KEY, model="text-embedding-3-small")
+        if provider == "sentence_transformers":
+            print("[信息] 使用本地 SentenceTransformer 嵌入模型")
+            return SentenceTransformerEmbeddings()
+        if provider == "local":
+            return LocalEmbeddings()
+        if provider != "auto":
+            raise VectorStoreError(f"不支持的嵌入模型提供者: {provider}")
+
         #DashScope
         if DASHSCOPE_API_KEY and DASHSCOPE_API_KEY.strip():
             try:
@@ -120,58 +366,439 @@ class EmbeddingFactory:
         print("[信息] use local embeddings")
         return LocalEmbeddings()
 
+
+HNSW_SPACES = ("l2", "cosine", "ip")
+
+
+def resolve_hnsw_settings(settings: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    #合并默认 HNSW 参数并校验
+    resolved = dict(HNSW_SETTINGS)
+    resolved.update(settings or {})
+    unknown = set(resolved) - set(HNSW_SETTINGS)
+    if unknown:
+        raise VectorStoreError(f"未知的 HNSW 参数: {', '.join(sorted(unknown))}")
+    if resolved["space"] not in HNSW_SPACES:
+        raise VectorStoreError(f"不支持的距离类型: {resolved['space']}")
+    for key in ("M", "construction_ef", "search_ef"):
+        if int(resolved[key]) < 1:
+            raise VectorStoreError(f"HNSW 参数 {key} 必须为正整数")
+        resolved[key] = int(resolved[key])
+    return resolved
+
+
+def hnsw_configuration(settings: Dict[str, Any]) -> Dict[str, Any]:
+    #转换为 Chroma 集合配置
+    return {
+        "hnsw": {
+            "space": settings["space"],
+            "max_neighbors": settings["M"],
+            "ef_construction": settings["construction_ef"],
+            "ef_search": settings["search_ef"],
+        }
+    }
+
+
+def _source_of(metadata: Optional[Dict[str, Any]]) -> str:
+    #分块的来源，用于按来源计数
+    return str((metadata or {}).get("source", ""))
+
+
 class VectorStoreManager:
     """向量存储管理器，支持多种嵌入模型和向量数据库"""
 
-    def __init__(self, persist_directory: str = VECTORSTORE_PATH):
+    def __init__(self, persist_directory: str = VECTORSTORE_PATH, backend: str = VECTORSTORE_BACKEND,
+                 hnsw_settings: Optional[Dict[str, Any]] = None):
+        """
+        Args:
+            persist_directory: 持久化根目录
+            backend: "chroma" 或 "numpy"
+            hnsw_settings: Chroma HNSW 参数（space, M, construction_ef, search_ef），缺省取 HNSW_SETTINGS；
+                新建集合时生效，已有集合只同步 search_ef，其余参数需 reindex。NumPy 后端为精确检索，忽略此参数
+        """
 
         self.persist_directory = persist_directory
         ensure_dir_exists(self.persist_directory)
 
+        if backend not in ("chroma", "numpy"):
+            raise VectorStoreError(f"不支持的向量存储后端: {backend}")
+        self.backend = backend
+        self.hnsw_settings = resolve_hnsw_settings(hnsw_settings)
+
         #init embedding model
         self.embeddings = EmbeddingFactory.create_embeddings()
         self.vector_store = None
 
-    def create_vector_store(self, documents: List[Document], collection_name: str = DEFAULT_COLLECTION_NAME) -> Chroma:
-        try:
-            self.vector_store = Chroma.from_documents(
-                documents=documents,
-                embedding=self.embeddings,
-                collection_name=collection_name,
-                persist_directory=self.persist_directory
+        #分代存储：当前打开的代、读者登记与集合名
+        self.generations = GenerationStore(self.persist_directory)
+        self.generation = None
+        self.collection_name = DEFAULT_COLLECTION_NAME
+        self._lease = None
+        self._pending = None
+        self._finalizer = None
+        self._keyword_index = None
+        self._stats_cache = None
+
+    @property
+    def store_directory(self) -> str:
+        """当前打开（未打开时为当前指向）的代目录。"""
+        if self.vector_store is not None:
+            return self.generations.path(self.generation)
+        return self.generations.path(self.generations.current())
+
+    def _open_store(self, collection_name: str, directory: Optional[str] = None) -> VectorStore:
+        #按后端打开（不存在则创建）集合
+        directory = directory or self.store_directory
+        if self.backend == "numpy":
+            return NumpyVectorStore(
+                embedding_function=self.embeddings,
+                persist_directory=directory,
+                collection_name=collection_name
             )
-            return self.vector_store
+        store = Chroma(
+            persist_directory=directory,
+            embedding_function=self.embeddings,
+            collection_name=collection_name,
+            collection_configuration=hnsw_configuration(self.hnsw_settings)
+        )
+        #已有集合沿用创建时的索引参数，只有 search_ef 可以直接调整
+        current = (store._collection.configuration or {}).get("hnsw") or {}
+        if current and current.get("ef_search") != self.hnsw_settings["search_ef"]:
+            store._collection.modify(configuration={"hnsw": {"ef_search": self.hnsw_settings["search_ef"]}})
+        return store
+
+    @staticmethod
+    def _close_store(store: Optional[VectorStore]) -> None:
+        #释放向量存储持有的客户端与文件句柄
+        if store is None:
+            return
+        try:
+            if isinstance(store, NumpyVectorStore):
+                store.close()
+            elif getattr(store, "_client", None) is not None:
+                store._client.close()
         except Exception as e:
-            raise VectorStoreError(f"创建向量存储失败：{e}")
+            print(f"[警告] 关闭向量存储时出错: {e}")
+
+    @property
+    def keyword_index(self) -> Optional[KeywordIndex]:
+        """当前集合的关键词倒排索引，与向量存储保存在同一代目录；未打开向量存储或未启用时为 None。"""
+        if self.vector_store is None or not KEYWORD_INDEX_ENABLED:
+            return None
+        path = os.path.join(self.store_directory, f"{self.collection_name}.keywords.sqlite3")
+        if self._keyword_index is None or self._keyword_index.path != path:
+            self._close_keyword_index()
+            self._keyword_index = KeywordIndex(path)
+        return self._keyword_index
+
+    def _mark_changed(self) -> None:
+        #写入新的内容版本标识，其他会话与进程据此判断集合内容已变化
+        path = os.path.join(self.store_directory, f"{self.collection_name}.version")
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(uuid.uuid4().hex)
+        os.replace(tmp_path, path)
+
+    def data_version(self) -> str:
+        """集合内容的版本标识：切换版本、切换集合或写入、删除分块后都会变化，用于使依赖集合内容的缓存失效。"""
+        if self.vector_store is None:
+            raise VectorStoreError("请先创建或加载向量存储")
+        self.refresh()
+        path = os.path.join(self.store_directory, f"{self.collection_name}.version")
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                token = f.read().strip()
+        except FileNotFoundError:
+            token = ""
+        return f"{self.generation}:{self.collection_name}:{token}"
+
+    def _close_keyword_index(self) -> None:
+        if self._keyword_index is not None:
+            self._keyword_index.close()
+            self._keyword_index = None
+
+    def _attach(self, store: VectorStore, generation: Optional[str], lease: str, collection_name: str) -> None:
+        #切换到新打开的代，并释放之前持有的代
+        self._close_keyword_index()
+        old_store, old_lease = self.vector_store, self._lease
+        self.vector_store = store
+        self.generation = generation
+        self.collection_name = collection_name
+        self._lease = lease
+        self._track_lease()
+        if old_store is not store:
+            self._close_store(old_store)
+        GenerationStore.release(old_lease)
+
+    def _track_lease(self) -> None:
+        #管理器未显式关闭就被回收时也注销读者
+        if self._finalizer is not None:
+            self._finalizer.detach()
+        self._finalizer = weakref.finalize(self, GenerationStore.release, self._lease)
+
+    def create_vector_store(self, documents: List[Document], collection_name: str = DEFAULT_COLLECTION_NAME) -> VectorStore:
+        if self.vector_store is None or collection_name != self.collection_name:
+            try:
+                self.load_vector_store(collection_name)
+            except Exception as e:
+                raise VectorStoreError(f"创建向量存储失败：{e}")
+
+        self.add_documents(documents)
+        return self.vector_store
     
-    def load_vector_store(self, collection_name: str = DEFAULT_COLLECTION_NAME) -> Optional[Chroma]:
+    def load_vector_store(self, collection_name: str = DEFAULT_COLLECTION_NAME) -> Optional[VectorStore]:
         if not os.path.exists(self.persist_directory):
             print(f"向量存储目录不存在： {self.persist_directory}")
             return None
         
         try:
-            self.vector_store = Chroma(
-                persist_directory=self.persist_directory,
-                embedding_function=self.embeddings,
-                collection_name=collection_name
-            )
+            generation, lease = self.generations.acquire_current()
+            try:
+                store = self._open_store(collection_name, self.generations.path(generation))
+            except Exception:
+                GenerationStore.release(lease)
+                raise
+            self._attach(store, generation, lease, collection_name)
             return self.vector_store
         except Exception as e:
             raise VectorStoreError(f"加载向量存储失败：{e}")
-    
-    def add_documents(self, documents: List[Document]) -> bool:
+
+    def close(self) -> None:
+        """释放向量存储客户端、文件句柄、读者登记与嵌入缓存连接；可重复调用。"""
+        self.abort_generation()
+        self._close_keyword_index()
+        self._close_store(self.vector_store)
+        self.vector_store = None
+        self.generation = None
+        if self._finalizer is not None:
+            self._finalizer.detach()
+            self._finalizer = None
+        GenerationStore.release(self._lease)
+        self._lease = None
+        if hasattr(self.embeddings, "close"):
+            self.embeddings.close()
+
+    def __enter__(self) -> "VectorStoreManager":
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.close()
+
+    def refresh(self) -> bool:
+        """若当前代已被其他会话或进程切换，重新打开新的当前代。
+
+        Returns:
+            bool: 是否发生了切换
+        """
+        if self.vector_store is None or self._pending is not None:
+            return False
+        current = self.generations.current()
+        if current == self.generation:
+            return False
+
+        print(f"[信息] 向量存储已切换到新版本 {current}，重新加载")
+        self.load_vector_store(self.collection_name)
+        self.generations.collect()
+        return True
+
+    def begin_generation(self, collection_name: str = DEFAULT_COLLECTION_NAME) -> VectorStore:
+        """创建并打开一个新的空代，之后的写入都进入新代；当前代在提交前继续对其他读者可见。
+
+        完成写入后调用 commit_generation 切换，失败时调用 abort_generation 放弃。
+        """
+        if self._pending is not None:
+            raise VectorStoreError("已有未提交的重建")
+
+        generation = self.generations.create()
+        lease = self.generations.acquire(generation)
+        try:
+            store = self._open_store(collection_name, self.generations.path(generation))
+        except Exception as e:
+            GenerationStore.release(lease)
+            shutil.rmtree(self.generations.path(generation), ignore_errors=True)
+            raise VectorStoreError(f"创建新版本向量存储失败：{e}")
+
+        self._close_keyword_index()
+        self._pending = (self.vector_store, self.generation, self._lease, self.collection_name)
+        self.vector_store = store
+        self.generation = generation
+        self.collection_name = collection_name
+        self._lease = lease
+        return store
+
+    def commit_generation(self) -> Dict[str, Any]:
+        """原子切换到新代，释放旧代并回收无人使用的旧代。"""
+        if self._pending is None:
+            raise VectorStoreError("没有待提交的重建")
+
+        old_store, _, old_lease, _ = self._pending
+        self._pending = None
+        self.generations.set_current(self.generation)
+        self._track_lease()
+        self._close_store(old_store)
+        GenerationStore.release(old_lease)
+        return {"generation": self.generation, "removed": self.generations.collect()}
+
+    def abort_generation(self) -> None:
+        """放弃未提交的新代，恢复到之前打开的代。"""
+        if self._pending is None:
+            return
+
+        new_store, new_generation, new_lease = self.vector_store, self.generation, self._lease
+        self.vector_store, self.generation, self._lease, self.collection_name = self._pending
+        self._pending = None
+        self._close_keyword_index()
+        self._close_store(new_store)
+        GenerationStore.release(new_lease)
+        shutil.rmtree(self.generations.path(new_generation), ignore_errors=True)
+
+    def rebuild_vector_store(self, documents: List[Document], collection_name: str = DEFAULT_COLLECTION_NAME) -> Dict[str, Any]:
+        """在新代中重建集合，完成后原子切换；重建期间查询继续使用旧代。"""
+        self.begin_generation(collection_name)
+        try:
+            result = self.add_documents(documents, skip_existing=False)
+        except Exception:
+            self.abort_generation()
+            raise
+        result.update(self.commit_generation())
+        return result
+
+    def _existing_ids(self, ids: List[str]) -> set:
+        #查询已入库的 id，不读取嵌入
+        existing = set()
+        for i in range(0, len(ids), 500):
+            result = self.vector_store.get(ids=ids[i:i + 500], include=[])
+            existing.update(result["ids"])
+        return existing
+
+    def max_batch_size(self) -> int:
+        """单次写入的最大条数：Chroma 取客户端上限，且不超过 INGEST_BATCH_SIZE。"""
+        limit = INGEST_BATCH_SIZE
+        client = getattr(self.vector_store, "_client", None)
+        if client is not None and hasattr(client, "get_max_batch_size"):
+            try:
+                limit = min(limit, client.get_max_batch_size())
+            except Exception:
+                pass
+        return max(1, limit)
+
+    def prepare_chunks(self, documents: List[Document], skip_existing: bool = True) -> Tuple[List[str], List[Document]]:
+        """生成确定性分块 id（来源 + 内容哈希），去掉批内重复，并按需剔除已入库的分块。"""
+        unique: Dict[str, Document] = {}
+        for doc in documents:
+            chunk_id = make_chunk_id(str(doc.metadata.get("source", "")), doc.page_content)
+            unique.setdefault(chunk_id, doc)
+
+        ids = list(unique.keys())
+        if skip_existing and ids:
+            existing = self._existing_ids(ids)
+            ids = [chunk_id for chunk_id in ids if chunk_id not in existing]
+        return ids, [unique[chunk_id] for chunk_id in ids]
+
+    def write_embedded(self, ids: List[str], documents: List[Document], embeddings: List[List[float]]) -> None:
+        """写入已嵌入的分块，不再调用嵌入模型；相同 id 覆盖。"""
+        if self.vector_store is None:
+            raise VectorStoreError("请先创建或加载向量存储")
+        if not ids:
+            return
+
+        texts = [doc.page_content for doc in documents]
+        metadatas = [doc.metadata or None for doc in documents]
+        if isinstance(self.vector_store, NumpyVectorStore):
+            self.vector_store.add_embeddings(texts, embeddings, metadatas=metadatas, ids=ids)
+        else:
+            self.vector_store._collection.upsert(ids=ids, embeddings=embeddings, documents=texts, metadatas=metadatas)
+
+        keyword_index = self.keyword_index
+        if keyword_index is not None:
+            keyword_index.add(ids, texts, [_source_of(meta) for meta in metadatas])
+        self._mark_changed()
+
+    def delete_documents(self, source: Optional[str] = None, ids: Optional[List[str]] = None) -> Dict[str, Any]:
+        """在集合内删除指定来源或指定 id 的分块，不删除集合本身。
+
+        Args:
+            source: 删除 metadata["source"] 等于该值的所有分块
+            ids: 删除这些 id 的分块（与 source 同时给出时取并集）
+
+        Returns:
+            dict: {"success", "deleted", "messages"}，deleted 为实际删除的分块数
+        """
         if self.vector_store is None:
-            print("请先创建或加载向量存储。")
+            raise VectorStoreError("请先创建或加载向量存储")
+        self.refresh()
+        if source is None and not ids:
+            raise VectorStoreError("请指定要删除的来源或分块 id")
+
+        messages = []
+        try:
+            #先查出实际存在的 id，只读 id 不读嵌入
+            target_ids = set(self._existing_ids(list(ids))) if ids else set()
+            if source is not None:
+                matched = self.vector_store.get(where={"source": source}, include=[])["ids"]
+                if not matched:
+                    messages.append(f"未找到来源为 {source} 的分块")
+                target_ids.update(matched)
+
+            target_ids = sorted(target_ids)
+            batch_size = self.max_batch_size()
+            for i in range(0, len(target_ids), batch_size):
+                self.vector_store.delete(ids=target_ids[i:i + batch_size])
+            keyword_index = self.keyword_index
+            if keyword_index is not None:
+                keyword_index.delete(target_ids)
+            if target_ids:
+                self._mark_changed()
+
+            messages.append(f"已删除 {len(target_ids)} 个分块")
+            return {"success": True, "deleted": len(target_ids), "messages": messages}
+        except Exception as e:
+            raise VectorStoreError(f"删除文档失败：{e}")
+
+    def add_documents(self, documents: List[Document], skip_existing: bool = True,
+                      chunk_ids: Optional[List[str]] = None) -> Dict[str, Any]:
+        """添加文档分块，分块 id 由来源与内容哈希确定，重复上传同一文档不会重复入库。
+
+        Args:
+            documents: 文档分块
+            skip_existing: 为 True 时先查询已存在的分块并跳过（不嵌入）；为 False 时重新嵌入并覆盖
+            chunk_ids: 可选，prepare_chunks(skip_existing=False) 已算出的 id，此时 documents 须为与之对应的去重分块
+
+        Returns:
+            dict: {"success", "added", "skipped", "ids"}，added 为新写入数，skipped 为跳过数
+        """
+        if self.vector_store is None:
+            raise VectorStoreError("请先创建或加载向量存储")
+        self.refresh()
         
         try:
-            self.vector_store.add_documents(documents)
-            return True
+            if chunk_ids is None:
+                ids, new_docs = self.prepare_chunks(documents, skip_existing)
+            else:
+                if len(chunk_ids) != len(documents):
+                    raise VectorStoreError("chunk_ids 与分块数量不一致")
+                existing = self._existing_ids(list(chunk_ids)) if skip_existing and chunk_ids else set()
+                kept = [(chunk_id, doc) for chunk_id, doc in zip(chunk_ids, documents) if chunk_id not in existing]
+                ids = [chunk_id for chunk_id, _ in kept]
+                new_docs = [doc for _, doc in kept]
+            batch_size = self.max_batch_size()
+            for i in range(0, len(ids), batch_size):
+                batch_docs = new_docs[i:i + batch_size]
+                embeddings = self.embeddings.embed_documents([doc.page_content for doc in batch_docs])
+                self.write_embedded(ids[i:i + batch_size], batch_docs, embeddings)
+
+            return {
+                "success": True,
+                "added": len(new_docs),
+                "skipped": len(documents) - len(new_docs),
+                "ids": ids
+            }
         except Exception as e:
             raise VectorStoreError(f"添加文档到向量存储失败：{e}")
         
     def similar_search(self, query: str, k: int = 3) -> List[Document]:
         if self.vector_store is None:
             raise VectorStoreError("请先创建或加载向量存储")
+        self.refresh()
         
         try:
             return self.vector_store.similarity_search(query, k=k)
@@ -181,149 +808,574 @@ class VectorStoreManager:
     def similar_search_score(self, query: str, k: int = 3) -> List[tuple[Document, float]]:
         if self.vector_store is None:
             raise VectorStoreError("请先创建或加载向量存储")
+        self.refresh()
         
         try:
             return self.vector_store.similarity_search_with_score(query, k=k)
         except Exception as e:
             raise VectorStoreError(f"相似度搜索失败：{e}")
     
-    def del_collection(self, collection_name: str = "default_collection"):
-        """删除向量存储集合，返回详细的状态信息"""
-        result = {
-            "success": False,
-            "messages": [],
-            "errors": []
+    def _embed_queries(self, queries: List[str]) -> List[List[float]]:
+        #一次调用嵌入多个查询。单条与批量查询统一按文档嵌入方式计算（缓存时也存在文档命名空间），
+        #有无嵌入缓存、单条还是批量，同一问题得到的向量都相同
+        if hasattr(self.embeddings, "embed_queries"):
+            return self.embeddings.embed_queries(queries)
+        return self.embeddings.embed_documents(queries)
+
+    def embed_query(self, query: str) -> List[float]:
+        """嵌入单个查询。"""
+        try:
+            return self._embed_queries([query])[0]
+        except Exception as e:
+            raise VectorStoreError(f"查询嵌入失败：{e}")
+
+    def embed_queries(self, queries: List[str]) -> List[List[float]]:
+        """一次调用嵌入多个查询。"""
+        try:
+            return self._embed_queries(queries)
+        except Exception as e:
+            raise VectorStoreError(f"查询嵌入失败：{e}")
+
+    async def _aembed_queries(self, queries: List[str]) -> List[List[float]]:
+        #异步嵌入多个查询，嵌入方式同 _embed_queries
+        if hasattr(self.embeddings, "aembed_queries"):
+            return await self.embeddings.aembed_queries(queries)
+        return await self.embeddings.aembed_documents(queries)
+
+    async def aembed_query(self, query: str) -> List[float]:
+        """异步嵌入单个查询。"""
+        try:
+            return (await self._aembed_queries([query]))[0]
+        except Exception as e:
+            raise VectorStoreError(f"查询嵌入失败：{e}")
+
+    async def aembed_queries(self, queries: List[str]) -> List[List[float]]:
+        """异步嵌入多个查询。"""
+        try:
+            return await self._aembed_queries(queries)
+        except Exception as e:
+            raise VectorStoreError(f"查询嵌入失败：{e}")
+
+    def similar_search_batch(self, queries: List[str], k: int = 3) -> List[List[Tuple[Document, float]]]:
+        """批量相似度搜索：所有查询一次嵌入、一次索引查询。
+
+        Returns:
+            list: 与 queries 一一对应，每项为 [(文档, 距离)]
+        """
+        if self.vector_store is None:
+            raise VectorStoreError("请先创建或加载向量存储")
+        self.refresh()
+        if not queries:
+            return []
+
+        try:
+            return self._search_by_vectors(self._embed_queries(queries), k)
+        except Exception as e:
+            raise VectorStoreError(f"批量相似度搜索失败：{e}")
+
+    def _search_by_vectors(self, embeddings: List[List[float]], k: int) -> List[List[Tuple[Document, float]]]:
+        #多个查询向量一次索引查询，返回每个查询的 [(文档, 距离)]
+        if isinstance(self.vector_store, NumpyVectorStore):
+            return self.vector_store.similarity_search_by_vectors_with_score(embeddings, k=k)
+
+        results = self.vector_store._collection.query(
+            query_embeddings=embeddings,
+            n_results=k,
+            include=["documents", "metadatas", "distances"]
+        )
+        return [
+            [
+                (Document(page_content=text, metadata=meta or {}, id=doc_id), distance)
+                for doc_id, text, meta, distance in zip(ids, texts, metas, distances)
+            ]
+            for ids, texts, metas, distances in zip(
+                results["ids"], results["documents"], results["metadatas"], results["distances"]
+            )
+        ]
+
+    def _search_by_vector(self, embedding: List[float], k: int) -> List[Tuple[Document, float]]:
+        #按已嵌入的查询向量检索，返回 [(文档, 距离)]
+        if isinstance(self.vector_store, NumpyVectorStore):
+            return self.vector_store.similarity_search_by_vector_with_score(embedding, k=k)
+        return self.vector_store.similarity_search_by_vector_with_relevance_scores(embedding, k=k)
+
+    def mmr_rerank(self, query: str, documents: List[Document], k: int = DEFAULT_RETRIEVAL_K,
+                   lambda_mult: float = MMR_LAMBDA, query_embedding: Optional[List[float]] = None) -> List[Document]:
+        """对候选分块做 MMR 重排，使用集合中已存储的嵌入，不重新嵌入候选。
+
+        Args:
+            query: 查询文本（未给出 query_embedding 时用于嵌入查询）
+            documents: 候选分块，需带 id
+            k: 返回条数
+            lambda_mult: 相关性权重
+            query_embedding: 可选，已计算的查询向量
+        """
+        if self.vector_store is None:
+            raise VectorStoreError("请先创建或加载向量存储")
+        if len(documents) <= 1:
+            return documents[:k]
+
+        try:
+            ids = [doc.id for doc in documents if doc.id]
+            stored = self.vector_store.get(ids=ids, include=["embeddings"]) if ids else {"ids": [], "embeddings": []}
+            vectors = dict(zip(stored["ids"], stored["embeddings"]))
+            candidates = [doc for doc in documents if doc.id in vectors]
+            #候选已被删除或不带 id 时查不到嵌入，不足两条无从去重，按原顺序返回
+            if len(candidates) < 2:
+                return documents[:k]
+            if query_embedding is None:
+                query_embedding = self._embed_queries([query])[0]
+
+            selected = mmr_select(
+                query_embedding, np.stack([vectors[doc.id] for doc in candidates]), k=k, lambda_mult=lambda_mult
+            )
+            return [candidates[i] for i in selected]
+        except Exception as e:
+            raise VectorStoreError(f"MMR 重排失败：{e}")
+
+    def similar_search_mmr(self, query: str, k: int = DEFAULT_RETRIEVAL_K, fetch_k: int = MMR_FETCH_K,
+                           lambda_mult: float = MMR_LAMBDA) -> List[Document]:
+        """先按向量相似度取 fetch_k 条候选，再用 MMR 选出 k 条相互不重复的分块。"""
+        if self.vector_store is None:
+            raise VectorStoreError("请先创建或加载向量存储")
+        self.refresh()
+
+        try:
+            query_embedding = self._embed_queries([query])[0]
+            candidates = [doc for doc, _ in self._search_by_vector(query_embedding, max(fetch_k, k))]
+        except Exception as e:
+            raise VectorStoreError(f"相似度搜索失败：{e}")
+        return self.mmr_rerank(query, candidates, k=k, lambda_mult=lambda_mult, query_embedding=query_embedding)
+
+    def rebuild_keyword_index(self) -> int:
+        """按集合现有内容重建关键词索引（不调用嵌入模型），返回索引的分块数。"""
+        keyword_index = self.keyword_index
+        if keyword_index is None:
+            raise VectorStoreError("关键词索引未启用或向量存储未加载")
+        keyword_index.clear()
+        for page in self._iter_records(["documents", "metadatas"]):
+            keyword_index.add(page["ids"], page["documents"], [_source_of(meta) for meta in page["metadatas"]])
+        return len(keyword_index)
+
+    def _source_counts(self) -> Dict[str, int]:
+        #各来源分块数：优先读关键词索引中增量维护的计数，索引未启用或与集合不一致时扫描元数据
+        keyword_index = self.keyword_index
+        if keyword_index is not None:
+            count = self._count()
+            counts = keyword_index.source_counts()
+            if counts is None or (len(keyword_index) == 0 and count > 0):
+                print("[信息] 关键词索引缺少来源计数，按现有分块重建")
+                self.rebuild_keyword_index()
+                counts = keyword_index.source_counts()
+            if counts is not None and sum(counts.values()) == count:
+                return counts
+
+        counts: Dict[str, int] = {}
+        for page in self._iter_records(["metadatas"]):
+            for meta in page["metadatas"]:
+                source = _source_of(meta)
+                counts[source] = counts.get(source, 0) + 1
+        return counts
+
+    def hybrid_search(self, query: str, k: int = DEFAULT_RETRIEVAL_K, fetch_k: int = HYBRID_FETCH_K,
+                      query_embedding: Optional[List[float]] = None) -> List[Tuple[Document, float]]:
+        """混合检索：BM25 关键词与向量相似度各召回 fetch_k 条，按倒数排名融合（RRF）。
+
+        Args:
+            query_embedding: 可选，已计算的查询向量，给出时不再嵌入查询
+
+        Returns:
+            list: [(文档, 融合分数)]，分数越大越相关
+        """
+        if query_embedding is None:
+            vector_hits = self.similar_search_score(query, k=fetch_k)
+        else:
+            vector_hits = self._search_by_vector(query_embedding, fetch_k)
+        keyword_index = self.keyword_index
+        if keyword_index is None:
+            return [(doc, 1.0 / (RRF_K + rank)) for rank, (doc, _) in enumerate(vector_hits[:k], start=1)]
+
+        try:
+            #旧集合没有索引时先补建一次
+            if len(keyword_index) == 0 and self._count() > 0:
+                print("[信息] 关键词索引为空，按现有分块重建")
+                self.rebuild_keyword_index()
+            keyword_hits = keyword_index.search(query, k=fetch_k)
+
+            scores: Dict[str, float] = {}
+            docs: Dict[str, Document] = {}
+            for rank, (doc, _) in enumerate(vector_hits, start=1):
+                scores[doc.id] = scores.get(doc.id, 0.0) + 1.0 / (RRF_K + rank)
+                docs[doc.id] = doc
+            for rank, (doc_id, _) in enumerate(keyword_hits, start=1):
+                scores[doc_id] = scores.get(doc_id, 0.0) + 1.0 / (RRF_K + rank)
+
+            top = sorted(scores.items(), key=lambda item: -item[1])[:k]
+            missing = [doc_id for doc_id, _ in top if doc_id not in docs]
+            if missing:
+                found = self.vector_store.get(ids=missing, include=["documents", "metadatas"])
+                for doc_id, text, meta in zip(found["ids"], found["documents"], found["metadatas"]):
+                    docs[doc_id] = Document(page_content=text or "", metadata=meta or {}, id=doc_id)
+            return [(docs[doc_id], score) for doc_id, score in top if doc_id in docs]
+        except Exception as e:
+            raise VectorStoreError(f"混合检索失败：{e}")
+
+    def retrieve(self, query: str, k: int = DEFAULT_RETRIEVAL_K, retriever_mode: str = "vector",
+                 use_mmr: bool = False, fetch_k: int = MMR_FETCH_K, lambda_mult: float = MMR_LAMBDA,
+                 query_embedding: Optional[List[float]] = None) -> Dict[str, Any]:
+        """按指定检索方式检索，查询只嵌入一次，并记录各阶段耗时。
+
+        Args:
+            retriever_mode: "vector" 仅向量检索；"hybrid" BM25 关键词 + 向量，RRF 融合
+            use_mmr: 是否先取 fetch_k 条候选再用 MMR 选出 k 条
+            fetch_k: MMR 的候选条数
+            lambda_mult: MMR 的相关性权重
+            query_embedding: 可选，已计算的查询向量，给出时不再嵌入查询
+
+        Returns:
+            dict: {"documents": 文档列表, "timings": {"embed": 秒, "search": 秒}}
+        """
+        if self.vector_store is None:
+            raise VectorStoreError("请先创建或加载向量存储")
+        if retriever_mode not in ("vector", "hybrid"):
+            raise VectorStoreError(f"不支持的检索方式: {retriever_mode}")
+        self.refresh()
+
+        start = time.perf_counter()
+        if query_embedding is None:
+            query_embedding = self.embed_query(query)
+        embedded = time.perf_counter()
+
+        candidates_k = max(fetch_k, k) if use_mmr else k
+        if retriever_mode == "hybrid":
+            documents = [
+                doc for doc, _ in self.hybrid_search(
+                    query, k=candidates_k, fetch_k=max(HYBRID_FETCH_K, candidates_k), query_embedding=query_embedding
+                )
+            ]
+        else:
+            try:
+                documents = [doc for doc, _ in self._search_by_vector(query_embedding, candidates_k)]
+            except Exception as e:
+                raise VectorStoreError(f"相似度搜索失败：{e}")
+        if use_mmr:
+            documents = self.mmr_rerank(query, documents, k=k, lambda_mult=lambda_mult, query_embedding=query_embedding)
+
+        return {
+            "documents": documents,
+            "timings": {"embed": embedded - start, "search": time.perf_counter() - embedded},
         }
-        
+
+    async def aretrieve(self, query: str, k: int = DEFAULT_RETRIEVAL_K, retriever_mode: str = "vector",
+                        use_mmr: bool = False, fetch_k: int = MMR_FETCH_K, lambda_mult: float = MMR_LAMBDA,
+                        query_embedding: Optional[List[float]] = None) -> Dict[str, Any]:
+        """retrieve 的异步版本：查询异步嵌入，本地索引检索放到线程中执行。参数与返回值同 retrieve。"""
+        start = time.perf_counter()
+        if query_embedding is None:
+            query_embedding = await self.aembed_query(query)
+        embed_time = time.perf_counter() - start
+
+        result = await asyncio.to_thread(
+            self.retrieve, query, k=k, retriever_mode=retriever_mode, use_mmr=use_mmr, fetch_k=fetch_k,
+            lambda_mult=lambda_mult, query_embedding=query_embedding
+        )
+        result["timings"]["embed"] += embed_time
+        return result
+
+    def retrieve_batch(self, queries: List[str], k: int = DEFAULT_RETRIEVAL_K, retriever_mode: str = "vector",
+                       use_mmr: bool = False, fetch_k: int = MMR_FETCH_K, lambda_mult: float = MMR_LAMBDA,
+                       query_embeddings: Optional[List[List[float]]] = None) -> Dict[str, Any]:
+        """批量检索：所有查询一次嵌入；仅向量检索时一次索引查询完成全部查询，
+        混合检索或 MMR 逐条检索但复用已计算的查询向量。参数同 retrieve。
+
+        Returns:
+            dict: {"documents": 与 queries 一一对应的文档列表, "timings": {"embed": 秒, "search": 秒}}，
+                timings 为整批的耗时
+        """
+        if self.vector_store is None:
+            raise VectorStoreError("请先创建或加载向量存储")
+        if retriever_mode not in ("vector", "hybrid"):
+            raise VectorStoreError(f"不支持的检索方式: {retriever_mode}")
+        self.refresh()
+        if not queries:
+            return {"documents": [], "timings": {"embed": 0.0, "search": 0.0}}
+
+        start = time.perf_counter()
+        if query_embeddings is None:
+            query_embeddings = self.embed_queries(queries)
+        embedded = time.perf_counter()
+
+        if retriever_mode == "vector" and not use_mmr:
+            try:
+                hits = self._search_by_vectors(query_embeddings, k)
+            except Exception as e:
+                raise VectorStoreError(f"相似度搜索失败：{e}")
+            documents = [[doc for doc, _ in query_hits] for query_hits in hits]
+        else:
+            documents = [
+                self.retrieve(query, k=k, retriever_mode=retriever_mode, use_mmr=use_mmr, fetch_k=fetch_k,
+                              lambda_mult=lambda_mult, query_embedding=embedding)["documents"]
+                for query, embedding in zip(queries, query_embeddings)
+            ]
+
+        return {
+            "documents": documents,
+            "timings": {"embed": embedded - start, "search": time.perf_counter() - embedded},
+        }
+
+    def _count(self) -> int:
+        #集合中的分块数，不读取内容
+        if isinstance(self.vector_store, NumpyVectorStore):
+            return len(self.vector_store)
+        return self.vector_store._collection.count()
+
+    def collection_settings(self) -> Dict[str, Any]:
+        """当前集合实际生效的 HNSW 参数（NumPy 后端为精确检索，返回 {"exact": True}）。"""
+        if self.vector_store is None:
+            raise VectorStoreError("请先创建或加载向量存储")
+        if isinstance(self.vector_store, NumpyVectorStore):
+            return {"exact": True}
+        hnsw = (self.vector_store._collection.configuration or {}).get("hnsw") or {}
+        return {
+            "space": hnsw.get("space"),
+            "M": hnsw.get("max_neighbors"),
+            "construction_ef": hnsw.get("ef_construction"),
+            "search_ef": hnsw.get("ef_search"),
+        }
+
+    def set_search_ef(self, search_ef: int) -> None:
+        """调整查询时的候选数（召回率与延迟的权衡），无需重建索引。"""
+        if self.vector_store is None:
+            raise VectorStoreError("请先创建或加载向量存储")
+        self.hnsw_settings = resolve_hnsw_settings(dict(self.hnsw_settings, search_ef=search_ef))
+        if isinstance(self.vector_store, NumpyVectorStore):
+            return
+        self.vector_store._collection.modify(configuration={"hnsw": {"ef_search": self.hnsw_settings["search_ef"]}})
+        #已加载的索引不会读取新参数，关闭后重新打开使其生效
+        self._close_store(self.vector_store)
+        self.vector_store = self._open_store(self.collection_name)
+
+    def reindex(self, hnsw_settings: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """按新的 HNSW 参数重建索引：把当前版本中已存储的嵌入复制到新版本后切换，不调用嵌入模型。"""
+        if self.vector_store is None:
+            raise VectorStoreError("请先创建或加载向量存储")
+        self.refresh()
+
+        source_store = self.vector_store
+        previous_settings = self.hnsw_settings
+        self.hnsw_settings = resolve_hnsw_settings(dict(previous_settings, **(hnsw_settings or {})))
         try:
-            # 首先尝试删除向量存储集合
-            if self.vector_store is not None:
-                try:
-                    # 强制删除ChromaDB集合
-                    self.vector_store.delete_collection()
-                    result["messages"].append(f"已删除集合: {collection_name}")
-                except Exception as e:
-                    warning_msg = f"删除集合时出现警告: {e}"
-                    result["messages"].append(warning_msg)
-                    print(warning_msg)
-                finally:
-                    # 显式关闭 Chroma 客户端连接
-                    if hasattr(self, 'vector_store') and self.vector_store is not None:
-                        try:
-                            #更彻底的关闭链接
-                            if hasattr(self.vector_store, '_client'):
-                                self.vector_store._client.close()
-                                if hasattr(self.vector_store._client, '_http_client'):
-                                    self.vector_store._client._http_client.close()
-                        except Exception as e:
-                            pass  # 忽略关闭过程中的异常
-        
-                        self.vector_store = None
+            self.begin_generation(self.collection_name)
+        except Exception:
+            self.hnsw_settings = previous_settings
+            raise
 
-            #强制垃圾回收释放文件句柄
-            cleanup_resources()
+        copied = 0
+        try:
+            for page in self._iter_records(["embeddings", "documents", "metadatas"], store=source_store):
+                documents = [
+                    Document(page_content=text or "", metadata=meta or {})
+                    for text, meta in zip(page["documents"], page["metadatas"])
+                ]
+                self.write_embedded(page["ids"], documents, page["embeddings"])
+                copied += len(page["ids"])
+        except Exception as e:
+            self.abort_generation()
+            self.hnsw_settings = previous_settings
+            raise VectorStoreError(f"重建索引失败：{e}")
 
-            # 删除持久化目录
-            if os.path.exists(self.persist_directory):
-                def delete_dir(dir_path):
-                    shutil.rmtree(dir_path)
+        result = {"success": True, "copied": copied, "settings": self.collection_settings()}
+        result.update(self.commit_generation())
+        return result
 
-                try:
-                    # 尝试直接删除整个目录
-                    safe_file_opn(delete_dir, self.persist_directory)
-                    result["messages"].append(f"已删除持久化目录: {self.persist_directory}")
-                except Exception as e:
-                    warning_msg = f"删除持久化目录时出现警告: {e}"
-                    result["messages"].append(warning_msg)
-                    print(warning_msg)
-                    # 强制删除：逐个删除文件和目录，增加重试机制
+    def _iter_records(self, include: List[str], batch_size: Optional[int] = None, store: Optional[VectorStore] = None):
+        #按页读取集合记录，避免一次性读入全部嵌入
+        store = store or self.vector_store
+        batch_size = batch_size or self.max_batch_size()
+        offset = 0
+        while True:
+            page = store.get(limit=batch_size, offset=offset, include=include)
+            if not page["ids"]:
+                return
+            yield page
+            offset += len(page["ids"])
+
+    def list_documents(self, offset: int = 0, limit: int = 20, source: Optional[str] = None) -> Dict[str, Any]:
+        """分页列出集合中的分块，不调用嵌入模型。
+
+        Args:
+            offset: 起始位置
+            limit: 每页条数
+            source: 可选，只列出 metadata["source"] 等于该值的分块
+
+        Returns:
+            dict: {"documents", "total", "offset", "limit"}，documents 为带 id 的 Document 列表
+        """
+        if self.vector_store is None:
+            raise VectorStoreError("请先创建或加载向量存储")
+        self.refresh()
+
+        try:
+            where = {"source": source} if source is not None else None
+            if where is None:
+                total = self._count()
+            else:
+                total = self.collection_stats()["sources"].get(source, 0)
+
+            page = self.vector_store.get(
+                where=where, limit=limit, offset=offset, include=["documents", "metadatas"]
+            )
+            documents = [
+                Document(page_content=text or "", metadata=meta or {}, id=doc_id)
+                for doc_id, text, meta in zip(page["ids"], page["documents"], page["metadatas"])
+            ]
+            return {"documents": documents, "total": total, "offset": offset, "limit": limit}
+        except Exception as e:
+            raise VectorStoreError(f"列出文档失败：{e}")
+
+    def collection_stats(self) -> Dict[str, Any]:
+        """集合统计：分块数、各来源分块数、嵌入维度与磁盘占用，不调用嵌入模型。
+
+        Returns:
+            dict: {"count", "sources", "dim", "disk_bytes", "generation", "backend"}，
+                sources 为 {来源: 分块数}，按分块数降序
+        """
+        if self.vector_store is None:
+            raise VectorStoreError("请先创建或加载向量存储")
+
+        try:
+            #内容版本不变时直接返回上次的结果，页面每次重绘不再重新统计
+            version = self.data_version()
+            if self._stats_cache is not None and self._stats_cache[0] == version:
+                stats = self._stats_cache[1]
+                return dict(stats, sources=dict(stats["sources"]))
+
+            sources = self._source_counts()
+
+            if isinstance(self.vector_store, NumpyVectorStore):
+                dim = self.vector_store.dim
+            else:
+                first = self.vector_store.get(limit=1, include=["embeddings"])["embeddings"]
+                dim = len(first[0]) if first is not None and len(first) else None
+
+            disk_bytes = 0
+            for root, dirs, files in os.walk(self.store_directory):
+                dirs[:] = [d for d in dirs if d not in (LEASES_DIR, GENERATIONS_DIR)]
+                for name in files:
                     try:
-                        max_retries = 10
-                        for attempt in range(max_retries):
-                            try:
-                                cleanup_resources()
-
-                                for root, dirs, files in os.walk(self.persist_directory, topdown=False):
-                                    for name in files:
-                                        file_path = os.path.join(root, name)
-                                        try:
-                                            #尝试先修改文件属性
-                                            if os.name == 'nt':
-                                                try:
-                                                    import ctypes
-                                                    from ctypes import wintypes
-
-                                                    kernel32 = ctypes.WinDLL('kernel32', use_last_error=True)
-                                                    kernel32.SetFileAttributesW.argtypes = [wintypes.LPCWSTR, wintypes.DWORD]
-                                                    kernel32.SetFileAttributesW.restype = wintypes.BOOL
-                                                    
-                                                    # 清除只读、隐藏、系统属性
-                                                    kernel32.SetFileAttributesW(file_path, 0x80)  # FILE_ATTRIBUTE_NORMAL
-                                                except:
-                                                    pass
-
-                                            os.remove(file_path)
-                                            result["messages"].append(f"已删除文件: {file_path}")
-                                            
-                                        except Exception as e3:
-                                                # 如果文件被锁定，等待更长时间后重试
-                                            if attempt < max_retries - 1:
-                                                time.sleep(1.0)  # 每次重试等待1秒
-                                                continue
-                                            else:
-                                                error_msg = f"删除文件失败 {file_path}: {e3}"
-                                                result["messages"].append(error_msg)
-                                                print(error_msg)
-
-                                    for name in dirs:
-                                        dir_path = os.path.join(root, name)
-                                        try:
-                                            os.rmdir(dir_path)
-                                            result["messages"].append(f"已删除目录: {dir_path}")
-                                        except Exception as e4:
-                                            #目录非空，继续尝试删除内容
-                                            if attempt < max_retries - 1:
-                                                time.sleep(1.0)  # 每次重试等待1秒
-                                                continue
-                                            else:
-                                                error_msg = f"删除目录失败 {dir_path}: {e4}"
-                                                result["messages"].append(error_msg)
-                                                print(error_msg)
-
-                                # 最后尝试强制删除目录
-                                os.rmdir(self.persist_directory)
-                                result["messages"].append(f"已强制删除持久化目录: {self.persist_directory}")
-                                break  # 成功删除，跳出重试循环
-
-                            except Exception as retry_e:
-                                if attempt < max_retries - 1:
-                                    time.sleep(1.0)  # 等待后重试
-                                    continue
-                                else:
-                                    raise retry_e
-                    except Exception as e2:
-                        error_msg = f"强制删除目录失败: {e2}"
-                        result["errors"].append(error_msg)
-                        result["messages"].append(error_msg)
-                        print(error_msg)
-                        return result
-            
-            # 重新创建空目录
+                        disk_bytes += os.path.getsize(os.path.join(root, name))
+                    except OSError:
+                        pass
+
+            stats = {
+                "count": sum(sources.values()),
+                "sources": dict(sorted(sources.items(), key=lambda item: -item[1])),
+                "dim": dim,
+                "disk_bytes": disk_bytes,
+                "generation": self.generation,
+                "backend": self.backend,
+            }
+            self._stats_cache = (version, stats)
+            return dict(stats, sources=dict(stats["sources"]))
+        except Exception as e:
+            raise VectorStoreError(f"获取集合统计失败：{e}")
+
+    def export_snapshot(self, path: str, dtype: str = "float32") -> Dict[str, Any]:
+        """将当前集合导出为快照文件（嵌入、文本、元数据与嵌入模型标识），不调用嵌入模型。
+
+        Args:
+            path: 快照文件路径
+            dtype: 嵌入的存储精度，"float32" 或 "float16"（体积减半，精度损失可忽略）
+
+        Returns:
+            dict: {"path", "count", "dim", "dtype", "model_id", "bytes"}
+        """
+        if self.vector_store is None:
+            raise VectorStoreError("请先创建或加载向量存储")
+        self.refresh()
+
+        try:
+            count = self._count()
+            pages = self._iter_records(["embeddings", "documents", "metadatas"])
+            first = next(pages, None)
+            dim = len(first["embeddings"][0]) if first else 0
+            records = (
+                (page["ids"], page["documents"], page["metadatas"], page["embeddings"])
+                for page in itertools.chain([first] if first else [], pages)
+            )
+
+            return write_snapshot(
+                path, records, count=count, dim=dim,
+                model_id=get_embedding_model_id(self.embeddings),
+                collection=self.collection_name, dtype=dtype
+            )
+        except VectorStoreError:
+            raise
+        except Exception as e:
+            raise VectorStoreError(f"导出快照失败：{e}")
+
+    def import_snapshot(self, path: str, collection_name: Optional[str] = None,
+                        allow_model_mismatch: bool = False) -> Dict[str, Any]:
+        """从快照重建集合：写入新版本后原子切换，不调用任何嵌入模型。
+
+        Args:
+            path: 快照文件路径
+            collection_name: 目标集合名，默认使用快照中记录的集合名
+            allow_model_mismatch: 快照的嵌入模型与当前模型不同时是否仍然导入（查询结果将不可用）
+
+        Returns:
+            dict: {"success", "added", "model_id", "generation", "removed"}
+        """
+        #快照持有嵌入矩阵的内存映射，任何一步出错都要关闭（Windows 上映射会锁住文件）
+        with Snapshot(path) as snapshot:
+            model_id = get_embedding_model_id(self.embeddings)
+            if snapshot.model_id != model_id and not allow_model_mismatch:
+                raise VectorStoreError(
+                    f"快照的嵌入模型 {snapshot.model_id} 与当前模型 {model_id} 不一致，查询向量将无法匹配"
+                )
+
+            self.begin_generation(collection_name or snapshot.collection)
             try:
-                ensure_dir_exists(self.persist_directory)
-                result["messages"].append(f"已重新创建空目录: {self.persist_directory}")
+                batch_size = self.max_batch_size()
+                for i in range(0, snapshot.count, batch_size):
+                    end = min(i + batch_size, snapshot.count)
+                    documents = [
+                        Document(page_content=text, metadata=meta or {})
+                        for text, meta in zip(snapshot.documents[i:end], snapshot.metadatas[i:end])
+                    ]
+                    embeddings = np.array(snapshot.embeddings[i:end], dtype=np.float32)
+                    self.write_embedded(snapshot.ids[i:end], documents, embeddings)
             except Exception as e:
-                error_msg = f"重新创建目录失败: {e}"
-                result["errors"].append(error_msg)
-                result["messages"].append(error_msg)
-                print(error_msg)
-                return result
-            
+                self.abort_generation()
+                raise VectorStoreError(f"导入快照失败：{e}")
+
+            result = {"success": True, "added": snapshot.count, "model_id": snapshot.model_id}
+        result.update(self.commit_generation())
+        return result
+
+    def del_collection(self, collection_name: str = DEFAULT_COLLECTION_NAME) -> Dict[str, Any]:
+        """重置集合：切换到一个新的空版本，旧版本在没有读者后删除，返回详细的状态信息。
+
+        切换只写一个指针文件，不等待其他会话释放旧文件。
+        """
+        result = {
+            "success": False,
+            "messages": [],
+            "errors": []
+        }
+
+        try:
+            self.begin_generation(collection_name)
+            commit = self.commit_generation()
+            result["messages"].append(f"已切换到新的空集合: {collection_name}（{commit['generation']}）")
+            for name in commit["removed"]:
+                result["messages"].append(f"已删除旧版本: {name}")
             result["success"] = True
-            return result       
+            return result
         except Exception as e:
+            self.abort_generation()
             error_msg = f"删除集合失败: {e}"
             result["errors"].append(error_msg)
             result["messages"].append(error_msg)
             print(error_msg)
-            return result
\ No newline at end of file
+            return result
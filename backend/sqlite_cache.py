@@ -0,0 +1,177 @@
+"""SQLite 持久化 LRU 缓存基类，供嵌入缓存与 LLM 回复缓存共用。
+
+条目存放在子类定义的数据表中，按最近访问时间（last_access 列）做 LRU 淘汰，同时限制条目数与总字节数。
+条目数与总字节数保存在统计表中，与写入、覆盖、淘汰在同一事务内增量更新，
+只有超出上限时才按访问时间扫描淘汰；多个进程共享同一文件时统计同样一致。
+"""
+
+import os
+import sqlite3
+import threading
+from typing import List, Dict, Any, Tuple
+
+from .utils import ensure_dir_exists
+
+# SQLite 单条语句的参数上限较低，按批执行
+SQL_BATCH = 500
+
+
+class SQLiteLRUCache:
+    """线程安全的 SQLite LRU 缓存基类。
+
+    子类需定义 table（表名）、columns（写入的列，须包含 last_access）、key_columns（主键列）、
+    size_column（计入字节数的列），并在 _create_tables 中建表与 last_access 索引。
+    """
+
+    table: str = ""
+    columns: Tuple[str, ...] = ()
+    key_columns: Tuple[str, ...] = ()
+    size_column: str = ""
+
+    def __init__(self, path: str, max_entries: int, max_bytes: int):
+        self.path = path
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+        ensure_dir_exists(os.path.dirname(os.path.abspath(path)))
+        self._connection = self._connect()
+
+    @property
+    def _stats_table(self) -> str:
+        return f"{self.table}_stats"
+
+    @property
+    def _size_expr(self) -> str:
+        #按字节计算大小，TEXT 列按 UTF-8 编码计
+        return f"LENGTH(CAST({self.size_column} AS BLOB))"
+
+    def _create_tables(self, conn: sqlite3.Connection) -> None:
+        raise NotImplementedError
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        self._create_tables(conn)
+        conn.execute(f"CREATE TABLE IF NOT EXISTS {self._stats_table} (key TEXT PRIMARY KEY, value INTEGER NOT NULL)")
+        conn.commit()
+        #旧版缓存文件没有统计表，首次打开时在写锁内统计一次，避免与其他进程的写入交错
+        conn.execute("BEGIN IMMEDIATE")
+        if conn.execute(f"SELECT COUNT(*) FROM {self._stats_table}").fetchone()[0] < 2:
+            count, total_bytes = conn.execute(
+                f"SELECT COUNT(*), COALESCE(SUM({self._size_expr}), 0) FROM {self.table}"
+            ).fetchone()
+            conn.execute(
+                f"INSERT OR REPLACE INTO {self._stats_table} (key, value) VALUES ('entries', ?), ('bytes', ?)",
+                (count, total_bytes)
+            )
+        conn.commit()
+        return conn
+
+    @property
+    def _conn(self) -> sqlite3.Connection:
+        #close 之后再次使用时自动重连
+        if self._connection is None:
+            self._connection = self._connect()
+        return self._connection
+
+    def _totals_locked(self) -> Tuple[int, int]:
+        #(条目数, 总字节数)，调用方持有锁
+        totals = dict(self._conn.execute(f"SELECT key, value FROM {self._stats_table}").fetchall())
+        return totals["entries"], totals["bytes"]
+
+    def _add_totals_locked(self, entries: int, total_bytes: int) -> None:
+        self._conn.execute(f"UPDATE {self._stats_table} SET value = value + ? WHERE key = 'entries'", (entries,))
+        self._conn.execute(f"UPDATE {self._stats_table} SET value = value + ? WHERE key = 'bytes'", (total_bytes,))
+
+    def _put_rows(self, rows: List[tuple]) -> None:
+        """写入（或覆盖）条目并按需淘汰；rows 中每项按 columns 的顺序给出各列的值。"""
+        if not rows:
+            return
+        key_idx = [self.columns.index(column) for column in self.key_columns]
+        size_idx = self.columns.index(self.size_column)
+        key_clause = " AND ".join(f"{column} = ?" for column in self.key_columns)
+
+        def row_size(value) -> int:
+            return len(value.encode("utf-8") if isinstance(value, str) else value)
+
+        with self._lock:
+            #先取得数据库写锁再读取旧条目大小，其他连接不能在读与写之间写入同一键
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                #被覆盖的旧条目先从统计中扣除
+                replaced = 0
+                replaced_bytes = 0
+                for row in rows:
+                    old = self._conn.execute(
+                        f"SELECT {self._size_expr} FROM {self.table} WHERE {key_clause}", [row[i] for i in key_idx]
+                    ).fetchone()
+                    if old is not None:
+                        replaced += 1
+                        replaced_bytes += old[0]
+                self._conn.executemany(
+                    f"INSERT OR REPLACE INTO {self.table} ({', '.join(self.columns)}) "
+                    f"VALUES ({', '.join('?' * len(self.columns))})",
+                    rows
+                )
+                self._add_totals_locked(
+                    len(rows) - replaced, sum(row_size(row[size_idx]) for row in rows) - replaced_bytes
+                )
+                self._evict_locked()
+                self._conn.commit()
+            except Exception:
+                self._conn.rollback()
+                raise
+
+    def _evict_locked(self) -> None:
+        #超出条目数或字节数限制时，按最近访问时间从旧到新淘汰，调用方持有锁
+        count, total_bytes = self._totals_locked()
+        over_entries = count - self.max_entries
+        over_bytes = total_bytes - self.max_bytes
+        if over_entries <= 0 and over_bytes <= 0:
+            return
+
+        rowids = []
+        removed_bytes = 0
+        for rowid, size in self._conn.execute(
+            f"SELECT rowid, {self._size_expr} FROM {self.table} ORDER BY last_access ASC"
+        ):
+            if len(rowids) >= over_entries and removed_bytes >= over_bytes:
+                break
+            rowids.append(rowid)
+            removed_bytes += size
+
+        for i in range(0, len(rowids), SQL_BATCH):
+            batch = rowids[i:i + SQL_BATCH]
+            self._conn.execute(f"DELETE FROM {self.table} WHERE rowid IN ({','.join('?' * len(batch))})", batch)
+        self._add_totals_locked(-len(rowids), -removed_bytes)
+
+    def stats(self) -> Dict[str, Any]:
+        #缓存统计信息
+        with self._lock:
+            count, total_bytes = self._totals_locked()
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "entries": count,
+                "bytes": total_bytes,
+            }
+
+    def clear(self) -> None:
+        with self._lock:
+            self._conn.execute(f"DELETE FROM {self.table}")
+            self._conn.execute(f"UPDATE {self._stats_table} SET value = 0")
+            self._conn.commit()
+            self.hits = 0
+            self.misses = 0
+
+    def close(self) -> None:
+        with self._lock:
+            if self._connection is not None:
+                self._connection.close()
+                self._connection = None
@@ -1,34 +1,127 @@
 import os
-import time
-import gc
+import random
+import asyncio
 import hashlib
+import weakref
+import threading
 import numpy as np
-from typing import List
+from typing import List, Tuple, Dict
 
 def ensure_dir_exists(dir_path: str) -> None:
     #确保dir存在
     os.makedirs(dir_path, exist_ok=True)
 
 
-def safe_file_opn(opn_func, file_path: str, max_retries: int = 3, retry_delay: float = 1.0):
-    #safe file open with retry
-    last_error = None
-    for attempt in range(max_retries):
-        try:
-            return opn_func(file_path)
-        except Exception as e:
-            last_error = e
-            if attempt < max_retries - 1:
-                time.sleep(retry_delay)
-                gc.collect()
-    raise last_error
+def backoff_delay(attempt: int, base_delay: float = 0.5, max_delay: float = 10.0) -> float:
+    #指数退避 + 全抖动，attempt 从 0 开始
+    return random.uniform(0, min(max_delay, base_delay * (2 ** attempt)))
+
+
+_semaphores: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[str, asyncio.Semaphore]]" = weakref.WeakKeyDictionary()
+_semaphores_lock = threading.Lock()
+
+
+def provider_semaphore(name: str, limit: int) -> asyncio.Semaphore:
+    #当前事件循环内某个提供者共享的并发上限；信号量绑定事件循环，每个循环各自一组
+    loop = asyncio.get_running_loop()
+    with _semaphores_lock:
+        semaphores = _semaphores.setdefault(loop, {})
+        if name not in semaphores:
+            semaphores[name] = asyncio.Semaphore(max(1, limit))
+        return semaphores[name]
+
+
+# 特征哈希常量（FNV-1a + murmur3 fmix32），保证跨进程、跨平台结果一致
+_FNV_OFFSET = np.uint32(0x811C9DC5)
+_FNV_PRIME = np.uint32(0x01000193)
+_FMIX_MUL1 = np.uint32(0x85EBCA6B)
+_FMIX_MUL2 = np.uint32(0xC2B2AE35)
+
+
+def _fmix32(h: np.ndarray) -> np.ndarray:
+    #murmur3 终结函数，打散 n-gram 哈希的各位
+    h ^= h >> np.uint32(16)
+    h *= _FMIX_MUL1
+    h ^= h >> np.uint32(13)
+    h *= _FMIX_MUL2
+    h ^= h >> np.uint32(16)
+    return h
+
+
+def hash_embed_texts(texts: List[str], dim: int = 384, ngram_range: Tuple[int, int] = (1, 2)) -> np.ndarray:
+    """批量特征哈希嵌入。
+
+    将每个文本（小写后）的字符 n-gram 哈希到 dim 维并带符号累加，返回 L2 归一化的
+    float32 矩阵，形状为 (len(texts), dim)。字符级 n-gram 无需分词，适合中文。
+    结果确定且不使用全局随机数状态，可在多线程中调用。
+    """
+    n_texts = len(texts)
+    out = np.zeros((n_texts, dim), dtype=np.float32)
+    if n_texts == 0:
+        return out
+
+    texts = [text if isinstance(text, str) else str(text) for text in texts]
+    joined = "".join(texts).lower()
+    lengths = np.fromiter((len(text) for text in texts), dtype=np.int64, count=n_texts)
+    if len(joined) != int(lengths.sum()):
+        #少数字符小写后长度会变化，此时逐条处理
+        texts = [text.lower() for text in texts]
+        joined = "".join(texts)
+        lengths = np.fromiter((len(text) for text in texts), dtype=np.int64, count=n_texts)
+    if not joined:
+        return out
+
+    #所有文本拼接成一个码点数组，一次性计算全部 n-gram
+    codes = np.frombuffer(joined.encode("utf-32-le", errors="surrogatepass"), dtype=np.uint32)
+    doc_ids = np.repeat(np.arange(n_texts, dtype=np.int64), lengths)
+
+    #正负号分开计数，避免带权 bincount
+    pos_parts, neg_parts = [], []
+    min_n, max_n = ngram_range
+    for size in range(min_n, max_n + 1):
+        count = codes.shape[0] - size + 1
+        if count <= 0:
+            continue
+
+        h = np.full(count, _FNV_OFFSET ^ np.uint32(size), dtype=np.uint32)
+        for offset in range(size):
+            h ^= codes[offset:offset + count]
+            h *= _FNV_PRIME
+
+        #丢弃跨越文本边界的 n-gram
+        rows = doc_ids[:count]
+        if n_texts > 1 and size > 1:
+            valid = rows == doc_ids[size - 1:size - 1 + count]
+            h = h[valid]
+            rows = rows[valid]
+        h = _fmix32(h)
+
+        #高 16 位乘法映射到桶（比取模快），最低位作为符号
+        buckets = ((h >> np.uint32(16)) * np.uint32(dim)) >> np.uint32(16)
+        flat = rows * dim + buckets
+        negative = (h & np.uint32(1)).astype(bool)
+        pos_parts.append(flat[~negative])
+        neg_parts.append(flat[negative])
+
+    size_total = n_texts * dim
+    counts = np.bincount(np.concatenate(pos_parts), minlength=size_total)
+    counts -= np.bincount(np.concatenate(neg_parts), minlength=size_total)
+    out = counts.reshape(n_texts, dim).astype(np.float32)
+
+    norms = np.linalg.norm(out, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    out /= norms
+    return out
 
 
 def hash_text(text: str, dim: int = 384) -> List[float]:
-    #hash text to vector
-    text_hash = hashlib.md5(text.encode()).digest()
-    np.random.seed(int.from_bytes(text_hash[:4], byteorder="big"))
-    return np.random.rand(dim).tolist()
+    #单个文本的哈希嵌入，批量场景请使用 hash_embed_texts
+    return hash_embed_texts([text], dim)[0].tolist()
+
+
+def make_chunk_id(source: str, content: str) -> str:
+    #由来源与内容哈希生成确定性分块 id
+    return hashlib.sha256(f"{source}\0{content}".encode("utf-8", errors="surrogatepass")).hexdigest()[:32]
 
 
 def validate_file_ext(file_path: str, allowed_extensions: List[str]) -> bool:
@@ -45,9 +138,3 @@ def truncate_text(text: str, max_len: int = 8192) -> str:
 def format_docs(docs: List) -> str:
     #格式化文档列表为字符串
     return "\n\n".join(doc.page_content for doc in docs)
-
-
-def cleanup_resources() -> None:
-    #清理资源
-    gc.collect()
-    time.sleep(0.2)
\ No newline at end of file
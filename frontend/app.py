@@ -18,8 +18,9 @@ if PROJECT_ROOT not in sys.path:
 
 load_dotenv()
 
-from backend.rag import RAGChain, VectorStoreManager, DocumentProcessor
+from backend.rag import RAGChain, VectorStoreManager, DocumentProcessor, IngestPipeline, SemanticAnswerCache
 from backend.llm.llm_factory import get_llm
+from backend.config import ANSWER_CACHE_ENABLED
 
 @st.cache_resource
 def get_vector_store_manager():
@@ -29,6 +30,11 @@ def get_vector_store_manager():
     vectorstore_path = PROJECT_ROOT / "vectorstore" / "energy_docs"
     return VectorStoreManager(persist_directory=str(vectorstore_path))
 
+@st.cache_resource
+def get_answer_cache():
+    #语义回答缓存由所有会话共享，一个用户生成的回答其他用户的相似问题也能命中
+    return SemanticAnswerCache() if ANSWER_CACHE_ENABLED else None
+
 def initialize_rag():
     if not st.session_state.rag_initialized:
         #use cached vector store manager
@@ -46,7 +52,7 @@ def initialize_rag():
         st.session_state.rag_components = {
             "doc_processor": DocumentProcessor(chunk_size=1000, chunk_overlap=200),
             "vector_store_manager": vector_store_manager,
-            "rag_chain": RAGChain(vector_store_manager=vector_store_manager)
+            "rag_chain": RAGChain(vector_store_manager=vector_store_manager, answer_cache=get_answer_cache())
         }
 
         st.session_state.rag_initialized = True
@@ -55,6 +61,12 @@ def initialize_rag():
 
 
 
+def source_names(documents) -> list:
+    #来源文件名，按首次出现的顺序去重
+    names = [os.path.basename(str(doc.metadata.get("source", ""))) for doc in documents]
+    return [name for name in dict.fromkeys(names) if name]
+
+
 def main():
     st.set_page_config(page_title="能源AI助手", layout="wide", initial_sidebar_state="collapsed")
 
@@ -142,6 +154,12 @@ def main():
                 
                 if use_rag:
                     rag_components = initialize_rag()
+                    retriever_mode = st.selectbox(
+                        "检索方式", ["vector", "hybrid"],
+                        format_func=lambda m: {"vector": "向量检索", "hybrid": "混合检索（关键词 + 向量）"}[m],
+                        key="retriever_mode"
+                    )
+                    use_mmr = st.checkbox("去除重复片段（MMR）", key="use_mmr")
                     if st.session_state.vector_store_loaded:
                         st.success("向量存储已加载")
                     else:
@@ -157,41 +175,54 @@ def main():
                     if uploaded_files and st.button("处理文档"):
                         with st.spinner("..."):
                             try:
-                                all_docs = []
-                                # 存储临时文件路径，用于后续删除
+                                # 存储临时文件路径，用于后续删除；临时路径 -> 原文件名
                                 temp_file_paths = []
+                                upload_sources = {}
                                 
                                 for uploaded_file in uploaded_files:
                                     # 1. 创建临时文件（注意with语句结束后文件会自动关闭）
-                                    tmp_path = None
                                     with tempfile.NamedTemporaryFile(delete=False, suffix=os.path.splitext(uploaded_file.name)[1]) as tmp_file:
                                         tmp_file.write(uploaded_file.getvalue())
-                                        tmp_path = tmp_file.name
-                                        temp_file_paths.append(tmp_path)
-                                    
-                                    # 2. 文件已关闭后再处理文档
-                                    if tmp_path:
-                                        docs = rag_components["doc_processor"].process_single_docu(tmp_path)
-                                        all_docs.extend(docs)
+                                        temp_file_paths.append(tmp_file.name)
+                                        # 以原文件名作为来源，保证重复上传时分块 id 一致
+                                        upload_sources[tmp_file.name] = uploaded_file.name
                                 
-                                # 3. 处理完所有文档后再创建向量存储
-                                if st.session_state.vector_store_loaded:
-                                    success = rag_components["vector_store_manager"].add_documents(all_docs)
-                                    if not success:
-                                        st.error("添加文档到向量存储失败")
-                                else:
-                                    rag_components["vector_store_manager"].create_vector_store(all_docs, collection_name="energy_docs")
-                                    st.session_state.vector_store_loaded = True
+                                # 2. 确保向量存储已打开（不存在时创建空集合）
+                                vector_store_manager = rag_components["vector_store_manager"]
+                                if vector_store_manager.vector_store is None:
+                                    vector_store_manager.load_vector_store(collection_name="energy_docs")
+                                st.session_state.vector_store_loaded = True
+
+                                # 3. 流式加载、切分、嵌入、写入，并显示进度
+                                progress_bar = st.progress(0.0, text="正在处理文档...")
+
+                                def on_progress(progress):
+                                    eta = f"，预计剩余 {progress['eta']:.0f} 秒" if progress["eta"] is not None else ""
+                                    progress_bar.progress(
+                                        progress["files_done"] / max(progress["files_total"], 1),
+                                        text=f"{progress['files_done']}/{progress['files_total']} 个文件，"
+                                             f"新增 {progress['chunks_added']} 个分块{eta}"
+                                    )
+
+                                result = IngestPipeline(
+                                    vector_store_manager,
+                                    doc_processor=rag_components["doc_processor"]
+                                ).run(temp_file_paths, source_names=upload_sources, progress_callback=on_progress)
+                                for failed in result["failed_files"]:
+                                    st.warning(f"{upload_sources.get(failed['path'], failed['path'])} 处理失败: {failed['error']}")
+                                ingest_msg = f"，新增{result['added']}个分块，跳过{result['skipped']}个已存在分块"
 
                                 rag_components["rag_chain"].setup_qa_chain(
                                     llm_provider=provider.lower(),
                                     model_name=model_name,
                                     temperature=temperature,
                                     max_tokens=max_tokens,
-                                    k=3
+                                    k=3,
+                                    retriever_mode=retriever_mode,
+                                    use_mmr=use_mmr
                                 )
 
-                                st.success(f"成功处理{len(uploaded_files)}个文件")
+                                st.success(f"成功处理{len(uploaded_files)}个文件{ingest_msg}")
                                 
                                 # 4. 最后删除所有临时文件
                                 for tmp_path in temp_file_paths:
@@ -229,6 +260,8 @@ def main():
                     if message["role"] == "user":
                         st.markdown(f"**您：** {message['content']}")
                     else:
+                        if message.get("sources"):
+                            st.caption("参考来源：" + "、".join(message["sources"]))
                         st.markdown(f"**能源AI助手：** {message['content']}")
 
             if "prompt" not in st.session_state:
@@ -277,29 +310,53 @@ def main():
                         max_tokens=max_tokens
                     )
                     
-                    # 调用LLM获取回复
-                    with st.spinner("正在生成回复..."):
-                        if st.session_state.use_rag and st.session_state.rag_components and st.session_state.vector_store_loaded:
-                            rag_chain = st.session_state.rag_components["rag_chain"]
-                            #rag_setup
-                            rag_chain.setup_qa_chain(
-                                llm_provider=provider_normalized,  # 使用规范化后的 provider
-                                model_name=model_name,
-                                temperature=temperature,
-                                max_tokens=max_tokens,
-                                k=3
-                            )
-
-                            result = rag_chain.answer_question(prompt_input)
-                            resp = result["answer"]
-                        else:
-                            resp = llm.chat(prompt_input)
-                        
-                        # 添加AI回复到历史
-                        st.session_state.chat_history.append({
-                            "role": "assistant",
-                            "content": resp
-                        })
+                    # 流式生成回复：在对话区域逐段显示
+                    with chat_container:
+                        st.markdown(f"**您：** {prompt_input}")
+                        sources_placeholder = st.empty()
+                        answer_placeholder = st.empty()
+
+                    sources = []
+                    resp = ""
+                    if st.session_state.use_rag and st.session_state.rag_components and st.session_state.vector_store_loaded:
+                        rag_chain = st.session_state.rag_components["rag_chain"]
+                        #rag_setup
+                        rag_chain.setup_qa_chain(
+                            llm_provider=provider_normalized,  # 使用规范化后的 provider
+                            model_name=model_name,
+                            temperature=temperature,
+                            max_tokens=max_tokens,
+                            k=3,
+                            retriever_mode=st.session_state.get("retriever_mode", "vector"),
+                            use_mmr=st.session_state.get("use_mmr", False)
+                        )
+
+                        with st.spinner("正在检索相关文档..."):
+                            events = rag_chain.stream_answer(prompt_input)
+                            first_event = next(events)
+                        # 先显示来源，再显示逐段生成的回答
+                        sources = source_names(first_event["source_documents"])
+                        if sources:
+                            sources_placeholder.caption("参考来源：" + "、".join(sources))
+                        for event in events:
+                            if event["type"] == "token":
+                                resp += event["content"]
+                                answer_placeholder.markdown(f"**能源AI助手：** {resp}▌")
+                            elif event["type"] == "done":
+                                resp = event["answer"]
+                    else:
+                        for token in llm.stream(prompt_input):
+                            resp += token
+                            answer_placeholder.markdown(f"**能源AI助手：** {resp}▌")
+                        resp = resp.strip()
+                    answer_placeholder.markdown(f"**能源AI助手：** {resp}")
+
+                    # 添加AI回复到历史
+                    st.session_state.chat_history.append({
+                        "role": "assistant",
+                        "content": resp,
+                        "sources": sources
+                    })
                     
                     # 清空输入框
                     st.session_state.prompt = ""
@@ -20,11 +20,11 @@ def create_navi_menu(pages: List[Dict[str, Any]],
                 st.session_state[selected_page_key] = page["id"]
 
 
-def create_docs_expander(doc_id: int, content: str, max_prvw_len: int = 100) -> None:
+def create_docs_expander(doc_id: int, content: str, max_prvw_len: int = 100, title: Optional[str] = None) -> None:
     #创建文档展开器
     from ..utils import format_docs_prvw
     preview = format_docs_prvw(content, max_prvw_len)
-    with st.expander(f"文档 {doc_id} "):
+    with st.expander(title or f"文档 {doc_id} "):
         st.markdown(preview)
 
 
@@ -3,7 +3,10 @@ import streamlit as st
 from .config import VECTORSTORE_PATH, COLLECTION_NAME
 from .components import create_docs_expander, create_act_btns, create_stat_indicator
 from .services import RAGService, StateManager
-from .utils import format_result_msg, reset_app_state
+from .utils import format_result_msg, reset_app_state, format_file_size
+
+# 文档列表每页条数
+PAGE_SIZE = 20
 
 
 @st.cache_resource
@@ -30,16 +33,32 @@ def main():
     st.subheader("文档列表")
 
     if vector_store is not None:
-        st.info("已加载向量存储")
-
-        try:
-            sample_docs = rag_service.get_sample_docs()
-            st.write(f"示例文档数量: {len(sample_docs)}")
-
-            for i, doc in enumerate(sample_docs):
-                create_docs_expander(i, doc.page_content)
-        except Exception as e:
-            st.error(f"加载文档时出错 {e}")
+        stats = rag_service.get_stats()
+        if stats is not None:
+            cols = st.columns(4)
+            cols[0].metric("分块数", stats["count"])
+            cols[1].metric("文档来源数", len(stats["sources"]))
+            cols[2].metric("嵌入维度", stats["dim"] or "-")
+            cols[3].metric("磁盘占用", format_file_size(stats["disk_bytes"]))
+
+            source_options = ["全部"] + [s for s in stats["sources"] if s]
+            source = st.selectbox(
+                "按来源筛选", source_options,
+                format_func=lambda s: s if s == "全部" else f"{s}（{stats['sources'][s]}）"
+            )
+            source = None if source == "全部" else source
+
+            total = stats["count"] if source is None else stats["sources"][source]
+            pages = max(1, (total + PAGE_SIZE - 1) // PAGE_SIZE)
+            page = st.number_input(f"页码（共 {pages} 页）", min_value=1, max_value=pages, value=1, step=1)
+
+            listing = rag_service.list_docs(offset=(page - 1) * PAGE_SIZE, limit=PAGE_SIZE, source=source)
+            if listing is not None:
+                for i, doc in enumerate(listing["documents"], start=(page - 1) * PAGE_SIZE + 1):
+                    title = f"{i}. {doc.metadata.get('source', '')}"
+                    if "page" in doc.metadata:
+                        title += f" 第 {doc.metadata['page']} 页"
+                    create_docs_expander(i, doc.page_content, max_prvw_len=300, title=title)
     else:
         create_stat_indicator("warning", "未找到文档")
 
@@ -47,6 +66,8 @@ def main():
 
     st.subheader("文档管理")
 
+    st.text_input("要删除的文档来源（上传时的文件名）", key="del_source")
+
     def del_coll(rag_service):
         #删除集合
         vector_store = rag_service.load_vector_store()
@@ -69,11 +90,28 @@ def main():
 
         if result.get("success", False):
             create_stat_indicator("success", "集合删除成功")
-            #重置应用状态
+            #释放连接后重置应用状态
+            rag_service.close()
             reset_app_state()
         else:
             create_stat_indicator("error", "集合删除失败")
 
+    def del_docs(rag_service):
+        #按来源删除分块，不删除集合
+        source = st.session_state.get("del_source", "").strip()
+        if not source:
+            create_stat_indicator("warning", "请输入要删除的文档来源")
+            return
+
+        result = rag_service.del_docs(source=source)
+        if result.get("success", False):
+            for msg in result.get("messages", []):
+                st.info(msg)
+            if result.get("deleted", 0):
+                create_stat_indicator("success", f"已删除来源为 {source} 的文档")
+        else:
+            create_stat_indicator("error", "文档删除失败")
+
     def refresh_vector_store(rag_service):
         #刷新向量存储
         vector_store = rag_service.load_vector_store()
@@ -89,6 +127,12 @@ def main():
 
 
     buttons = [
+        {
+            "name": "按来源删除文档",
+            "type": "secondary",
+            "callback": del_docs,
+            "args": {"rag_service": rag_service}
+        },
         {
             "name": "删除集合",
             "type": "primary",
@@ -2,7 +2,7 @@ import os
 from typing import Dict, Any, List, Optional
 
 from ..config import VECTORSTORE_PATH, COLLECTION_NAME
-from ..utils import safe_del_res, force_gc_coll, handle_exc
+from ..utils import handle_exc
 
 
 class RAGService:
@@ -12,6 +12,19 @@ class RAGService:
         self.docs_processor = None
         self.rag_chain = None
 
+    def close(self) -> None:
+        #释放向量存储与嵌入缓存持有的连接和文件句柄
+        if self.vector_store_manager is not None:
+            self.vector_store_manager.close()
+        self.vector_store_manager = None
+        self.rag_chain = None
+
+    def __enter__(self) -> "RAGService":
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.close()
+
     def init_vector_store_manager(self):
         try:
             from backend.rag import VectorStoreManager
@@ -52,13 +65,24 @@ class RAGService:
             handle_exc(e, "加载向量存储失败")
             return None
         
-    def get_sample_docs(self, query: str = "test", k: int = 5) ->List:
+    def list_docs(self, offset: int = 0, limit: int = 20, source: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        #分页列出分块（不调用嵌入模型）
+        if not self.vector_store_manager:
+            self.init_vector_store_manager()
+        try:
+            return self.vector_store_manager.list_documents(offset=offset, limit=limit, source=source)
+        except Exception as e:
+            handle_exc(e, "获取文档列表失败")
+            return None
+
+    def get_stats(self) -> Optional[Dict[str, Any]]:
+        #集合统计：分块数、来源、维度、磁盘占用
         if not self.vector_store_manager:
             self.init_vector_store_manager()
         try:
-            return self.vector_store_manager.similar_search(query, k)
+            return self.vector_store_manager.collection_stats()
         except Exception as e:
-            handle_exc(e, "获取样本文档失败")
+            handle_exc(e, "获取集合统计失败")
             return None
         
     def del_coll(self) -> Dict[str, Any]:
@@ -66,18 +90,25 @@ class RAGService:
             self.init_vector_store_manager()
 
         try:
-            #clear resources
-            safe_del_res(self.vector_store_manager)
-            force_gc_coll()
-
-            result = self.vector_store_manager.del_collection(COLLECTION_NAME)
-            force_gc_coll()
-
-            return result
+            #切换到新的空版本，其他会话持有的旧版本在释放后回收
+            return self.vector_store_manager.del_collection(COLLECTION_NAME)
         except Exception as e:
             handle_exc(e, "删除集合失败")
             return {"success": False, "error": str(e)}
         
+    def del_docs(self, source: Optional[str] = None, ids: Optional[List[str]] = None) -> Dict[str, Any]:
+        #按来源或 id 删除分块，保留集合
+        if not self.vector_store_manager:
+            self.init_vector_store_manager()
+
+        try:
+            if self.vector_store_manager.vector_store is None:
+                self.vector_store_manager.load_vector_store(COLLECTION_NAME)
+            return self.vector_store_manager.delete_documents(source=source, ids=ids)
+        except Exception as e:
+            handle_exc(e, "删除文档失败")
+            return {"success": False, "error": str(e)}
+
     def add_docs(self, file_paths: List[str]) -> Dict[str, Any]:
         if not self.docs_processor:
             self.init_docs_processor()
@@ -118,4 +149,4 @@ class RAGService:
             return result
         except Exception as e:
             handle_exc(e, "回答问题失败")
-            return {"answer": f"回答问题失败: {str(e)}", "source_docs": []}
+            return {"answer": f"回答问题失败: {str(e)}", "source_documents": [], "timings": {}}
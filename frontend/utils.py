@@ -1,7 +1,5 @@
 import os
 import sys
-import time
-import gc
 from typing import List, Dict, Any
 
 
@@ -40,22 +38,6 @@ def format_docs_prvw(content: str, max_len: int = 100) -> str:
     return content[:max_len] + "..."
 
 
-def safe_del_res(obj: Any) -> None:
-    #安全删除对象资源
-    try:
-        if hasattr(obj, 'vector_store') and obj.vector_store:
-            if hasattr(obj.vector_store, '_client'):
-                obj.vector_store._client.close()
-            obj.vector_store = None
-    except:
-        pass
-
-
-def force_gc_coll() -> None:
-    gc.collect()
-    time.sleep(0.2)
-
-
 def display_stat_msg(status: str, message: str) -> None:
     #显示状态消息
     import streamlit as st
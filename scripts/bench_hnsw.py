@@ -0,0 +1,113 @@
+"""测量不同 HNSW 参数（距离类型、M、construction_ef、search_ef）下的召回率、构建耗时与查询延迟。
+
+用 LocalEmbeddings 同款的特征哈希嵌入随机生成的能源领域短文本，以 NumPy 精确检索结果为基准计算 recall@k，
+不调用任何嵌入服务。search_ef 可在集合建好后调整，因此每组建图参数只构建一次，再依次测量各个 search_ef。
+
+用法: python scripts/bench_hnsw.py --n 20000 --dim 384 --m 16 32 --construction-ef 100 200 --search-ef 10 50 100
+"""
+import os
+import sys
+import time
+import shutil
+import argparse
+import itertools
+import tempfile
+from typing import List
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import chromadb
+from backend.utils import hash_embed_texts
+from backend.rag.vector_store import HNSW_SPACES, resolve_hnsw_settings, hnsw_configuration
+
+
+_VOCAB = [
+    "光伏", "风电", "储能", "电网", "调峰", "负荷", "电价", "碳排放", "氢能", "煤电", "核电", "水电",
+    "配电网", "虚拟电厂", "需求响应", "装机容量", "发电量", "弃风率", "补贴", "政策", "标准", "kWh",
+    "MW", "GB/T", "2023年", "2024年", "新能源", "并网", "电力市场", "现货交易", "输电", "变电站",
+]
+
+
+def make_texts(rng: np.random.Generator, n: int) -> List[str]:
+    #由领域词汇随机拼成短文本
+    lengths = rng.integers(4, 12, n)
+    return ["".join(rng.choice(_VOCAB, size=length)) + f" 第{i}条" for i, length in enumerate(lengths)]
+
+
+def exact_top_k(vectors: np.ndarray, queries: np.ndarray, k: int) -> np.ndarray:
+    #哈希嵌入已 L2 归一化，l2、cosine 与 ip 的排序一致，统一按内积求精确近邻
+    scores = queries @ vectors.T
+    return np.argpartition(-scores, k - 1, axis=1)[:, :k]
+
+
+def percentile_ms(samples: List[float], q: float) -> float:
+    return float(np.percentile(samples, q) * 1000)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--n", type=int, default=20000, help="向量条数")
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--space", nargs="+", default=["l2"], choices=HNSW_SPACES)
+    parser.add_argument("--m", nargs="+", type=int, default=[16])
+    parser.add_argument("--construction-ef", nargs="+", type=int, default=[100])
+    parser.add_argument("--search-ef", nargs="+", type=int, default=[10, 50, 100, 200])
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    vectors = hash_embed_texts(make_texts(rng, args.n), args.dim)
+    queries = hash_embed_texts(make_texts(rng, args.queries), args.dim)
+    ids = [str(i) for i in range(args.n)]
+    truth = [set(row.tolist()) for row in exact_top_k(vectors, queries, args.k)]
+
+    work_dir = tempfile.mkdtemp(prefix="bench_hnsw_")
+    rows = []
+    try:
+        client = chromadb.PersistentClient(path=work_dir)
+        batch = client.get_max_batch_size()
+        for space, m, construction_ef in itertools.product(args.space, args.m, args.construction_ef):
+            settings = resolve_hnsw_settings({"space": space, "M": m, "construction_ef": construction_ef})
+            name = f"bench-{space}-{m}-{construction_ef}"
+            collection = client.create_collection(name, configuration=hnsw_configuration(settings))
+
+            start = time.perf_counter()
+            for i in range(0, args.n, batch):
+                collection.add(ids=ids[i:i + batch], embeddings=vectors[i:i + batch])
+            build = time.perf_counter() - start
+
+            for search_ef in args.search_ef:
+                #已加载的索引不会读取新的 ef_search，修改后重新打开客户端
+                collection.modify(configuration={"hnsw": {"ef_search": search_ef}})
+                client.close()
+                client = chromadb.PersistentClient(path=work_dir)
+                collection = client.get_collection(name)
+                #首次查询加载索引，不计入延迟
+                collection.query(query_embeddings=queries[:1], n_results=args.k, include=[])
+
+                latencies = []
+                hits = 0
+                for query, expected in zip(queries, truth):
+                    start = time.perf_counter()
+                    result = collection.query(query_embeddings=query[None, :], n_results=args.k, include=[])
+                    latencies.append(time.perf_counter() - start)
+                    hits += len(expected & {int(i) for i in result["ids"][0]})
+                rows.append((space, m, construction_ef, search_ef, build, hits / (args.k * len(truth)), latencies))
+
+            client.delete_collection(name)
+
+        print(f"向量数: {args.n}, 维度: {args.dim}, 查询数: {args.queries}, k={args.k}")
+        print(f"{'space':<8}{'M':>5}{'constr_ef':>11}{'search_ef':>11}{'构建(s)':>10}"
+              f"{'recall@k':>10}{'p50(ms)':>10}{'p99(ms)':>10}")
+        for space, m, construction_ef, search_ef, build, recall, latencies in rows:
+            print(f"{space:<8}{m:>5}{construction_ef:>11}{search_ef:>11}{build:>10.2f}"
+                  f"{recall:>10.3f}{percentile_ms(latencies, 50):>10.2f}{percentile_ms(latencies, 99):>10.2f}")
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
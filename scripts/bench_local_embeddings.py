@@ -0,0 +1,76 @@
+"""对比旧版逐条 hash_text 循环与批量特征哈希嵌入的吞吐量。
+
+旧版只对整段文本做一次 md5 后生成随机向量，耗时与文本长度无关；新版需要遍历每个字符
+n-gram，长文本下单条耗时更高，但向量能反映文本内容。默认同时测试查询长度与分块长度。
+
+用法: python scripts/bench_local_embeddings.py --n 5000 --lengths 50,1000 --repeat 3
+"""
+import os
+import sys
+import time
+import random
+import hashlib
+import argparse
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend.utils import hash_embed_texts
+
+_SAMPLE_WORDS = [
+    "光伏", "风电", "储能", "电网", "分时电价", "碳排放", "可再生能源", "装机容量",
+    "GB/T 19964-2012", "kWh", "MW", "上网电价", "补贴政策", "负荷预测", "火电", "氢能",
+]
+
+
+def legacy_hash_text(text: str, dim: int = 384):
+    #旧实现：每条文本重置全局随机数种子
+    text_hash = hashlib.md5(text.encode()).digest()
+    np.random.seed(int.from_bytes(text_hash[:4], byteorder="big"))
+    return np.random.rand(dim).tolist()
+
+
+def make_corpus(n: int, length: int, seed: int = 0):
+    rng = random.Random(seed)
+    corpus = []
+    for _ in range(n):
+        parts = []
+        while sum(len(p) for p in parts) < length:
+            parts.append(rng.choice(_SAMPLE_WORDS))
+        corpus.append("，".join(parts)[:length])
+    return corpus
+
+
+def bench(func, corpus, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(corpus)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--n", type=int, default=5000, help="文本条数")
+    parser.add_argument("--lengths", default="50,1000", help="每条文本字符数，逗号分隔（1000 与默认 chunk_size 一致）")
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    for length in (int(x) for x in args.lengths.split(",")):
+        corpus = make_corpus(args.n, length)
+
+        legacy = bench(lambda texts: [legacy_hash_text(t, args.dim) for t in texts], corpus, args.repeat)
+        batched = bench(lambda texts: hash_embed_texts(texts, args.dim), corpus, args.repeat)
+        batched_list = bench(lambda texts: hash_embed_texts(texts, args.dim).tolist(), corpus, args.repeat)
+
+        print(f"文本数: {args.n}, 每条 {length} 字符, 维度 {args.dim}")
+        print(f"  旧版逐条 hash_text:         {legacy:.3f}s  ({args.n / legacy:,.0f} 条/秒)")
+        print(f"  批量 hash_embed_texts:      {batched:.3f}s  ({args.n / batched:,.0f} 条/秒)")
+        print(f"  批量 + tolist (Embeddings): {batched_list:.3f}s  ({args.n / batched_list:,.0f} 条/秒)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+"""对比 Chroma 与 NumPy 精确检索后端的构建耗时、冷启动耗时与查询延迟。
+
+使用随机单位向量模拟嵌入，不调用任何嵌入服务。
+chromadb 在进程内按路径缓存已打开的 System，测量 Chroma 冷启动前先关闭客户端并清空该缓存，
+使重新打开时真正从磁盘加载集合（操作系统的文件页缓存仍然是热的，两个后端同样如此）。
+
+用法: python scripts/bench_vector_backends.py --n 20000 --dim 384 --queries 200
+"""
+import os
+import sys
+import time
+import shutil
+import argparse
+import tempfile
+from typing import List
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from langchain_core.embeddings import Embeddings
+from langchain_chroma import Chroma
+from chromadb.api.client import SharedSystemClient
+from backend.rag.numpy_store import NumpyVectorStore
+
+
+class PrecomputedEmbeddings(Embeddings):
+    #按文本查表返回预先生成的向量
+    def __init__(self, texts: List[str], vectors: np.ndarray):
+        self._lookup = dict(zip(texts, vectors.tolist()))
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return [self._lookup[t] for t in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._lookup[text]
+
+
+def percentile_ms(samples: List[float], q: float) -> float:
+    return float(np.percentile(samples, q) * 1000)
+
+
+def run_queries(search, queries: np.ndarray, k: int) -> List[float]:
+    latencies = []
+    for q in queries:
+        start = time.perf_counter()
+        search(q.tolist(), k)
+        latencies.append(time.perf_counter() - start)
+    return latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--n", type=int, default=20000, help="向量条数")
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=3)
+    parser.add_argument("--batch", type=int, default=5000, help="每次写入条数")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    vectors = rng.standard_normal((args.n, args.dim)).astype(np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    queries = rng.standard_normal((args.queries, args.dim)).astype(np.float32)
+    queries /= np.linalg.norm(queries, axis=1, keepdims=True)
+    texts = [f"chunk-{i}" for i in range(args.n)]
+    ids = [str(i) for i in range(args.n)]
+    embeddings = PrecomputedEmbeddings(texts, vectors)
+
+    work_dir = tempfile.mkdtemp(prefix="bench_vs_")
+    try:
+        results = {}
+
+        #Chroma
+        chroma_dir = os.path.join(work_dir, "chroma")
+        start = time.perf_counter()
+        store = Chroma(collection_name="bench", embedding_function=embeddings, persist_directory=chroma_dir)
+        for i in range(0, args.n, args.batch):
+            store.add_texts(texts[i:i + args.batch], ids=ids[i:i + args.batch])
+        build = time.perf_counter() - start
+        store._client.close()
+        del store
+        #清空进程内按路径缓存的 System，否则重新打开会复用已加载的段
+        SharedSystemClient.clear_system_cache()
+
+        start = time.perf_counter()
+        store = Chroma(collection_name="bench", embedding_function=embeddings, persist_directory=chroma_dir)
+        store.similarity_search_by_vector_with_relevance_scores(queries[0].tolist(), k=args.k)
+        cold = time.perf_counter() - start
+        latencies = run_queries(
+            lambda q, k: store.similarity_search_by_vector_with_relevance_scores(q, k=k), queries, args.k
+        )
+        results["chroma"] = (build, cold, latencies)
+        store._client.close()
+        del store
+
+        #NumPy
+        numpy_dir = os.path.join(work_dir, "numpy")
+        start = time.perf_counter()
+        store = NumpyVectorStore(embedding_function=embeddings, persist_directory=numpy_dir, collection_name="bench")
+        for i in range(0, args.n, args.batch):
+            store.add_embeddings(texts[i:i + args.batch], vectors[i:i + args.batch], ids=ids[i:i + args.batch])
+        build = time.perf_counter() - start
+        store.close()
+
+        start = time.perf_counter()
+        store = NumpyVectorStore(embedding_function=embeddings, persist_directory=numpy_dir, collection_name="bench")
+        store.similarity_search_by_vector_with_score(queries[0].tolist(), k=args.k)
+        cold = time.perf_counter() - start
+        latencies = run_queries(store.similarity_search_by_vector_with_score, queries, args.k)
+        results["numpy"] = (build, cold, latencies)
+        store.close()
+
+        print(f"向量数: {args.n}, 维度: {args.dim}, 查询数: {args.queries}, k={args.k}")
+        print(f"{'后端':<8}{'构建(s)':>10}{'冷启动+首查(ms)':>18}{'p50(ms)':>10}{'p99(ms)':>10}")
+        for name, (build, cold, latencies) in results.items():
+            print(f"{name:<8}{build:>10.2f}{cold * 1000:>18.1f}"
+                  f"{percentile_ms(latencies, 50):>10.2f}{percentile_ms(latencies, 99):>10.2f}")
+        print("冷启动：Chroma 已关闭客户端并清空进程内 System 缓存后重新打开；NumPy 为新实例重新映射文件。")
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+"""前端冒烟测试：用 Streamlit AppTest 驱动 frontend/app.py 完成一轮启用 RAG 的对话。
+
+向量存储放在临时目录（NumPy 后端 + 本地特征哈希嵌入），LLM 替换为返回固定回答的假模型，
+不调用任何外部服务。检查回答与参考来源写入对话历史，且页面没有报错；
+再开一个会话提出同一问题，检查语义回答缓存由两个会话共享并命中。
+
+用法: python scripts/smoke_app_chat.py
+"""
+import os
+import sys
+import shutil
+import tempfile
+from typing import Iterator
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+#不使用嵌入服务与嵌入缓存；须在导入 backend 之前设置
+os.environ["EMBEDDING_CACHE_ENABLED"] = "false"
+os.environ["DASHSCOPE_API_KEY"] = ""
+os.environ["OPENAI_API_KEY"] = ""
+
+from streamlit.testing.v1 import AppTest
+from langchain_core.documents import Document
+
+import backend.rag as backend_rag
+import backend.rag.rag_chain as rag_chain_module
+import backend.llm.llm_factory as llm_factory
+from backend.llm.llm_factory import BaseLLM
+from backend.rag.vector_store import VectorStoreManager
+
+APP_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "frontend", "app.py")
+ANSWER = "光伏补贴按装机容量发放。"
+
+
+class FakeLLM(BaseLLM):
+    #返回固定回答，流式时逐字产出
+    provider = "fake"
+    model_name = "fake"
+
+    def _chat(self, prompt: str) -> str:
+        return ANSWER
+
+    def _stream(self, prompt: str) -> Iterator[str]:
+        yield from ANSWER
+
+
+def main() -> int:
+    work_dir = tempfile.mkdtemp(prefix="smoke_app_")
+    try:
+        class TempVectorStoreManager(VectorStoreManager):
+            def __init__(self, persist_directory: str = None, **kwargs):
+                super().__init__(persist_directory=work_dir, backend="numpy", **kwargs)
+
+        with TempVectorStoreManager() as manager:
+            manager.load_vector_store(collection_name="energy_docs")
+            manager.add_documents([
+                Document(page_content="光伏补贴政策：按装机容量给予补贴。", metadata={"source": "policy.pdf"}),
+                Document(page_content="风电规划：到 2030 年新增装机。", metadata={"source": "plan.docx"}),
+            ])
+
+        backend_rag.VectorStoreManager = TempVectorStoreManager
+        llm_factory.get_llm = lambda **kwargs: FakeLLM()
+        rag_chain_module.get_llm = llm_factory.get_llm
+
+        def ask(question: str) -> AppTest:
+            at = AppTest.from_file(APP_PATH, default_timeout=60)
+            at.run()
+            next(box for box in at.checkbox if box.label == "启用RAG").check().run()
+            at.text_input(key="prompt_input").input(question)
+            next(button for button in at.button if button.label == "发送").click().run()
+            return at
+
+        at = ask("光伏补贴怎么发放？")
+        errors = [error.value for error in at.error] + [str(e.value) for e in at.exception]
+        history = at.session_state.chat_history if "chat_history" in at.session_state else []
+        reply = history[-1] if history else {}
+        ok = (
+            not errors
+            and reply.get("role") == "assistant"
+            and reply.get("content") == ANSWER
+            and "policy.pdf" in reply.get("sources", [])
+        )
+        print(f"对话历史: {history}")
+        if errors:
+            print(f"页面错误: {errors}")
+
+        #第二个会话的同一问题命中第一个会话写入的语义回答缓存
+        other = ask("光伏补贴怎么发放？")
+        cache = at.session_state.rag_components["rag_chain"].answer_cache
+        other_cache = other.session_state.rag_components["rag_chain"].answer_cache
+        shared = cache is not None and cache is other_cache and cache.hits >= 1
+        print(f"语义回答缓存共享: {shared}")
+        ok = ok and shared
+
+        print("通过" if ok else "失败")
+        return 0 if ok else 1
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
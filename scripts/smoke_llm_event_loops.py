@@ -0,0 +1,82 @@
+"""冒烟测试：同一个缓存的 LLM 实例可以在先后两次 asyncio.run 中异步调用。
+
+LLMFactory 在进程内复用 LLM 实例，而异步客户端的连接池绑定创建它的事件循环；
+本脚本在本地启动一个兼容 OpenAI 接口的假服务（支持 keep-alive），
+对 OpenAIPythonLLM 与 LangChainLLM 各调用两次 asyncio.run(llm.achat(...))，不访问外部服务。
+
+用法: python scripts/smoke_llm_event_loops.py
+"""
+import os
+import sys
+import json
+import asyncio
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+os.environ["EMBEDDING_CACHE_ENABLED"] = "false"
+os.environ["DASHSCOPE_API_KEY"] = ""
+os.environ["OPENAI_API_KEY"] = ""
+
+from backend.llm.llm_factory import OpenAIPythonLLM, LangChainLLM, LANGCHAIN_AVAILABLE
+
+ANSWER = "连接成功"
+
+
+class FakeOpenAIHandler(BaseHTTPRequestHandler):
+    #对任意 chat.completions 请求返回固定回答，保持长连接以复用连接池
+    protocol_version = "HTTP/1.1"
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        body = json.dumps({
+            "id": "chatcmpl-smoke",
+            "object": "chat.completion",
+            "created": 0,
+            "model": "fake",
+            "choices": [{"index": 0, "finish_reason": "stop",
+                         "message": {"role": "assistant", "content": ANSWER}}],
+            "usage": {"prompt_tokens": 1, "completion_tokens": 1, "total_tokens": 2},
+        }).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def main() -> int:
+    server = ThreadingHTTPServer(("127.0.0.1", 0), FakeOpenAIHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    api_base = f"http://127.0.0.1:{server.server_address[1]}/v1"
+    failures = []
+
+    llms = [("OpenAIPythonLLM", OpenAIPythonLLM(model_name="fake", api_key="sk-smoke", api_base=api_base))]
+    if LANGCHAIN_AVAILABLE:
+        llms.append(("LangChainLLM", LangChainLLM(model_name="fake", api_key="sk-smoke", api_base=api_base)))
+
+    try:
+        for name, llm in llms:
+            for attempt in range(2):
+                try:
+                    #提示词不同，确保两次都真正发出请求
+                    ok = asyncio.run(llm.achat(f"第 {attempt + 1} 次")) == ANSWER
+                    error = ""
+                except Exception as e:
+                    ok, error = False, f"：{e}"
+                print(f"{'通过' if ok else '失败'}: {name} 第 {attempt + 1} 个事件循环{error}")
+                if not ok:
+                    failures.append(f"{name}#{attempt + 1}")
+    finally:
+        server.shutdown()
+
+    print("通过" if not failures else f"失败 {len(failures)} 项")
+    return 0 if not failures else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
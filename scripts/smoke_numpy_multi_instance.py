@@ -0,0 +1,62 @@
+"""冒烟测试：同一目录上的两个 NumPy 后端 VectorStoreManager 能看到彼此的写入与删除。
+
+模拟 Streamlit 多个会话、CLI 与应用同时打开同一向量存储的情况，使用本地特征哈希嵌入，不调用外部服务。
+
+用法: python scripts/smoke_numpy_multi_instance.py
+"""
+import os
+import sys
+import shutil
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+os.environ["EMBEDDING_CACHE_ENABLED"] = "false"
+os.environ["DASHSCOPE_API_KEY"] = ""
+os.environ["OPENAI_API_KEY"] = ""
+
+from langchain_core.documents import Document
+
+from backend.rag.vector_store import VectorStoreManager
+
+
+def top_content(manager: VectorStoreManager, query: str) -> str:
+    hits = manager.similar_search(query, k=1)
+    return hits[0].page_content if hits else ""
+
+
+def main() -> int:
+    work_dir = tempfile.mkdtemp(prefix="smoke_numpy_")
+    failures = []
+
+    def check(name: str, condition: bool) -> None:
+        print(f"{'通过' if condition else '失败'}: {name}")
+        if not condition:
+            failures.append(name)
+
+    try:
+        with VectorStoreManager(persist_directory=work_dir, backend="numpy") as a, \
+                VectorStoreManager(persist_directory=work_dir, backend="numpy") as b:
+            a.load_vector_store()
+            b.load_vector_store()
+
+            a.add_documents([Document(page_content="光伏补贴政策", metadata={"source": "a.txt"})])
+            check("B 检索到 A 写入的分块", top_content(b, "光伏补贴政策") == "光伏补贴政策")
+
+            b.add_documents([Document(page_content="储能电站建设规划", metadata={"source": "b.txt"})])
+            check("A 检索到 B 写入的分块", top_content(a, "储能电站建设规划") == "储能电站建设规划")
+            a.add_documents([Document(page_content="风电并网标准", metadata={"source": "a.txt"})])
+            check("两实例交替写入后 B 看到全部分块", len(b.vector_store) == 3)
+
+            b.delete_documents(source="a.txt")
+            check("A 不再返回 B 删除的分块", top_content(a, "光伏补贴政策") != "光伏补贴政策")
+            check("A 的计数反映 B 的删除", len(a.vector_store) == 1)
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    print("通过" if not failures else f"失败 {len(failures)} 项")
+    return 0 if not failures else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())